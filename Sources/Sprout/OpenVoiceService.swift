@@ -4,6 +4,8 @@ class OpenVoiceService {
     private var baseURL: String
     private var session: URLSession
     private var detectedPort: Int = 6000
+    /// Voice id returned by `/clone`; synthesis uses the service's reference voice until one is set.
+    private(set) var clonedVoiceId: String?
     
     init() {
         // Will detect the correct port on first use
@@ -15,7 +17,7 @@ class OpenVoiceService {
         session = URLSession(configuration: config)
     }
     
-    private func detectServicePort() async -> Int? {
+    private func detectServicePort() async -> (port: Int, ready: Bool)? {
         // Try ports 6000-6009 to find the service
         for port in 6000...6009 {
             guard let url = URL(string: "http://localhost:\(port)/health") else { continue }
@@ -25,11 +27,11 @@ class OpenVoiceService {
             request.timeoutInterval = 2
             
             do {
-                let (_, response) = try await session.data(for: request)
+                let (data, response) = try await session.data(for: request)
                 if let httpResponse = response as? HTTPURLResponse,
                    httpResponse.statusCode == 200 {
                     print("✅ OpenVoice service found on port \(port)")
-                    return port
+                    return (port, isReady(healthData: data))
                 }
             } catch {
                 continue
@@ -38,12 +40,25 @@ class OpenVoiceService {
         return nil
     }
     
+    /// The service answers /health while it is still loading models; only
+    /// treat it as available once it reports `ready` (older services omit the field).
+    private func isReady(healthData: Data) -> Bool {
+        guard let json = try? JSONSerialization.jsonObject(with: healthData) as? [String: Any],
+              let ready = json["ready"] as? Bool else {
+            return true
+        }
+        if !ready {
+            print("⏳ OpenVoice service is warming up (state: \(json["state"] ?? "unknown"))")
+        }
+        return ready
+    }
+    
     func checkServiceAvailable() async -> Bool {
         // First, try to detect which port the service is on
-        if let port = await detectServicePort() {
-            detectedPort = port
-            baseURL = "http://localhost:\(port)"
-            return true
+        if let service = await detectServicePort() {
+            detectedPort = service.port
+            baseURL = "http://localhost:\(service.port)"
+            return service.ready
         }
         
         // Fallback: try the default port
@@ -54,15 +69,17 @@ class OpenVoiceService {
         request.timeoutInterval = 5
         
         do {
-            let (_, response) = try await session.data(for: request)
+            let (data, response) = try await session.data(for: request)
             guard let httpResponse = response as? HTTPURLResponse else { return false }
-            return httpResponse.statusCode == 200
+            return httpResponse.statusCode == 200 && isReady(healthData: data)
         } catch {
             return false
         }
     }
     
-    func synthesize(text: String, voiceType: String = "default") async -> Data? {
+    /// `useClonedVoice: false` speaks with the reference voice, e.g. while the
+    /// cloned voice is still being prepared.
+    func synthesize(text: String, voiceType: String = "default", useClonedVoice: Bool = true) async -> Data? {
         // Ensure we're using the detected port
         let urlString = "http://localhost:\(detectedPort)/synthesize"
         guard let url = URL(string: urlString) else {
@@ -74,17 +91,23 @@ class OpenVoiceService {
         request.httpMethod = "POST"
         request.setValue("application/json", forHTTPHeaderField: "Content-Type")
         
-        let body: [String: Any] = [
+        var body: [String: Any] = [
             "text": text,
             "language": "en",
             "style": voiceType
         ]
+        let voice = useClonedVoice ? clonedVoiceId : nil
+        if let voice = voice {
+            body["voice"] = voice
+        }
         
         request.httpBody = try? JSONSerialization.data(withJSONObject: body)
         
         do {
             print("🎤 OpenVoice: Requesting synthesis for: \(text.prefix(50))... (voice: \(voiceType))")
+            let started = Date()
             let (data, response) = try await session.data(for: request)
+            let roundTrip = Int(Date().timeIntervalSince(started) * 1000)
             
             guard let httpResponse = response as? HTTPURLResponse else {
                 print("⚠️ OpenVoice: Invalid response")
@@ -92,8 +115,13 @@ class OpenVoiceService {
             }
             
             if httpResponse.statusCode == 200 {
-                print("✅ OpenVoice: Synthesis successful (\(data.count) bytes)")
+                print("✅ OpenVoice: Synthesis successful (\(data.count) bytes, \(roundTrip)ms round trip)")
+                logServerTiming(httpResponse)
                 return data
+            } else if let voice = voice, forgetClonedVoice(voice, status: httpResponse.statusCode, body: data) {
+                return await synthesize(text: text, voiceType: voiceType)
+            } else if let voice = voice, clonedVoicePending(voice, status: httpResponse.statusCode) {
+                return await synthesize(text: text, voiceType: voiceType, useClonedVoice: false)
             } else {
                 print("⚠️ OpenVoice: Service returned status \(httpResponse.statusCode)")
                 return nil
@@ -104,6 +132,111 @@ class OpenVoiceService {
         }
     }
     
+    /// Logs the server-side stage breakdown when the service sends a
+    /// `Server-Timing` header (enabled with OPENVOICE_SERVER_TIMING=1).
+    private func logServerTiming(_ response: HTTPURLResponse) {
+        guard let timing = response.value(forHTTPHeaderField: "Server-Timing") else { return }
+        print("⏱️ OpenVoice: Server timing: \(timing)")
+    }
+    
+    /// Streams synthesis sentence by sentence from `/synthesize/stream`.
+    /// The response is a sequence of frames, each a little-endian UInt32 length
+    /// followed by a complete WAV file; `onChunk` is awaited for each one in order.
+    /// Returns the number of chunks delivered (0 means nothing was played).
+    func synthesizeStream(text: String, voiceType: String = "default", useClonedVoice: Bool = true,
+                          onChunk: (Data) async -> Void) async -> Int {
+        guard let url = URL(string: "http://localhost:\(detectedPort)/synthesize/stream") else {
+            print("⚠️ OpenVoice: Invalid URL")
+            return 0
+        }
+        
+        var request = URLRequest(url: url)
+        request.httpMethod = "POST"
+        request.setValue("application/json", forHTTPHeaderField: "Content-Type")
+        
+        var body: [String: Any] = [
+            "text": text,
+            "language": "en",
+            "style": voiceType,
+            "format": "frames"
+        ]
+        let voice = useClonedVoice ? clonedVoiceId : nil
+        if let voice = voice {
+            body["voice"] = voice
+        }
+        
+        request.httpBody = try? JSONSerialization.data(withJSONObject: body)
+        
+        var delivered = 0
+        do {
+            print("🎤 OpenVoice: Streaming synthesis for: \(text.prefix(50))... (voice: \(voiceType))")
+            let (bytes, response) = try await session.bytes(for: request)
+            
+            guard let httpResponse = response as? HTTPURLResponse, httpResponse.statusCode == 200 else {
+                if let voice = voice, let httpResponse = response as? HTTPURLResponse,
+                   clonedVoicePending(voice, status: httpResponse.statusCode) {
+                    return await synthesizeStream(text: text, voiceType: voiceType, useClonedVoice: false, onChunk: onChunk)
+                }
+                if let voice = voice, let httpResponse = response as? HTTPURLResponse, httpResponse.statusCode == 404 {
+                    var errorBody = Data()
+                    for try await byte in bytes {
+                        errorBody.append(byte)
+                    }
+                    if forgetClonedVoice(voice, status: httpResponse.statusCode, body: errorBody) {
+                        return await synthesizeStream(text: text, voiceType: voiceType, onChunk: onChunk)
+                    }
+                }
+                print("⚠️ OpenVoice: Streaming endpoint unavailable")
+                return 0
+            }
+            logServerTiming(httpResponse)
+            
+            var buffer = Data()
+            for try await byte in bytes {
+                buffer.append(byte)
+                
+                // Deliver every complete frame in the buffer
+                while buffer.count >= 4 {
+                    let length = buffer.prefix(4).enumerated().reduce(0) { total, item in
+                        total | (Int(item.element) << (8 * item.offset))
+                    }
+                    guard buffer.count >= 4 + length else { break }
+                    
+                    let chunk = buffer.subdata(in: buffer.startIndex + 4 ..< buffer.startIndex + 4 + length)
+                    buffer.removeSubrange(buffer.startIndex ..< buffer.startIndex + 4 + length)
+                    delivered += 1
+                    print("✅ OpenVoice: Received chunk \(delivered) (\(chunk.count) bytes)")
+                    await onChunk(chunk)
+                }
+            }
+        } catch {
+            print("❌ OpenVoice: Streaming request failed - \(error.localizedDescription)")
+        }
+        return delivered
+    }
+    
+    /// Clears `clonedVoiceId` when the service answered 404 for that voice (e.g. its
+    /// voices directory was wiped), so the retry uses the reference voice.
+    /// Returns true if the voice was cleared and the request should be retried.
+    private func forgetClonedVoice(_ voice: String, status: Int, body: Data) -> Bool {
+        guard status == 404, voice == clonedVoiceId,
+              let json = try? JSONSerialization.jsonObject(with: body) as? [String: Any],
+              let error = json["error"] as? String, error.hasPrefix("Unknown voice") else {
+            return false
+        }
+        clonedVoiceId = nil
+        print("⚠️ OpenVoice: Cloned voice \(voice) is unknown to the service, using the reference voice")
+        return true
+    }
+    
+    /// True when the service answered 409 because the cloned voice is still being
+    /// prepared; the voice is kept and this one request uses the reference voice.
+    private func clonedVoicePending(_ voice: String, status: Int) -> Bool {
+        guard status == 409 else { return false }
+        print("⏳ OpenVoice: Cloned voice \(voice) is still being prepared, using the reference voice")
+        return true
+    }
+    
     func cloneVoice(from audioData: Data) async -> Bool {
         guard let url = URL(string: "\(baseURL)/clone") else { return false }
         
@@ -113,13 +246,18 @@ class OpenVoiceService {
         request.httpBody = audioData
         
         do {
-            let (_, response) = try await session.data(for: request)
+            let (data, response) = try await session.data(for: request)
             
+            // 202: the voice is registered and prepared in the background
             guard let httpResponse = response as? HTTPURLResponse,
-                  httpResponse.statusCode == 200 else {
+                  httpResponse.statusCode == 200 || httpResponse.statusCode == 202,
+                  let json = try? JSONSerialization.jsonObject(with: data) as? [String: Any],
+                  let voice = json["voice"] as? String else {
                 return false
             }
             
+            clonedVoiceId = voice
+            print("✅ OpenVoice: Registered cloned voice \(voice)")
             return true
         } catch {
             print("❌ Voice cloning failed: \(error)")
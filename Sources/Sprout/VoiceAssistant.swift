@@ -30,6 +30,7 @@ class VoiceAssistant: ObservableObject {
     private var currentSynthesizer: AVSpeechSynthesizer?
     var currentAudioPlayer: AVAudioPlayer? // For OpenVoice playback (internal for AudioDelegate access)
     var audioPlayerDelegate: AudioDelegate? // Keep reference to prevent deallocation (internal for AudioDelegate access)
+    var isStreamingPlayback = false // Chunks of one reply are playing back to back (internal for AudioDelegate access)
     var audioContinuation: CheckedContinuation<Void, Never>? // Store continuation for early stop (internal for AudioDelegate access)
     
     struct ConversationMessage: Identifiable {
@@ -443,7 +444,20 @@ class VoiceAssistant: ObservableObject {
             
             // Use OpenVoice service to generate speech with Jon's voice
             print("🎤 Attempting OpenVoice synthesis... (voice: \(effectiveVoiceType.displayName))")
-            if let audioData = await openVoiceService.synthesize(text: textForSpeech, voiceType: voiceTypeString) {
+            
+            // Stream sentence by sentence so playback starts after the first one is rendered
+            isStreamingPlayback = true
+            let playedChunks = await openVoiceService.synthesizeStream(text: textForSpeech, voiceType: voiceTypeString) { chunk in
+                // Stopped by the user - drain the rest of the stream silently
+                guard self.isSpeaking else { return }
+                await self.playAudio(chunk)
+            }
+            isStreamingPlayback = false
+            
+            if playedChunks > 0 {
+                print("✅ Used streaming OpenVoice (Jon's voice) for speech (\(playedChunks) chunks)")
+                await finishStreamingPlayback()
+            } else if let audioData = await openVoiceService.synthesize(text: textForSpeech, voiceType: voiceTypeString) {
                 print("✅ Using OpenVoice (Jon's voice) for speech")
                 await playAudio(audioData)
             } else {
@@ -565,6 +579,19 @@ class VoiceAssistant: ObservableObject {
         }
     }
     
+    private func finishStreamingPlayback() async {
+        // Mirrors AudioDelegate's end-of-playback handling once the last chunk has played
+        await MainActor.run {
+            self.isSpeaking = false
+        }
+        DispatchQueue.main.asyncAfter(deadline: .now() + 0.3) { [weak self] in
+            if let assistant = self, !assistant.isListening && !assistant.isSpeaking {
+                print("🔄 Restarting listening after OpenVoice audio finished")
+                assistant.startListening()
+            }
+        }
+    }
+    
     private func playAudio(_ data: Data) async {
         // Play audio data from OpenVoice using AVAudioPlayer
         return await withCheckedContinuation { continuation in
@@ -659,6 +686,11 @@ class AudioDelegate: NSObject, AVAudioPlayerDelegate {
         voiceAssistant?.currentAudioPlayer = nil
         voiceAssistant?.audioPlayerDelegate = nil
         
+        // More chunks of the same reply are coming - keep speaking
+        if voiceAssistant?.isStreamingPlayback == true {
+            return
+        }
+        
         // Set isSpeaking to false
         voiceAssistant?.isSpeaking = false
         
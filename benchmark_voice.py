@@ -0,0 +1,409 @@
+#!/usr/bin/env python3
+"""
+Benchmark OpenVoice synthesis latency from command line
+Compares time-to-first-chunk and total latency for /synthesize and /synthesize/stream,
+measures throughput versus latency under concurrent load, and runs the full suite
+(text lengths x styles x concurrency) either against a live service or in-process
+through the Flask test client with the stub model backend (no checkpoints needed)
+Usage: python benchmark_voice.py [--repeat N] [--style STYLE] [--json]
+       python benchmark_voice.py --load [--concurrency 1,2,4,8] [--requests 32]
+       python benchmark_voice.py --compare-watermark [--repeat N]
+       python benchmark_voice.py --suite [--in-process] [--output results.json] [--baseline old.json]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import statistics
+import subprocess
+from concurrent.futures import ThreadPoolExecutor
+
+PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+VOICE_STYLES = ['default', 'excited', 'friendly', 'cheerful', 'sad', 'angry', 'terrified', 'shouting', 'whispering']
+
+BENCHMARK_TEXTS = {
+    'word': "Hello.",
+    'short': "Hello Seedling!",
+    'medium': "Take a slow, deep breath in. Hold it for a moment. Now let it out gently.",
+    'long': (
+        "You've been working hard today, and that deserves some recognition. "
+        "Let's take a short break together. Close your eyes and notice how your shoulders feel. "
+        "If they are tense, let them drop a little with each breath. "
+        "When you're ready, open your eyes and come back to what you were doing, a bit lighter than before."
+    ),
+    'paragraph': (
+        "Good morning, Seedling. Before we dive into the day, let's check in for a moment. "
+        "How did you sleep, and how is your body feeling right now? There's no right answer. "
+        "Just notice whatever is there, without trying to change it. "
+        "Today you have three things on your list: finishing the report, calling your sister, "
+        "and going for a walk before dinner. Let's start with the one that feels lightest, "
+        "and build a little momentum from there. Remember to drink some water, stretch your "
+        "shoulders every hour, and be kind to yourself if things take longer than planned. "
+        "I'll be right here whenever you need a hand."
+    ),
+}
+
+class HTTPTarget:
+    """Sends requests to a live service over HTTP
+
+    Uses the client's keep-alive pool (sized for the highest concurrency) and
+    no retries, so rejections show up in the numbers.
+    """
+
+    name = 'http'
+
+    def __init__(self, base_url, pool_size=8):
+        from openvoice_client import OpenVoiceClient
+        self.base_url = base_url
+        self.client = OpenVoiceClient(base_url, timeout=120, retries=0, pool_size=pool_size)
+        self.session = self.client.session
+
+    def post(self, path, payload, stream=False):
+        """Return (status, time_to_first_chunk, total_time, body) for one request"""
+        start = time.perf_counter()
+        first_chunk = None
+        body = bytearray()
+        with self.session.post(self.base_url + path, json=payload, stream=stream, timeout=120) as response:
+            for chunk in response.iter_content(chunk_size=None):
+                if first_chunk is None and chunk:
+                    first_chunk = time.perf_counter() - start
+                body += chunk
+        total = time.perf_counter() - start
+        return response.status_code, first_chunk if first_chunk is not None else total, total, bytes(body)
+
+    def health(self):
+        return self.client.health()
+
+class InProcessTarget:
+    """Drives the Flask app in this process through its test client
+
+    Loads the service with OPENVOICE_BACKEND (stub unless already set), so
+    the numbers cover routing, queueing, batching, caching and encoding.
+    """
+
+    name = 'in-process'
+
+    def __init__(self):
+        os.environ.setdefault('OPENVOICE_BACKEND', 'stub')
+        sys.path.insert(0, os.path.join(PROJECT_ROOT, 'services'))
+        import openvoice_service
+        openvoice_service.load_openvoice(warm=True)
+        if openvoice_service.openvoice_model is None:
+            raise RuntimeError(f"OpenVoice failed to load: {openvoice_service.service_state['error']}")
+        self.client = openvoice_service.app.test_client()
+
+    def post(self, path, payload, stream=False):
+        start = time.perf_counter()
+        first_chunk = None
+        body = bytearray()
+        response = self.client.post(path, json=payload, buffered=False)
+        try:
+            for chunk in response.iter_encoded():
+                if first_chunk is None and chunk:
+                    first_chunk = time.perf_counter() - start
+                body += chunk
+        finally:
+            response.close()
+        total = time.perf_counter() - start
+        return response.status_code, first_chunk if first_chunk is not None else total, total, bytes(body)
+
+    def health(self):
+        return self.client.get('/health').get_json()
+
+def wav_duration(body):
+    """Seconds of audio in a 16-bit mono WAV produced by /synthesize"""
+    if len(body) < 44 or body[:4] != b'RIFF':
+        return None
+    sample_rate = int.from_bytes(body[24:28], 'little')
+    return (len(body) - 44) / 2 / sample_rate if sample_rate else None
+
+def percentile(values, pct):
+    """Nearest-rank percentile of a list of numbers"""
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+def summarize(latencies, rtfs=()):
+    """p50/p95/p99 latency and median real-time factor (None when nothing succeeded)"""
+    if not latencies:
+        return {'p50': None, 'p95': None, 'p99': None, 'rtf': None}
+    return {
+        'p50': round(percentile(latencies, 50), 4),
+        'p95': round(percentile(latencies, 95), 4),
+        'p99': round(percentile(latencies, 99), 4),
+        'rtf': round(statistics.median(rtfs), 4) if rtfs else None,
+    }
+
+def run_benchmark(target, style, repeat):
+    """Benchmark both endpoints over all benchmark texts"""
+    results = []
+    for label, text in BENCHMARK_TEXTS.items():
+        for endpoint, stream in (('/synthesize', False), ('/synthesize/stream', True)):
+            payload = {'text': text, 'language': 'en', 'style': style, 'cache': False}
+            first_chunks, totals = [], []
+            for _ in range(repeat):
+                status, first_chunk, total, body = target.post(endpoint, payload, stream)
+                if status != 200:
+                    raise RuntimeError(f"{endpoint} returned {status}: {body[:200]!r}")
+                first_chunks.append(first_chunk)
+                totals.append(total)
+            results.append({
+                'text': label,
+                'chars': len(text),
+                'endpoint': endpoint,
+                'bytes': len(body),
+                'first_chunk_median': round(statistics.median(first_chunks), 4),
+                'total_median': round(statistics.median(totals), 4),
+            })
+    return results
+
+def run_watermark_comparison(target, style, repeat):
+    """Median /synthesize latency with the watermark stage off versus on"""
+    results = []
+    for label, text in BENCHMARK_TEXTS.items():
+        medians = {}
+        for mode in ('off', 'on'):
+            payload = {'text': text, 'language': 'en', 'style': style, 'watermark': mode, 'cache': False}
+            totals = [target.post('/synthesize', payload)[2] for _ in range(repeat)]
+            medians[mode] = statistics.median(totals)
+        results.append({
+            'text': label,
+            'chars': len(text),
+            'watermark_off': round(medians['off'], 4),
+            'watermark_on': round(medians['on'], 4),
+            'watermark_cost': round(medians['on'] - medians['off'], 4),
+        })
+    return results
+
+def run_load(target, styles, concurrency_levels, requests_per_level):
+    """Throughput and latency of /synthesize at each concurrency level
+
+    Requests cycle through the benchmark texts and the given styles, use
+    distinct text and bypass the utterance cache so the models do real work.
+    """
+    texts = list(BENCHMARK_TEXTS.values())
+    results = []
+    for concurrency in concurrency_levels:
+        def one_request(index):
+            payload = {
+                'text': f"{texts[index % len(texts)]} Number {index}.",
+                'language': 'en',
+                'style': styles[index % len(styles)],
+                'cache': False,
+            }
+            status, _, total, body = target.post('/synthesize', payload)
+            return total, status, wav_duration(body) if status == 200 else None
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            outcomes = list(executor.map(one_request, range(requests_per_level)))
+        elapsed = time.perf_counter() - start
+
+        ok = [(latency, duration) for latency, status, duration in outcomes if status == 200]
+        latencies = [latency for latency, _ in ok]
+        audio_seconds = sum(duration for _, duration in ok if duration)
+        results.append({
+            'concurrency': concurrency,
+            'requests': requests_per_level,
+            'ok': len(ok),
+            'rejected': sum(1 for _, status, _ in outcomes if status == 503),
+            'timeouts': sum(1 for _, status, _ in outcomes if status == 504),
+            'throughput_rps': round(len(ok) / elapsed, 3),
+            'audio_seconds_per_second': round(audio_seconds / elapsed, 3),
+            **summarize(latencies, [latency / duration for latency, duration in ok if duration]),
+        })
+    return results
+
+def run_latency_matrix(target, repeat):
+    """Sequential /synthesize latency for every text length and style"""
+    results = []
+    for label, text in BENCHMARK_TEXTS.items():
+        for style in VOICE_STYLES:
+            latencies, rtfs = [], []
+            for index in range(repeat):
+                payload = {'text': text, 'language': 'en', 'style': style, 'cache': False}
+                status, _, total, body = target.post('/synthesize', payload)
+                if status != 200:
+                    raise RuntimeError(f"/synthesize returned {status} for {label}/{style}: {body[:200]!r}")
+                latencies.append(total)
+                duration = wav_duration(body)
+                if duration:
+                    rtfs.append(total / duration)
+            results.append({'text': label, 'chars': len(text), 'style': style, **summarize(latencies, rtfs)})
+    return results
+
+def git_revision():
+    """Current commit (with a -dirty suffix for uncommitted changes), or None outside git"""
+    try:
+        revision = subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=PROJECT_ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+        dirty = subprocess.run(
+            ['git', 'status', '--porcelain', '--untracked-files=no'], cwd=PROJECT_ROOT, capture_output=True, text=True
+        ).stdout.strip()
+        return f"{revision}-dirty" if dirty else revision
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run_suite(target, repeat, concurrency_levels, requests_per_level):
+    """Latency matrix plus load levels, with the metadata needed to compare runs across commits"""
+    latency = run_latency_matrix(target, repeat)
+    load = run_load(target, VOICE_STYLES, concurrency_levels, requests_per_level)
+    health = target.health()
+    return {
+        'meta': {
+            'revision': git_revision(),
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'target': target.name,
+            'backend': health.get('backend'),
+            'python': platform.python_version(),
+            'machine': f"{platform.system()} {platform.machine()}",
+            'repeat': repeat,
+            'requests_per_level': requests_per_level,
+            'config': {key: value for key, value in sorted(os.environ.items()) if key.startswith('OPENVOICE_')},
+        },
+        'latency': latency,
+        'load': load,
+        'peak_rss_bytes': (health.get('process') or {}).get('peak_rss_bytes'),
+    }
+
+def suite_rows(results):
+    """Flatten suite results to {row name: metrics} for comparisons"""
+    rows = {f"latency {r['text']}/{r['style']}": r for r in results['latency']}
+    rows.update({f"load c={r['concurrency']}": r for r in results['load']})
+    return rows
+
+def compare_suites(baseline, current):
+    """Relative change of the key metrics for every row present in both runs"""
+    baseline_rows = suite_rows(baseline)
+    changes = []
+    for name, row in suite_rows(current).items():
+        old = baseline_rows.get(name)
+        if old is None:
+            continue
+        change = {'row': name}
+        for metric in ('p50', 'p95', 'p99', 'throughput_rps'):
+            if row.get(metric) is not None and old.get(metric):
+                change[metric] = round(row[metric] / old[metric] - 1, 4)
+        changes.append(change)
+    if baseline.get('peak_rss_bytes') and current.get('peak_rss_bytes'):
+        changes.append({'row': 'peak_rss', 'bytes': round(current['peak_rss_bytes'] / baseline['peak_rss_bytes'] - 1, 4)})
+    return changes
+
+def print_suite(results, comparison=None):
+    meta = results['meta']
+    print(f"✅ {meta['target']} / {meta['backend']} backend at {meta['revision']} (repeat: {meta['repeat']})")
+    print()
+    print(f"{'text':<10} {'style':<11} {'p50':>9} {'p95':>9} {'p99':>9} {'RTF':>7}")
+    print("-" * 60)
+    for r in results['latency']:
+        print(f"{r['text']:<10} {r['style']:<11} {r['p50']:>8.3f}s {r['p95']:>8.3f}s {r['p99']:>8.3f}s {r['rtf']:>7.3f}")
+    print()
+    print(f"{'concurrency':>11} {'ok':>5} {'503':>5} {'req/s':>8} {'p50':>9} {'p95':>9} {'p99':>9}")
+    print("-" * 62)
+    for r in results['load']:
+        p50, p95, p99 = (f"{r[p]:.3f}s" if r[p] is not None else '-' for p in ('p50', 'p95', 'p99'))
+        print(f"{r['concurrency']:>11} {r['ok']:>5} {r['rejected']:>5} {r['throughput_rps']:>8.2f} {p50:>9} {p95:>9} {p99:>9}")
+    if results['peak_rss_bytes']:
+        print()
+        print(f"Peak RSS: {results['peak_rss_bytes'] / (1024 * 1024):.1f} MB")
+    if comparison:
+        print()
+        print("Change vs baseline:")
+        for change in comparison:
+            deltas = ', '.join(f"{metric} {value:+.1%}" for metric, value in change.items() if metric != 'row')
+            print(f"   {change['row']:<28} {deltas}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark OpenVoice synthesis latency")
+    parser.add_argument('--repeat', type=int, default=3, help="Requests per text/endpoint (default: 3)")
+    parser.add_argument('--style', default='default', help="Voice style (default: default)")
+    parser.add_argument('--json', action='store_true', help="Print machine-readable JSON")
+    parser.add_argument('--load', action='store_true', help="Measure throughput vs latency under concurrent load")
+    parser.add_argument('--concurrency', default='1,2,4,8', help="Concurrency levels for --load (default: 1,2,4,8)")
+    parser.add_argument('--requests', type=int, default=32, help="Requests per concurrency level (default: 32)")
+    parser.add_argument('--compare-watermark', action='store_true', help="Compare latency with the watermark stage off and on")
+    parser.add_argument('--suite', action='store_true', help="Every text length and style, plus all concurrency levels")
+    parser.add_argument('--in-process', action='store_true',
+                        help="Run the service in this process (OPENVOICE_BACKEND defaults to stub)")
+    parser.add_argument('--output', help="Write --suite results to this JSON file")
+    parser.add_argument('--baseline', help="Compare --suite results with a previous --output file")
+    args = parser.parse_args()
+
+    levels = [int(level) for level in args.concurrency.split(',')]
+    if args.in_process:
+        target = InProcessTarget()
+    else:
+        from openvoice_client import discover
+        base_url = discover()
+        if base_url is None:
+            print("❌ OpenVoice service not found on ports 6000-6009")
+            print("   Make sure to start it: ./services/start_openvoice.sh")
+            return 1
+        target = HTTPTarget(base_url, pool_size=max(levels))
+    where = "in this process" if args.in_process else f"on {target.base_url}"
+
+    if args.suite:
+        results = run_suite(target, args.repeat, levels, args.requests)
+        comparison = None
+        if args.baseline:
+            with open(args.baseline) as f:
+                comparison = compare_suites(json.load(f), results)
+            results['baseline'] = {'file': args.baseline, 'changes': comparison}
+        if args.output:
+            with open(args.output, 'w') as f:
+                json.dump(results, f, indent=2)
+        if args.json:
+            print(json.dumps(results, indent=2))
+        else:
+            print_suite(results, comparison)
+        return 0
+
+    if args.load:
+        results = run_load(target, [args.style], levels, args.requests)
+        if args.json:
+            print(json.dumps(results, indent=2))
+            return 0
+        print(f"✅ OpenVoice service {where} (style: {args.style}, {args.requests} requests per level)")
+        print()
+        print(f"{'concurrency':>11} {'ok':>5} {'503':>5} {'req/s':>8} {'p50':>9} {'p95':>9}")
+        print("-" * 52)
+        for r in results:
+            p50 = f"{r['p50']:.3f}s" if r['p50'] is not None else '-'
+            p95 = f"{r['p95']:.3f}s" if r['p95'] is not None else '-'
+            print(f"{r['concurrency']:>11} {r['ok']:>5} {r['rejected']:>5} {r['throughput_rps']:>8.2f} {p50:>9} {p95:>9}")
+        return 0
+
+    if args.compare_watermark:
+        results = run_watermark_comparison(target, args.style, args.repeat)
+        if args.json:
+            print(json.dumps(results, indent=2))
+            return 0
+        print(f"✅ OpenVoice service {where} (style: {args.style}, repeat: {args.repeat})")
+        print()
+        print(f"{'text':<10} {'watermark off':>14} {'watermark on':>13} {'cost':>9}")
+        print("-" * 50)
+        for r in results:
+            print(f"{r['text']:<10} {r['watermark_off']:>13.3f}s {r['watermark_on']:>12.3f}s {r['watermark_cost']:>8.3f}s")
+        return 0
+
+    results = run_benchmark(target, args.style, args.repeat)
+
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return 0
+
+    print(f"✅ OpenVoice service {where} (style: {args.style}, repeat: {args.repeat})")
+    print()
+    print(f"{'text':<10} {'endpoint':<20} {'first chunk':>12} {'total':>10} {'bytes':>10}")
+    print("-" * 66)
+    for r in results:
+        print(f"{r['text']:<10} {r['endpoint']:<20} {r['first_chunk_median']:>11.3f}s {r['total_median']:>9.3f}s {r['bytes']:>10,}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,107 +1,351 @@
 #!/usr/bin/env python3
 """
 OpenVoice Voice Training Script
-Analyzes jon.m4a and extracts voice embedding for Sprout
+Builds Sprout's reference voice from one or more recordings (default: Jon.m4a)
+
+Recordings are decoded in parallel worker processes, trimmed to speech with a
+voice activity detector and cut into segments once. The speaker embedding is
+then extracted from those segments and stored where the OpenVoice service
+looks for it, so the service starts with the voice ready. A manifest keyed by
+each recording's content hash lets re-runs skip recordings that haven't changed.
 
 Usage:
     source openvoice_env/bin/activate
-    python open.py
-    
+    python open.py                      # Jon.m4a
+    python open.py recordings/ extra.wav
+
     OR
-    
+
     openvoice_env/bin/python3.11 open.py
 """
 
 import os
 import sys
+import json
+import time
+import shutil
+import hashlib
+import argparse
 import subprocess
-import tempfile
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
 
-# Add OpenVoice to path
-sys.path.insert(0, os.path.join(os.path.dirname(__file__), 'openvoice'))
+import numpy as np
 
-# Try to use openvoice_env Python if available
 script_dir = os.path.dirname(os.path.abspath(__file__))
-openvoice_env_python = os.path.join(script_dir, 'openvoice_env', 'bin', 'python3.11')
-if os.path.exists(openvoice_env_python):
-    print(f"ℹ️  Note: For best results, run with: {openvoice_env_python} open.py")
 
-def convert_m4a_to_wav(m4a_path, wav_path):
-    """Convert M4A to WAV using ffmpeg"""
+# Add OpenVoice and the service modules to path
+sys.path.insert(0, os.path.join(script_dir, 'openvoice'))
+sys.path.insert(0, os.path.join(script_dir, 'services'))
+
+from audio_encoding import encode_wav
+from embedding_store import SpeakerEmbeddingStore, hash_file
+from openvoice_backend import resample
+from voice_registry import TARGET_PEAK, decode_audio
+
+RESOURCES_DIR = os.path.join(script_dir, 'resources', 'audio')
+SEGMENTS_DIR = os.path.join(RESOURCES_DIR, 'segments')
+MANIFEST_PATH = os.path.join(RESOURCES_DIR, 'voice_manifest.json')
+CONVERTER_DIR = os.path.join(script_dir, 'checkpoints', 'converter')
+
+SAMPLE_RATE = 22050  # Sample rate of the tone color converter
+AUDIO_EXTENSIONS = ('.wav', '.m4a', '.mp3', '.flac', '.ogg', '.aac', '.aif', '.aiff', '.caf')
+
+# Energy VAD: 30ms frames are speech when louder than the noise floor plus a
+# margin; pauses shorter than MAX_PAUSE stay inside a speech region
+FRAME_SECONDS = 0.03
+VAD_MARGIN_DB = 12.0
+VAD_RANGE_DB = 45.0  # Frames this far below the loudest frame are never speech
+MIN_SPEECH_SECONDS = 0.3
+MAX_PAUSE_SECONDS = 0.4
+PAD_SECONDS = 0.1
+# Speech is cut into segments of about this length for the speaker encoder (like se_extractor)
+SEGMENT_SECONDS = 10.0
+MIN_SEGMENT_SECONDS = 1.0
+
+# Recordings processed with other settings are processed again
+PIPELINE = {
+    'version': 1, 'sample_rate': SAMPLE_RATE, 'frame': FRAME_SECONDS, 'margin_db': VAD_MARGIN_DB,
+    'range_db': VAD_RANGE_DB, 'min_speech': MIN_SPEECH_SECONDS, 'max_pause': MAX_PAUSE_SECONDS,
+    'pad': PAD_SECONDS, 'segment': SEGMENT_SECONDS, 'min_segment': MIN_SEGMENT_SECONDS,
+}
+
+
+def decode_file(path):
+    """Mono float32 waveform at SAMPLE_RATE
+
+    WAV is decoded with the standard library and FLAC/OGG/AIFF with
+    soundfile, both in-process; only containers neither can read (M4A/AAC)
+    go through ffmpeg, streamed over a pipe instead of a temp file.
+    """
+    if path.lower().endswith('.wav'):
+        with open(path, 'rb') as f:
+            return decode_audio(f.read(), SAMPLE_RATE)
+    try:
+        import soundfile
+        audio, rate = soundfile.read(path, dtype='float32', always_2d=True)
+        return resample(audio.mean(axis=1), rate, SAMPLE_RATE)
+    except (ImportError, RuntimeError):
+        pass
+
+    cmd = ['ffmpeg', '-v', 'error', '-i', path, '-f', 'f32le', '-ac', '1', '-ar', str(SAMPLE_RATE), '-']
     try:
-        cmd = [
-            'ffmpeg', '-i', m4a_path,
-            '-ar', '22050',  # Sample rate for OpenVoice
-            '-ac', '1',      # Mono
-            '-y',            # Overwrite
-            wav_path
-        ]
-        result = subprocess.run(cmd, capture_output=True, text=True)
-        if result.returncode != 0:
-            print(f"❌ FFmpeg error: {result.stderr}")
-            return False
-        print(f"✅ Converted {m4a_path} to {wav_path}")
-        return True
+        result = subprocess.run(cmd, capture_output=True)
     except FileNotFoundError:
-        print("❌ FFmpeg not found. Please install: brew install ffmpeg")
-        return False
-    except Exception as e:
-        print(f"❌ Conversion error: {e}")
-        return False
-
-def extract_voice_embedding(audio_path, output_path):
-    """Extract speaker embedding from audio using OpenVoice"""
-    print(f"ℹ️  Voice embedding will be extracted on first use by OpenVoice service")
-    print(f"   Reference audio saved: {audio_path}")
-    print(f"   The OpenVoice service will automatically extract the embedding when needed")
-    return True
+        raise RuntimeError("FFmpeg not found. Please install: brew install ffmpeg")
+    if result.returncode != 0:
+        raise RuntimeError(f"FFmpeg error: {result.stderr.decode(errors='replace').strip()}")
+    return np.frombuffer(result.stdout, dtype=np.float32).copy()
+
+
+def detect_speech(audio, sample_rate):
+    """[(start, end)] sample ranges that contain speech"""
+    frame = int(FRAME_SECONDS * sample_rate)
+    frames = len(audio) // frame
+    if frames == 0:
+        return []
+    rms = np.sqrt(np.mean(audio[:frames * frame].reshape(frames, frame).astype(np.float64) ** 2, axis=1))
+    level = 20 * np.log10(np.maximum(rms, 1e-10))
+    threshold = max(np.percentile(level, 10) + VAD_MARGIN_DB, level.max() - VAD_RANGE_DB)
+    voiced = np.flatnonzero(level > threshold)
+    if len(voiced) == 0:
+        return []
+
+    # Runs of voiced frames, merged across short pauses
+    max_gap = int(MAX_PAUSE_SECONDS / FRAME_SECONDS)
+    regions = []
+    start = previous = voiced[0]
+    for index in voiced[1:]:
+        if index - previous > max_gap + 1:
+            regions.append((start, previous + 1))
+            start = index
+        previous = index
+    regions.append((start, previous + 1))
+
+    pad = int(PAD_SECONDS * sample_rate)
+    min_frames = MIN_SPEECH_SECONDS / FRAME_SECONDS
+    return [
+        (max(0, first * frame - pad), min(len(audio), last * frame + pad))
+        for first, last in regions if last - first >= min_frames
+    ]
+
+
+def split_segments(speech, sample_rate):
+    """Cut speech into SEGMENT_SECONDS pieces, folding a short tail into the last piece"""
+    size = int(SEGMENT_SECONDS * sample_rate)
+    segments = [speech[i:i + size] for i in range(0, len(speech), size)]
+    if len(segments) > 1 and len(segments[-1]) < MIN_SEGMENT_SECONDS * sample_rate:
+        tail = segments.pop()
+        segments[-1] = np.concatenate([segments[-1], tail])
+    return segments
+
+
+def ingest_recording(path, digest):
+    """Decode, VAD and segment one recording (runs in a worker process)
+
+    Segments are written as WAV files under SEGMENTS_DIR/<digest>; only their
+    paths and a summary go back to the parent process.
+    """
+    start = time.perf_counter()
+    audio = decode_file(path)
+    regions = detect_speech(audio, SAMPLE_RATE)
+    speech = np.concatenate([audio[first:last] for first, last in regions]) if regions else audio[:0]
+    if len(speech) < MIN_SEGMENT_SECONDS * SAMPLE_RATE:
+        raise ValueError(f"less than {MIN_SEGMENT_SECONDS:g}s of speech found")
+    speech = (speech * (TARGET_PEAK / float(np.max(np.abs(speech))))).astype(np.float32)
+
+    segment_dir = os.path.join(SEGMENTS_DIR, digest[:16])
+    shutil.rmtree(segment_dir, ignore_errors=True)
+    os.makedirs(segment_dir)
+    segments = []
+    for index, segment in enumerate(split_segments(speech, SAMPLE_RATE)):
+        segment_path = os.path.join(segment_dir, f'{index:03d}.wav')
+        with open(segment_path, 'wb') as f:
+            f.write(encode_wav(segment, SAMPLE_RATE))
+        segments.append(os.path.relpath(segment_path, RESOURCES_DIR))
+    return {
+        'path': os.path.abspath(path),
+        'duration': round(len(audio) / SAMPLE_RATE, 2),
+        'speech_seconds': round(len(speech) / SAMPLE_RATE, 2),
+        'segments': segments,
+        'seconds': round(time.perf_counter() - start, 2),
+    }
+
+
+def find_recordings(inputs):
+    """Audio files named on the command line or found (recursively) in named directories"""
+    recordings = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for root, _, files in os.walk(item):
+                recordings.extend(
+                    os.path.join(root, name) for name in sorted(files) if name.lower().endswith(AUDIO_EXTENSIONS)
+                )
+        else:
+            recordings.append(item)
+    return list(dict.fromkeys(os.path.abspath(path) for path in recordings))
+
+
+def load_manifest():
+    try:
+        with open(MANIFEST_PATH) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {'recordings': {}, 'voice': None}
+    if manifest.get('pipeline') != PIPELINE:
+        manifest['recordings'] = {}
+    return manifest
+
+
+def save_manifest(manifest):
+    manifest['pipeline'] = PIPELINE
+    with open(f'{MANIFEST_PATH}.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f'{MANIFEST_PATH}.tmp', MANIFEST_PATH)
+
+
+def is_current(entry):
+    return all(os.path.exists(os.path.join(RESOURCES_DIR, segment)) for segment in entry['segments'])
+
+
+def extract_voice_embedding(segment_paths, reference_path):
+    """Extract the speaker embedding from the speech segments with the tone color converter
+
+    The embedding is stored under the content hash of reference_path, where
+    the OpenVoice service looks it up at startup (plus <name>_embedding.npy).
+    """
+    import torch
+    from openvoice.api import ToneColorConverter
+
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    converter = ToneColorConverter(os.path.join(CONVERTER_DIR, 'config.json'), device=device)
+    converter.load_ckpt(os.path.join(CONVERTER_DIR, 'checkpoint.pth'))
+    se = converter.extract_se(segment_paths)
+    SpeakerEmbeddingStore(os.path.join(RESOURCES_DIR, 'embeddings')).put(reference_path, se)
+    return se
+
 
 def main():
-    """Main function to process jon.m4a"""
+    """Ingest the recordings and build the reference voice"""
+    parser = argparse.ArgumentParser(description="Build Sprout's reference voice from recordings")
+    parser.add_argument('inputs', nargs='*', default=[os.path.join(script_dir, 'Jon.m4a')],
+                        help="Audio files or directories (default: Jon.m4a)")
+    parser.add_argument('--name', default='jon', help="Voice name for <name>_reference.wav (default: jon)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help="Decoding processes (default: CPU count)")
+    parser.add_argument('--force', action='store_true', help="Reprocess every recording and re-extract the embedding")
+    args = parser.parse_args()
+
     print("🌱 Sprout Voice Training - OpenVoice Analysis")
     print("=" * 50)
-    
-    # Paths
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    m4a_path = os.path.join(script_dir, 'Jon.m4a')
-    resources_dir = os.path.join(script_dir, 'resources', 'audio')
-    wav_path = os.path.join(resources_dir, 'jon_reference.wav')
-    embedding_path = os.path.join(resources_dir, 'jon_embedding.npy')
-    
-    # Check if input file exists
-    if not os.path.exists(m4a_path):
-        print(f"❌ Audio file not found: {m4a_path}")
-        print("   Please ensure Jon.m4a is in the Sprout directory")
+    openvoice_env_python = os.path.join(script_dir, 'openvoice_env', 'bin', 'python3.11')
+    if os.path.exists(openvoice_env_python) and sys.executable != openvoice_env_python:
+        print(f"ℹ️  Note: For best results, run with: {openvoice_env_python} open.py")
+
+    recordings = find_recordings(args.inputs)
+    missing = [path for path in recordings if not os.path.isfile(path)]
+    if missing or not recordings:
+        for path in missing:
+            print(f"❌ Audio file not found: {path}")
+        if not recordings:
+            print("❌ No audio files found")
+        print("   Please ensure Jon.m4a is in the Sprout directory, or pass recordings to open.py")
         return 1
-    
-    # Create resources directory if needed
-    os.makedirs(resources_dir, exist_ok=True)
-    
-    # Step 1: Convert M4A to WAV
-    print("\n📦 Step 1: Converting M4A to WAV...")
-    if not convert_m4a_to_wav(m4a_path, wav_path):
+
+    os.makedirs(RESOURCES_DIR, exist_ok=True)
+    manifest = {'recordings': {}, 'voice': None} if args.force else load_manifest()
+
+    # Step 1: Decode, VAD and segment the recordings that changed
+    print(f"\n📦 Step 1: Processing {len(recordings)} recording(s)...")
+    with ThreadPoolExecutor(max_workers=min(8, len(recordings))) as executor:
+        digests = dict(zip(recordings, executor.map(hash_file, recordings)))
+    todo = {}
+    for path, digest in digests.items():
+        entry = manifest['recordings'].get(digest)
+        if entry is not None and is_current(entry):
+            print(f"   ⏭️  {os.path.basename(path)} unchanged")
+        else:
+            todo.setdefault(digest, path)
+
+    failed = []
+    if todo:
+        with ProcessPoolExecutor(max_workers=max(1, min(args.workers, len(todo)))) as executor:
+            futures = {executor.submit(ingest_recording, path, digest): digest for digest, path in todo.items()}
+            for future in as_completed(futures):
+                digest = futures[future]
+                name = os.path.basename(todo[digest])
+                try:
+                    entry = future.result()
+                except Exception as e:
+                    print(f"   ❌ {name}: {e}")
+                    failed.append(digest)
+                    continue
+                manifest['recordings'][digest] = entry
+                print(f"   ✅ {name}: {entry['speech_seconds']}s of speech in {entry['duration']}s, "
+                      f"{len(entry['segments'])} segment(s) ({entry['seconds']}s)")
+
+    # Drop recordings that are no longer part of the voice
+    used = [digest for digest in dict.fromkeys(digests.values()) if digest not in failed]
+    for digest in set(manifest['recordings']) - set(used):
+        manifest['recordings'].pop(digest)
+        shutil.rmtree(os.path.join(SEGMENTS_DIR, digest[:16]), ignore_errors=True)
+    save_manifest(manifest)
+    if not used:
+        print("❌ No usable speech in the recordings")
         return 1
-    
-    # Step 2: Note about embedding (will be extracted by service)
-    print("\n🎤 Step 2: Voice embedding setup...")
-    extract_voice_embedding(wav_path, embedding_path)
-    
-    # Step 3: Copy WAV as reference for OpenVoice service
-    reference_path = os.path.join(resources_dir, 'reference.wav')
-    if os.path.exists(wav_path):
-        import shutil
-        shutil.copy2(wav_path, reference_path)
-        print(f"✅ Reference voice saved to {reference_path}")
-    
+
+    segments = [os.path.join(RESOURCES_DIR, segment) for digest in used for segment in manifest['recordings'][digest]['segments']]
+    wav_path = os.path.join(RESOURCES_DIR, f'{args.name}_reference.wav')
+    reference_path = os.path.join(RESOURCES_DIR, 'reference.wav')
+    voice_key = hashlib.sha256(json.dumps([used, PIPELINE]).encode()).hexdigest()
+    embedding_path = os.path.join(RESOURCES_DIR, f'{args.name}_embedding.npy')
+
+    voice = manifest.get('voice') or {}
+    if voice.get('key') == voice_key and voice.get('embedding') and all(
+            os.path.exists(path) for path in (wav_path, reference_path, embedding_path)):
+        print("\n✅ Voice is up to date, nothing to extract")
+        return 0
+
+    # Step 2: Reference audio is the speech of every recording back to back
+    print("\n🎙️  Step 2: Writing reference audio...")
+    speech = np.concatenate([decode_file(path) for path in segments])
+    for path in (wav_path, reference_path):
+        with open(f'{path}.tmp', 'wb') as f:
+            f.write(encode_wav(speech, SAMPLE_RATE))
+        os.replace(f'{path}.tmp', path)
+    print(f"✅ Reference voice saved to {wav_path} ({len(speech) / SAMPLE_RATE:.1f}s of speech)")
+
+    # Step 3: Speaker embedding, once, from the segments
+    print("\n🎤 Step 3: Extracting voice embedding...")
+    start = time.perf_counter()
+    try:
+        extract_voice_embedding(segments, wav_path)
+        extracted = True
+        print(f"✅ Voice embedding extracted from {len(segments)} segment(s) in {time.perf_counter() - start:.1f}s")
+    except (ImportError, OSError) as e:
+        extracted = False
+        print(f"⚠️  Could not extract the voice embedding here ({e})")
+        print("   The OpenVoice service will extract it on first start")
+
+    manifest['voice'] = {
+        'key': voice_key,
+        'name': args.name,
+        'reference': os.path.relpath(wav_path, RESOURCES_DIR),
+        'reference_sha256': hash_file(wav_path),
+        'speech_seconds': round(len(speech) / SAMPLE_RATE, 2),
+        'segments': len(segments),
+        'embedding': extracted,
+        'updated_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+    }
+    save_manifest(manifest)
+
     print("\n" + "=" * 50)
     print("✅ Voice training complete!")
-    print(f"   Reference audio: {reference_path}")
-    print(f"   Voice embedding: {embedding_path}")
-    print("\n🌱 Sprout will now use Jon's voice for all responses!")
+    print(f"   Reference audio: {wav_path}")
+    if extracted:
+        print(f"   Voice embedding: {embedding_path}")
+    print(f"\n🌱 Sprout will now use {args.name.capitalize()}'s voice for all responses!")
     print("   Restart the OpenVoice service to apply changes.")
-    
-    return 0
+
+    return 1 if failed else 0
 
 if __name__ == '__main__':
     sys.exit(main())
-
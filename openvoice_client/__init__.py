@@ -0,0 +1,25 @@
+"""
+Python client for the Sprout OpenVoice service
+Cached port discovery, pooled keep-alive connections, streaming and retries,
+for scripts, load tests and backend integrations
+
+    from openvoice_client import OpenVoiceClient
+
+    with OpenVoiceClient() as client:
+        wav = client.synthesize("Hello Seedling!", style="cheerful")
+        for chunk in client.synthesize_stream("One. Two. Three."):
+            play(chunk)
+
+AsyncOpenVoiceClient has the same methods as coroutines (needs aiohttp).
+"""
+
+from .common import VOICE_STYLES, OpenVoiceError, ServiceUnavailableError
+from .discovery import DEFAULT_PORTS, discover, forget_endpoint
+from .client import OpenVoiceClient
+from .aio import AsyncOpenVoiceClient
+
+__all__ = [
+    'VOICE_STYLES', 'OpenVoiceError', 'ServiceUnavailableError',
+    'DEFAULT_PORTS', 'discover', 'forget_endpoint',
+    'OpenVoiceClient', 'AsyncOpenVoiceClient',
+]
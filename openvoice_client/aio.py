@@ -0,0 +1,179 @@
+"""
+asyncio OpenVoice client on aiohttp (optional: pip install aiohttp)
+"""
+
+import asyncio
+
+from .common import (
+    BATCH_TIMEOUT, RETRY_STATUSES, VOICE_POLL_INTERVAL, Backoff, FrameParser, OpenVoiceError,
+    ServiceUnavailableError, error_message, http_timeout, parse_retry_after, read_audio_file, synthesis_payload,
+)
+from .discovery import discover, forget_endpoint
+
+try:
+    import aiohttp
+except ImportError:
+    aiohttp = None
+
+
+class AsyncOpenVoiceClient:
+    """asyncio counterpart of OpenVoiceClient with the same methods as coroutines
+
+    One aiohttp session with a keep-alive connector capped at `pool_size`
+    connections; gather() several synthesize() calls (or use
+    synthesize_many) to keep that many requests in flight.
+    """
+
+    def __init__(self, base_url=None, timeout=60, retries=3, pool_size=8, backoff=None):
+        if aiohttp is None:
+            raise ImportError("AsyncOpenVoiceClient needs aiohttp (pip install aiohttp)")
+        self._configured_url = base_url.rstrip('/') if base_url else None
+        self._base_url = self._configured_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.backoff = backoff or Backoff(retries)
+        self._session = None
+
+    @property
+    def session(self):
+        # Created lazily so the client can be constructed outside a running loop
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(connector=aiohttp.TCPConnector(limit=self.pool_size))
+        return self._session
+
+    async def base_url(self):
+        if self._base_url is None:
+            self._base_url = await asyncio.to_thread(discover)
+            if self._base_url is None:
+                raise ServiceUnavailableError("OpenVoice service not found (set OPENVOICE_URL or start ./services/start_openvoice.sh)")
+        return self._base_url
+
+    async def url(self, path):
+        return await self.base_url() + path
+
+    def _rediscover(self):
+        if self._configured_url is None:
+            forget_endpoint()
+            self._base_url = None
+
+    async def _request(self, method, path, timeout=None, make_form=None, **kwargs):
+        """Send with retries; returns the (2xx) response, raises OpenVoiceError otherwise
+
+        The caller releases the response (async with, or read it fully).
+        make_form builds a fresh FormData per attempt (aiohttp sends one only once).
+        """
+        last_error = None
+        for attempt in range(self.backoff.retries + 1):
+            retry_after = None
+            if make_form is not None:
+                kwargs['data'] = make_form()
+            try:
+                response = await self.session.request(
+                    method, await self.url(path),
+                    timeout=aiohttp.ClientTimeout(sock_read=timeout or self.timeout, sock_connect=10),
+                    **kwargs
+                )
+            except aiohttp.ClientConnectionError as e:
+                last_error = ServiceUnavailableError(f"Could not reach OpenVoice at {self._base_url}: {e}")
+                self._rediscover()
+            else:
+                if response.status < 400:
+                    return response
+                body = await response.read()
+                response.release()
+                error = OpenVoiceError(
+                    response.status, error_message(body), parse_retry_after(response.headers.get('Retry-After'))
+                )
+                if response.status not in RETRY_STATUSES:
+                    raise error
+                last_error, retry_after = error, error.retry_after
+            if attempt < self.backoff.retries:
+                await asyncio.sleep(self.backoff.delay(attempt, retry_after))
+        raise last_error
+
+    async def _read(self, method, path, **kwargs):
+        async with await self._request(method, path, **kwargs) as response:
+            return await response.read()
+
+    async def health(self):
+        async with await self._request('GET', '/health', timeout=5) as response:
+            return await response.json()
+
+    async def ready(self):
+        """True once the models are loaded and warmed up (no retries)"""
+        try:
+            async with self.session.get(await self.url('/ready'), timeout=aiohttp.ClientTimeout(total=5)) as response:
+                return response.status == 200
+        except (aiohttp.ClientError, asyncio.TimeoutError):
+            return False
+
+    async def synthesize(self, text, style='default', language='en', accept=None, cache=None, watermark=None, timeout=None,
+                         voice=None):
+        """Audio bytes for text; accept picks the format (e.g. 'audio/flac', 'audio/pcm;rate=16000')
+
+        voice is an id returned by clone() (default: the service's reference voice).
+        """
+        headers = {'Accept': accept} if accept else {}
+        payload = synthesis_payload(text, style, language, cache, watermark, timeout, voice)
+        return await self._read('POST', '/synthesize', json=payload, headers=headers, timeout=http_timeout(timeout))
+
+    async def synthesize_stream(self, text, style='default', language='en', stream_format='frames',
+                                cache=None, watermark=None, timeout=None, voice=None):
+        """Async-iterate audio as it is rendered: one WAV file per sentence ('frames') or raw WAV chunks ('wav')"""
+        payload = synthesis_payload(text, style, language, cache, watermark, timeout, voice, format=stream_format)
+        async with await self._request('POST', '/synthesize/stream', json=payload, timeout=http_timeout(timeout)) as response:
+            parser = FrameParser() if stream_format == 'frames' else None
+            async for chunk in response.content.iter_any():
+                if parser is None:
+                    yield chunk
+                    continue
+                for frame in parser.feed(chunk):
+                    yield frame
+            if parser is not None:
+                parser.finish()
+
+    async def synthesize_many(self, texts, style='default', **options):
+        """Synthesize several texts concurrently (up to pool_size at once), in input order"""
+        return await asyncio.gather(*(self.synthesize(text, style, **options) for text in texts))
+
+    async def synthesize_batch(self, items, audio_format='audio/wav', known=None, timeout=None):
+        """Zip archive bytes from /synthesize/batch for [{"id", "text", "style"}] items"""
+        payload = {'items': items, 'format': audio_format, 'known': known or {}}
+        return await self._read('POST', '/synthesize/batch', json=payload, timeout=timeout or max(self.timeout, BATCH_TIMEOUT))
+
+    async def clone(self, audio, wait=True, timeout=120):
+        """Register reference audio (a path, bytes or binary file) as a voice; returns its id
+
+        With wait=True this waits until the service has prepared the voice.
+        """
+        name, data = read_audio_file(audio)
+
+        def make_form():
+            form = aiohttp.FormData()
+            form.add_field('audio', data, filename=name, content_type='audio/wav')
+            return form
+
+        async with await self._request('POST', '/clone', make_form=make_form) as response:
+            voice = await response.json()
+        deadline = asyncio.get_running_loop().time() + timeout
+        while wait and voice['state'] == 'pending' and asyncio.get_running_loop().time() < deadline:
+            await asyncio.sleep(VOICE_POLL_INTERVAL)
+            voice = await self.voice(voice['voice'])
+        if voice['state'] == 'failed':
+            raise OpenVoiceError(422, voice.get('error') or 'Voice preparation failed')
+        return voice['voice']
+
+    async def voice(self, voice_id):
+        """State of a cloned voice: {"voice", "state": pending|ready|failed, "error"}"""
+        async with await self._request('GET', f'/voices/{voice_id}', timeout=5) as response:
+            return await response.json()
+
+    async def close(self):
+        if self._session is not None:
+            await self._session.close()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.close()
@@ -0,0 +1,159 @@
+"""
+Synchronous OpenVoice client on a pooled requests.Session (pip install requests)
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from .common import (
+    BATCH_TIMEOUT, RETRY_STATUSES, VOICE_POLL_INTERVAL, Backoff, FrameParser, OpenVoiceError,
+    ServiceUnavailableError, error_message, http_timeout, parse_retry_after, read_audio_file, synthesis_payload,
+)
+from .discovery import discover, forget_endpoint
+
+try:
+    import requests
+    from requests.adapters import HTTPAdapter
+except ImportError:
+    requests = None
+
+
+class OpenVoiceClient:
+    """Client for /health, /synthesize, /synthesize/stream, /synthesize/batch and /clone
+
+    base_url defaults to discover() (OPENVOICE_URL, the cached endpoint or a
+    port scan). Requests share keep-alive connections from a pool of
+    `pool_size`, so concurrent calls from several threads (see
+    synthesize_many) don't pay a TCP handshake each. Connection errors and
+    502/503/504 are retried with backoff; a discovered endpoint that stops
+    answering is looked up again before the next attempt.
+    """
+
+    def __init__(self, base_url=None, timeout=60, retries=3, pool_size=8, backoff=None):
+        if requests is None:
+            raise ImportError("OpenVoiceClient needs requests (pip install requests)")
+        self._configured_url = base_url.rstrip('/') if base_url else None
+        self._base_url = self._configured_url
+        self.timeout = timeout
+        self.pool_size = pool_size
+        self.backoff = backoff or Backoff(retries)
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+    @property
+    def base_url(self):
+        if self._base_url is None:
+            self._base_url = discover()
+            if self._base_url is None:
+                raise ServiceUnavailableError("OpenVoice service not found (set OPENVOICE_URL or start ./services/start_openvoice.sh)")
+        return self._base_url
+
+    def url(self, path):
+        return self.base_url + path
+
+    def _rediscover(self):
+        if self._configured_url is None:
+            forget_endpoint()
+            self._base_url = None
+
+    def _request(self, method, path, stream=False, timeout=None, **kwargs):
+        """Send with retries; returns the (2xx) response, raises OpenVoiceError otherwise"""
+        last_error = None
+        for attempt in range(self.backoff.retries + 1):
+            retry_after = None
+            try:
+                response = self.session.request(
+                    method, self.url(path), stream=stream, timeout=timeout or self.timeout, **kwargs
+                )
+            except requests.ConnectionError as e:
+                last_error = ServiceUnavailableError(f"Could not reach OpenVoice at {self._base_url}: {e}")
+                self._rediscover()
+            else:
+                if response.status_code < 400:
+                    return response
+                error = OpenVoiceError(
+                    response.status_code, error_message(response.content),
+                    parse_retry_after(response.headers.get('Retry-After')),
+                )
+                response.close()
+                if response.status_code not in RETRY_STATUSES:
+                    raise error
+                last_error, retry_after = error, error.retry_after
+            if attempt < self.backoff.retries:
+                time.sleep(self.backoff.delay(attempt, retry_after))
+        raise last_error
+
+    def health(self):
+        return self._request('GET', '/health', timeout=5).json()
+
+    def ready(self):
+        """True once the models are loaded and warmed up (no retries)"""
+        try:
+            return self.session.get(self.url('/ready'), timeout=5).status_code == 200
+        except requests.RequestException:
+            return False
+
+    def synthesize(self, text, style='default', language='en', accept=None, cache=None, watermark=None, timeout=None,
+                   voice=None):
+        """Audio bytes for text; accept picks the format (e.g. 'audio/flac', 'audio/pcm;rate=16000')
+
+        voice is an id returned by clone() (default: the service's reference voice).
+        """
+        headers = {'Accept': accept} if accept else {}
+        payload = synthesis_payload(text, style, language, cache, watermark, timeout, voice)
+        return self._request('POST', '/synthesize', json=payload, headers=headers, timeout=http_timeout(timeout)).content
+
+    def synthesize_stream(self, text, style='default', language='en', stream_format='frames',
+                          cache=None, watermark=None, timeout=None, voice=None):
+        """Yield audio as it is rendered: one WAV file per sentence ('frames') or raw WAV chunks ('wav')"""
+        payload = synthesis_payload(text, style, language, cache, watermark, timeout, voice, format=stream_format)
+        response = self._request('POST', '/synthesize/stream', stream=True, json=payload, timeout=http_timeout(timeout))
+        with response:
+            if stream_format != 'frames':
+                yield from response.iter_content(chunk_size=None)
+                return
+            parser = FrameParser()
+            for chunk in response.iter_content(chunk_size=None):
+                yield from parser.feed(chunk)
+            parser.finish()
+
+    def synthesize_many(self, texts, style='default', max_workers=None, **options):
+        """Synthesize several texts concurrently over the pooled connections, in input order"""
+        with ThreadPoolExecutor(max_workers=max_workers or self.pool_size) as executor:
+            return list(executor.map(lambda text: self.synthesize(text, style, **options), texts))
+
+    def synthesize_batch(self, items, audio_format='audio/wav', known=None, timeout=None):
+        """Zip archive bytes from /synthesize/batch for [{"id", "text", "style"}] items"""
+        payload = {'items': items, 'format': audio_format, 'known': known or {}}
+        timeout = timeout or max(self.timeout, BATCH_TIMEOUT)
+        return self._request('POST', '/synthesize/batch', json=payload, timeout=timeout).content
+
+    def clone(self, audio, wait=True, timeout=120):
+        """Register reference audio (a path, bytes or binary file) as a voice; returns its id
+
+        With wait=True this blocks until the service has prepared the voice.
+        """
+        name, data = read_audio_file(audio)
+        voice = self._request('POST', '/clone', files={'audio': (name, data, 'audio/wav')}).json()
+        deadline = time.monotonic() + timeout
+        while wait and voice['state'] == 'pending' and time.monotonic() < deadline:
+            time.sleep(VOICE_POLL_INTERVAL)
+            voice = self.voice(voice['voice'])
+        if voice['state'] == 'failed':
+            raise OpenVoiceError(422, voice.get('error') or 'Voice preparation failed')
+        return voice['voice']
+
+    def voice(self, voice_id):
+        """State of a cloned voice: {"voice", "state": pending|ready|failed, "error"}"""
+        return self._request('GET', f'/voices/{voice_id}', timeout=5).json()
+
+    def close(self):
+        self.session.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
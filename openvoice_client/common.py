@@ -0,0 +1,123 @@
+"""
+Pieces shared by the sync and asyncio clients: errors, retry backoff and the
+parser for the streaming endpoint's length-prefixed WAV frames
+"""
+
+import os
+import json
+import random
+import struct
+
+VOICE_STYLES = [
+    "default", "excited", "friendly", "cheerful", "sad",
+    "angry", "terrified", "shouting", "whispering",
+]
+
+FRAMES_MIMETYPE = 'application/x-sprout-wav-frames'
+FRAME_HEADER = struct.Struct('<I')
+
+# Statuses worth retrying: queue full / models loading, and gateway hiccups
+RETRY_STATUSES = (502, 503, 504)
+
+# A whole batch chunk renders before the first byte comes back
+BATCH_TIMEOUT = 600
+
+# Seconds between /voices/<id> checks while a cloned voice is prepared
+VOICE_POLL_INTERVAL = 0.5
+
+
+class OpenVoiceError(Exception):
+    """The service answered with an error status"""
+
+    def __init__(self, status, message, retry_after=None):
+        super().__init__(f"OpenVoice returned {status}: {message}")
+        self.status = status
+        self.message = message
+        self.retry_after = retry_after
+
+
+class ServiceUnavailableError(OpenVoiceError):
+    """No service could be reached (or it stayed busy through every retry)"""
+
+    def __init__(self, message):
+        super().__init__(None, message)
+
+
+class Backoff:
+    """Exponential backoff with full jitter, honoring the server's Retry-After"""
+
+    def __init__(self, retries=3, base=0.25, cap=5.0):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+
+    def delay(self, attempt, retry_after=None):
+        """Seconds to wait before retry number `attempt` (0-based)"""
+        if retry_after is not None:
+            return min(self.cap, retry_after)
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+def parse_retry_after(value):
+    try:
+        return max(0.0, float(value))
+    except (TypeError, ValueError):
+        return None
+
+
+def error_message(body):
+    """Best-effort error text from a JSON error response body"""
+    try:
+        return json.loads(body).get('error', '') or body[:200].decode('utf-8', 'replace')
+    except (ValueError, AttributeError):
+        return body[:200].decode('utf-8', 'replace')
+
+
+class FrameParser:
+    """Incremental parser for [uint32 LE length][WAV file] frames
+
+    Feed it chunks as they arrive; it yields each complete frame.
+    """
+
+    def __init__(self):
+        self._buffer = bytearray()
+
+    def feed(self, chunk):
+        self._buffer += chunk
+        frames = []
+        while len(self._buffer) >= FRAME_HEADER.size:
+            (length,) = FRAME_HEADER.unpack_from(self._buffer)
+            end = FRAME_HEADER.size + length
+            if len(self._buffer) < end:
+                break
+            frames.append(bytes(self._buffer[FRAME_HEADER.size:end]))
+            del self._buffer[:end]
+        return frames
+
+    def finish(self):
+        if self._buffer:
+            raise OpenVoiceError(200, f"Stream ended inside a frame ({len(self._buffer)} bytes left)")
+
+
+def synthesis_payload(text, style='default', language='en', cache=None, watermark=None, timeout=None, voice=None, **extra):
+    """JSON body for /synthesize and /synthesize/stream (None leaves the server default)"""
+    payload = {'text': text, 'style': style, 'language': language, **extra}
+    for key, value in (('cache', cache), ('watermark', watermark), ('timeout', timeout), ('voice', voice)):
+        if value is not None:
+            payload[key] = value
+    return payload
+
+
+def http_timeout(timeout):
+    """Socket timeout for a request with a server-side timeout: long enough to receive its 504"""
+    return timeout + 5 if timeout else None
+
+
+def read_audio_file(audio):
+    """(file name, bytes) for clone(): accepts a path, bytes or a binary file object"""
+    if isinstance(audio, (bytes, bytearray)):
+        return 'reference.wav', bytes(audio)
+    if isinstance(audio, (str, os.PathLike)):
+        with open(audio, 'rb') as f:
+            return os.path.basename(audio), f.read()
+    return os.path.basename(getattr(audio, 'name', 'reference.wav')), audio.read()
@@ -0,0 +1,86 @@
+"""
+Locate a running OpenVoice service
+
+Order: OPENVOICE_URL, then the endpoint cached by an earlier discovery (good
+for CACHE_TTL seconds), then a parallel /health probe of ports 6000-6009.
+Uses only the standard library so both clients (and plain scripts) share it.
+"""
+
+import os
+import json
+import time
+import tempfile
+import http.client
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+DEFAULT_HOST = 'localhost'
+DEFAULT_PORTS = range(6000, 6010)
+CACHE_FILE = os.environ.get(
+    'OPENVOICE_ENDPOINT_CACHE', os.path.join(tempfile.gettempdir(), 'sprout-openvoice-endpoint.json')
+)
+CACHE_TTL = 300
+PROBE_TIMEOUT = 0.5
+
+
+def probe(url, timeout=PROBE_TIMEOUT):
+    """True if GET /health answers 200 at url"""
+    parts = urlsplit(url)
+    connection = http.client.HTTPConnection(parts.hostname, parts.port, timeout=timeout)
+    try:
+        connection.request('GET', '/health')
+        return connection.getresponse().status == 200
+    except (OSError, http.client.HTTPException):
+        return False
+    finally:
+        connection.close()
+
+
+def _read_cache():
+    try:
+        with open(CACHE_FILE) as f:
+            cached = json.load(f)
+        if time.time() - cached['checked_at'] < CACHE_TTL:
+            return cached['url']
+    except (OSError, ValueError, KeyError, TypeError):
+        pass
+    return None
+
+
+def _write_cache(url):
+    try:
+        with open(f'{CACHE_FILE}.tmp', 'w') as f:
+            json.dump({'url': url, 'checked_at': time.time()}, f)
+        os.replace(f'{CACHE_FILE}.tmp', CACHE_FILE)
+    except OSError:
+        pass  # Discovery still works, just without the shortcut next time
+
+
+def forget_endpoint():
+    """Drop the cached endpoint (after it stopped answering)"""
+    try:
+        os.remove(CACHE_FILE)
+    except OSError:
+        pass
+
+
+def discover(host=DEFAULT_HOST, ports=DEFAULT_PORTS, refresh=False):
+    """Base URL of the OpenVoice service (e.g. http://localhost:6000), or None"""
+    configured = os.environ.get('OPENVOICE_URL')
+    if configured:
+        return configured.rstrip('/')
+    if not refresh:
+        cached = _read_cache()
+        if cached:
+            return cached
+
+    candidates = [f'http://{host}:{port}' for port in ports]
+    with ThreadPoolExecutor(max_workers=len(candidates) or 1) as executor:
+        answers = list(executor.map(probe, candidates))
+    # Lowest port wins, like the sequential scan did
+    for url, alive in zip(candidates, answers):
+        if alive:
+            _write_cache(url)
+            return url
+    forget_endpoint()
+    return None
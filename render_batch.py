@@ -0,0 +1,180 @@
+#!/usr/bin/env python3
+"""
+Render a manifest of phrases offline through the OpenVoice service
+Reads a JSONL manifest of {"id", "text", "style", "voice"} items, renders them with
+/synthesize/batch and writes one audio file per item plus index.json.
+Re-running only renders items that are new or changed (text, style, voice,
+model or format); --archive also packs the result into a zip
+Usage: python render_batch.py manifest.jsonl [--output rendered/] [--archive sessions.zip]
+       [--format audio/flac] [--chunk-size 32] [--parallel 2]
+"""
+
+import io
+import os
+import sys
+import json
+import argparse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+
+from openvoice_client import OpenVoiceClient, OpenVoiceError, discover
+
+INDEX_FILE = 'index.json'
+
+def read_manifest(path, default_style, default_voice=None):
+    """Load manifest items, failing on malformed lines or duplicate ids"""
+    items, seen = [], set()
+    with open(path) as f:
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError as e:
+                raise ValueError(f"{path}:{number}: invalid JSON ({e})")
+            if not isinstance(item, dict) or item.get('id') in (None, '') or not item.get('text'):
+                raise ValueError(f"{path}:{number}: every item needs an id and text")
+            item_id = str(item['id'])
+            if item_id in seen:
+                raise ValueError(f"{path}:{number}: duplicate id {item_id}")
+            seen.add(item_id)
+            entry = {'id': item_id, 'text': item['text'], 'style': item.get('style', default_style)}
+            voice = item.get('voice', default_voice)
+            if voice:
+                entry['voice'] = voice
+            items.append(entry)
+    return items
+
+def load_index(output_dir):
+    """Previous run's index entries by id (only those whose file is still there)"""
+    try:
+        with open(os.path.join(output_dir, INDEX_FILE)) as f:
+            index = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return {
+        entry['id']: entry for entry in index.get('items', [])
+        if entry.get('file') and os.path.exists(os.path.join(output_dir, entry['file']))
+    }
+
+def write_index(output_dir, audio_format, entries):
+    """Atomically replace index.json so an interrupted run can resume"""
+    path = os.path.join(output_dir, INDEX_FILE)
+    with open(f'{path}.tmp', 'w') as f:
+        json.dump({'format': audio_format, 'items': entries}, f, indent=2)
+    os.replace(f'{path}.tmp', path)
+
+def render_chunk(client, items, audio_format, known):
+    """POST one chunk to /synthesize/batch; returns (index entries, {file name: bytes})"""
+    known = {item['id']: known[item['id']] for item in items if item['id'] in known}
+    content = client.synthesize_batch(items, audio_format, known)
+    with zipfile.ZipFile(io.BytesIO(content)) as archive:
+        index = json.loads(archive.read(INDEX_FILE))
+        files = {name: archive.read(name) for name in archive.namelist() if name != INDEX_FILE}
+    return index, files
+
+def claim_file(owners, entry):
+    """The entry, or a failed one if another item already owns its file name
+
+    owners maps case-folded file names (macOS folds case) to item ids across
+    every chunk and the previous run, so one item never overwrites another's file.
+    """
+    owner = owners.setdefault(entry['file'].lower(), entry['id'])
+    if owner == entry['id']:
+        return entry
+    failed = {key: value for key, value in entry.items() if key not in ('file', 'duration')}
+    return {**failed, 'status': 'failed', 'error': f"file name {entry['file']} is already used by {owner} (re-run with --force)"}
+
+def write_archive(output_dir, entries, archive_path):
+    """Pack the rendered files and index.json into one zip"""
+    with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_STORED) as archive:
+        for entry in entries:
+            if entry.get('file'):
+                archive.write(os.path.join(output_dir, entry['file']), entry['file'])
+        archive.write(os.path.join(output_dir, INDEX_FILE), INDEX_FILE)
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a JSONL manifest of phrases with OpenVoice")
+    parser.add_argument('manifest', help="JSONL file with one {\"id\", \"text\", \"style\"} object per line")
+    parser.add_argument('--output', default='rendered', help="Output directory (default: rendered)")
+    parser.add_argument('--archive', help="Also pack the output into this zip file")
+    parser.add_argument('--format', default='audio/wav', help="audio/wav (default), audio/flac, audio/ogg;codecs=opus, audio/pcm;rate=16000")
+    parser.add_argument('--style', default='default', help="Style for items without one (default: default)")
+    parser.add_argument('--voice', help="Voice id from /clone for items without one (default: the reference voice)")
+    parser.add_argument('--chunk-size', type=int, default=32, help="Items per request (default: 32)")
+    parser.add_argument('--parallel', type=int, default=1, help="Requests in flight, e.g. one per supervisor worker (default: 1)")
+    parser.add_argument('--force', action='store_true', help="Re-render everything")
+    args = parser.parse_args()
+
+    try:
+        items = read_manifest(args.manifest, args.style, args.voice)
+    except (OSError, ValueError) as e:
+        print(f"❌ {e}")
+        return 1
+
+    base_url = discover()
+    if base_url is None:
+        print("❌ OpenVoice service not found on ports 6000-6009")
+        print("   Make sure to start it: ./services/start_openvoice.sh")
+        return 1
+    client = OpenVoiceClient(base_url, pool_size=max(1, args.parallel))
+
+    os.makedirs(args.output, exist_ok=True)
+    previous = {} if args.force else load_index(args.output)
+    # A different format changes every key, so nothing is reused across formats
+    known = {item_id: entry['key'] for item_id, entry in previous.items() if entry.get('status') != 'failed'}
+    print(f"✅ OpenVoice service on {base_url}: {len(items)} items, {len(known)} previously rendered")
+
+    entries = {}
+    owners = {entry['file'].lower(): item_id for item_id, entry in previous.items()}
+    server_format = args.format
+    chunks = [items[start:start + args.chunk_size] for start in range(0, len(items), args.chunk_size)]
+    summary = {'rendered': 0, 'unchanged': 0, 'failed': 0}
+    with ThreadPoolExecutor(max_workers=max(1, args.parallel)) as executor:
+        futures = [executor.submit(render_chunk, client, chunk, args.format, known) for chunk in chunks]
+        for number, future in enumerate(futures, 1):
+            try:
+                index, files = future.result()
+            except (OpenVoiceError, OSError, zipfile.BadZipFile) as e:
+                print(f"❌ Chunk {number}/{len(chunks)} failed: {e}")
+                for item in chunks[number - 1]:
+                    entries[item['id']] = {**item, 'status': 'failed', 'error': str(e)}
+                summary['failed'] += len(chunks[number - 1])
+                continue
+
+            server_format = index['format']
+            for entry in index['items']:
+                if entry['status'] == 'unchanged':
+                    entry = {**previous[entry['id']], 'status': 'unchanged'}
+                elif entry['status'] == 'rendered':
+                    entry = claim_file(owners, entry)
+                if entry['status'] == 'rendered':
+                    with open(os.path.join(args.output, entry['file']), 'wb') as f:
+                        f.write(files[entry['file']])
+                elif entry['status'] == 'failed' and entry.get('error'):
+                    print(f"⚠️  {entry['id']}: {entry['error']}")
+                summary[entry['status']] += 1
+                entries[entry['id']] = entry
+            print(f"   Chunk {number}/{len(chunks)}: {summary}")
+            ordered = [entries[item['id']] for item in items if item['id'] in entries]
+            write_index(args.output, server_format, ordered + [
+                entry for item_id, entry in previous.items() if item_id not in entries
+            ])
+
+    # Drop files no current entry points at: items that left the manifest (or were renamed),
+    # files an item was re-rendered away from, and old renders of items that failed this time
+    current = {entry.get('file') for entry in entries.values()}
+    for entry in previous.values():
+        if entry['file'] not in current:
+            os.remove(os.path.join(args.output, entry['file']))
+    ordered = [entries[item['id']] for item in items if item['id'] in entries]
+    write_index(args.output, server_format, ordered)
+
+    if args.archive:
+        write_archive(args.output, ordered, args.archive)
+        print(f"📦 Archive: {args.archive}")
+    print(f"✅ Done: {summary['rendered']} rendered, {summary['unchanged']} unchanged, {summary['failed']} failed -> {args.output}")
+    return 1 if summary['failed'] else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+"""
+Rendered utterance cache for the Sprout OpenVoice service
+Content-addressed LRU of synthesized audio: in-memory tier with a byte budget
+plus an optional on-disk tier with size-based eviction
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_encoding import encode_wav
+
+
+def utterance_key(*parts):
+    """Content address for everything that affects the rendered audio"""
+    return hashlib.sha256(json.dumps(parts, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class AudioCache:
+    """Two-tier LRU cache of (audio, sample_rate) keyed by utterance_key()"""
+
+    def __init__(self, max_bytes, disk_dir=None, disk_max_bytes=0):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir if disk_max_bytes > 0 else None
+        self.disk_max_bytes = disk_max_bytes
+        self._entries = OrderedDict()  # key -> (audio, sample_rate)
+        self._bytes = 0
+        self._disk_bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {'memory_hits': 0, 'disk_hits': 0, 'misses': 0, 'evictions': 0, 'disk_evictions': 0}
+        self._writer = None  # Background disk writer, created on first deferred write
+
+        if self.disk_dir is not None:
+            os.makedirs(self.disk_dir, exist_ok=True)
+            self._disk_bytes = sum(entry.stat().st_size for entry in os.scandir(self.disk_dir) if entry.is_file())
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f'{key}.wav')
+
+    def __contains__(self, key):
+        """Whether key is cached in either tier (does not count as a lookup)"""
+        with self._lock:
+            if key in self._entries:
+                return True
+        return self.disk_dir is not None and os.path.exists(self._disk_path(key))
+
+    def get(self, key):
+        """Return cached (audio, sample_rate) or None"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self._counters['memory_hits'] += 1
+                return entry
+
+        entry = self._read_disk(key)
+        with self._lock:
+            if entry is None:
+                self._counters['misses'] += 1
+                return None
+            self._counters['disk_hits'] += 1
+            self._insert(key, entry)
+        return entry
+
+    def put(self, key, audio, sample_rate, persist_transform=None):
+        """Store rendered audio in memory and (if enabled) on disk
+
+        persist_transform(audio) -> audio, if given, is applied only to the
+        disk copy, on a background thread, so the caller never waits for it.
+        """
+        audio = np.asarray(audio, dtype=np.float32)
+        audio.setflags(write=False)
+        entry = (audio, sample_rate)
+        with self._lock:
+            self._insert(key, entry)
+        if self.disk_dir is None:
+            return
+        if persist_transform is None:
+            self._write_disk(key, entry)
+            return
+
+        with self._lock:
+            if self._writer is None:
+                self._writer = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audio-cache-writer')
+        self._writer.submit(self._transform_and_write, key, entry, persist_transform)
+
+    def _transform_and_write(self, key, entry, persist_transform):
+        audio, sample_rate = entry
+        try:
+            self._write_disk(key, (persist_transform(audio), sample_rate))
+        except Exception as e:
+            print(f"⚠️  Could not persist audio cache entry: {e}")
+
+    def _insert(self, key, entry):
+        """Insert into the memory tier and evict least recently used entries (lock held)"""
+        size = entry[0].nbytes
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self._bytes -= previous[0].nbytes
+        self._entries[key] = entry
+        self._bytes += size
+        while self._bytes > self.max_bytes:
+            _, (evicted, _) = self._entries.popitem(last=False)
+            self._bytes -= evicted.nbytes
+            self._counters['evictions'] += 1
+
+    def _read_disk(self, key):
+        if self.disk_dir is None:
+            return None
+        from scipy.io import wavfile
+        path = self._disk_path(key)
+        try:
+            sample_rate, pcm = wavfile.read(path)
+            os.utime(path)  # Refresh recency for eviction
+        except (OSError, ValueError):
+            return None
+        audio = pcm.astype(np.float32) / 32767.0
+        audio.setflags(write=False)
+        return audio, sample_rate
+
+    def _write_disk(self, key, entry):
+        if self.disk_dir is None:
+            return
+        path = self._disk_path(key)
+        if os.path.exists(path):
+            return
+        data = encode_wav(*entry)
+        tmp_path = f'{path}.tmp'
+        try:
+            with open(tmp_path, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"⚠️  Could not write audio cache entry: {e}")
+            return
+        with self._lock:
+            self._disk_bytes += len(data)
+            over_budget = self._disk_bytes > self.disk_max_bytes
+        if over_budget:
+            self._evict_disk()
+
+    def _evict_disk(self):
+        """Remove least recently used files until the disk tier fits its budget"""
+        files = []
+        for entry in os.scandir(self.disk_dir):
+            if entry.is_file() and entry.name.endswith('.wav'):
+                stat = entry.stat()
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        files.sort()
+        total = sum(size for _, size, _ in files)
+        evicted = 0
+        for _, size, path in files:
+            if total <= self.disk_max_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            total -= size
+            evicted += 1
+        with self._lock:
+            self._disk_bytes = total
+            self._counters['disk_evictions'] += evicted
+
+    def stats(self):
+        """Hit/miss counters and tier occupancy"""
+        with self._lock:
+            lookups = self._counters['memory_hits'] + self._counters['disk_hits'] + self._counters['misses']
+            hits = lookups - self._counters['misses']
+            return {
+                'entries': len(self._entries),
+                'bytes': self._bytes,
+                'max_bytes': self.max_bytes,
+                'disk_bytes': self._disk_bytes if self.disk_dir else None,
+                'disk_max_bytes': self.disk_max_bytes if self.disk_dir else None,
+                'hit_rate': round(hits / lookups, 4) if lookups else None,
+                **self._counters,
+            }
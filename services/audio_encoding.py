@@ -0,0 +1,197 @@
+#!/usr/bin/env python3
+"""
+Audio encoding helpers for the Sprout OpenVoice service
+Encode float waveforms straight to response bytes without touching disk
+"""
+
+import io
+import struct
+from collections import namedtuple
+
+import numpy as np
+
+
+def float_to_pcm16(audio):
+    """Convert a float waveform in [-1, 1] to little-endian 16-bit PCM bytes"""
+    audio = np.clip(np.asarray(audio, dtype=np.float32), -1.0, 1.0)
+    return (audio * 32767.0).astype('<i2').tobytes()
+
+
+def float_to_pcm(audio, bits=16):
+    """Convert a float waveform in [-1, 1] to little-endian signed PCM bytes (16, 24 or 32 bit)"""
+    if bits == 16:
+        return float_to_pcm16(audio)
+    audio = np.clip(np.asarray(audio, dtype=np.float64), -1.0, 1.0)
+    samples = (audio * (2 ** (bits - 1) - 1)).astype('<i4')
+    if bits == 32:
+        return samples.tobytes()
+    # 24-bit: keep the low three bytes of each little-endian int32
+    return samples.view(np.uint8).reshape(-1, 4)[:, :3].tobytes()
+
+
+def wav_header(sample_rate, data_size, channels=1, bits_per_sample=16):
+    """Return a 44-byte PCM WAV header for data_size bytes of audio"""
+    byte_rate = sample_rate * channels * bits_per_sample // 8
+    block_align = channels * bits_per_sample // 8
+    return struct.pack(
+        '<4sI4s4sIHHIIHH4sI',
+        b'RIFF', 36 + data_size, b'WAVE',
+        b'fmt ', 16, 1, channels, sample_rate, byte_rate, block_align, bits_per_sample,
+        b'data', data_size
+    )
+
+
+def encode_wav(audio, sample_rate, bits=16):
+    """Encode a float waveform as a mono PCM WAV file in memory (16-bit unless asked otherwise)"""
+    pcm = float_to_pcm(audio, bits)
+    return wav_header(sample_rate, len(pcm), bits_per_sample=bits) + pcm
+
+
+# Streaming responses
+#
+# 'frames': a sequence of [uint32 little-endian length][complete WAV file],
+#           one frame per sentence, so clients can play each as it arrives.
+# 'wav':    one WAV header with open-ended sizes followed by 16-bit PCM as it
+#           is rendered, for players that accept streaming WAV.
+STREAM_FORMATS = ('frames', 'wav')
+FRAMES_MIMETYPE = 'application/x-sprout-wav-frames'
+FRAME_HEADER = struct.Struct('<I')
+STREAMING_DATA_SIZE = 0xFFFFFFFF - 36
+
+
+def encode_frame(payload):
+    """Prefix a payload with its uint32 little-endian length"""
+    return FRAME_HEADER.pack(len(payload)) + payload
+
+
+def streaming_wav_header(sample_rate):
+    """WAV header with maximal RIFF/data sizes for audio of unknown length"""
+    return wav_header(sample_rate, STREAMING_DATA_SIZE)
+
+
+def silence_pcm16(sample_rate, seconds):
+    """16-bit PCM silence of the given duration"""
+    return b'\x00\x00' * int(sample_rate * seconds)
+
+
+# Negotiated /synthesize response formats
+#
+# Picked from the Accept header; parameters select the encoding, e.g.
+#   audio/wav                       16-bit WAV at the model rate (default)
+#   audio/pcm;rate=16000;bits=16    headerless little-endian signed PCM
+#   audio/flac                      lossless, about half the size of WAV
+#   audio/ogg;codecs=opus           lossy, for slow links (8/12/16/24/48 kHz)
+AudioFormat = namedtuple('AudioFormat', 'name sample_rate bits')
+
+RESPONSE_MIMETYPES = {
+    'audio/wav': 'wav', 'audio/wave': 'wav', 'audio/x-wav': 'wav',
+    'audio/pcm': 'pcm',
+    'audio/flac': 'flac', 'audio/x-flac': 'flac',
+    'audio/ogg': 'opus', 'audio/opus': 'opus',
+}
+FORMAT_BIT_DEPTHS = {'wav': (16, 24, 32), 'pcm': (16, 24, 32), 'flac': (16, 24), 'opus': (16,)}
+OPUS_SAMPLE_RATES = (8000, 12000, 16000, 24000, 48000)
+FILE_EXTENSIONS = {'wav': '.wav', 'pcm': '.pcm', 'flac': '.flac', 'opus': '.ogg'}
+MIN_SAMPLE_RATE = 8000
+MAX_SAMPLE_RATE = 48000
+
+
+class UnsupportedFormatError(ValueError):
+    """No acceptable response format, or invalid format parameters"""
+
+
+def parse_accept(header):
+    """Split an Accept header into (mimetype, params, q), highest q first (stable for ties)"""
+    entries = []
+    for item in (header or '').split(','):
+        parts = [part.strip() for part in item.split(';')]
+        if not parts[0]:
+            continue
+        params = {}
+        for part in parts[1:]:
+            key, _, value = part.partition('=')
+            params[key.strip().lower()] = value.strip().strip('"')
+        try:
+            q = float(params.pop('q', 1))
+        except ValueError:
+            q = 0.0
+        if q > 0:
+            entries.append((parts[0].lower(), params, q))
+    return sorted(entries, key=lambda entry: -entry[2])
+
+
+def compressed_format_available(name):
+    """Whether soundfile (libsndfile) can write FLAC / Ogg Opus on this machine"""
+    try:
+        import soundfile
+    except ImportError:
+        return False
+    if name == 'flac':
+        return 'FLAC' in soundfile.available_formats()
+    return 'OPUS' in soundfile.available_subtypes('OGG')
+
+
+def negotiate_format(accept_header, sample_rate):
+    """Pick the response AudioFormat for an Accept header
+
+    Missing, */* and audio/* headers get the historical 16-bit WAV at the
+    model rate. Raises UnsupportedFormatError when nothing acceptable can
+    be produced.
+    """
+    entries = parse_accept(accept_header) or [('*/*', {}, 1.0)]
+    for mimetype, params, _ in entries:
+        name = 'wav' if mimetype in ('*/*', 'audio/*') else RESPONSE_MIMETYPES.get(mimetype)
+        if name is None:
+            continue
+        if mimetype == 'audio/ogg' and params.get('codecs', 'opus') != 'opus':
+            continue
+        if name in ('flac', 'opus') and not compressed_format_available(name):
+            continue
+        return _format_with_params(name, params, sample_rate)
+    raise UnsupportedFormatError(f"None of the accepted types can be produced: {accept_header}")
+
+
+def _format_with_params(name, params, sample_rate):
+    try:
+        rate = int(params.get('rate', 0)) or None
+        bits = int(params.get('bits', 16))
+    except ValueError:
+        raise UnsupportedFormatError(f"Invalid rate/bits parameters for {name}: {params}")
+    if name == 'opus':
+        # Opus only runs at a handful of rates; default to the closest one above the model rate
+        rate = rate or next((r for r in OPUS_SAMPLE_RATES if r >= sample_rate), OPUS_SAMPLE_RATES[-1])
+        if rate not in OPUS_SAMPLE_RATES:
+            raise UnsupportedFormatError(f"Opus rate must be one of {OPUS_SAMPLE_RATES}")
+    rate = rate or sample_rate
+    if not MIN_SAMPLE_RATE <= rate <= MAX_SAMPLE_RATE:
+        raise UnsupportedFormatError(f"Sample rate must be between {MIN_SAMPLE_RATE} and {MAX_SAMPLE_RATE}")
+    if bits not in FORMAT_BIT_DEPTHS[name]:
+        raise UnsupportedFormatError(f"{name} supports bit depths {FORMAT_BIT_DEPTHS[name]}")
+    return AudioFormat(name, rate, bits)
+
+
+def content_type(audio_format):
+    """Content-Type describing an encoded response"""
+    if audio_format.name == 'pcm':
+        return f'audio/pcm;rate={audio_format.sample_rate};bits={audio_format.bits};channels=1'
+    if audio_format.name == 'opus':
+        return 'audio/ogg;codecs=opus'
+    return f'audio/{audio_format.name}'
+
+
+def encode_audio(audio, audio_format):
+    """Encode a float waveform (already at audio_format.sample_rate) in memory"""
+    if audio_format.name == 'wav':
+        return encode_wav(audio, audio_format.sample_rate, bits=audio_format.bits)
+    if audio_format.name == 'pcm':
+        return float_to_pcm(audio, audio_format.bits)
+
+    import soundfile
+    buffer = io.BytesIO()
+    if audio_format.name == 'flac':
+        soundfile.write(buffer, np.asarray(audio, dtype=np.float32), audio_format.sample_rate,
+                        format='FLAC', subtype=f'PCM_{audio_format.bits}')
+    else:
+        soundfile.write(buffer, np.asarray(audio, dtype=np.float32), audio_format.sample_rate,
+                        format='OGG', subtype='OPUS')
+    return buffer.getvalue()
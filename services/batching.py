@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Micro-batching scheduler for the Sprout OpenVoice service
+Collects synthesis requests that arrive within a short window and runs them
+through the models as one padded batch
+"""
+
+import time
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from inference_pool import InferenceTimeoutError, PoolBusyError
+
+
+class MicroBatcher:
+    """Groups submissions into batches for run_batch(payloads) -> results
+
+    A batch closes when max_batch items are waiting or window_ms has passed
+    since its first item. At most `concurrency` batches run at once; while
+    all of them are busy, new requests keep accumulating into the next batch.
+    A batch that fails is retried item by item, so only the failing
+    submission sees the error.
+    """
+
+    def __init__(self, run_batch, window_ms=20, max_batch=8, concurrency=1, queue_size=8, timeout=60.0):
+        self.run_batch = run_batch
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._slots = threading.Semaphore(concurrency)
+        self._lock = threading.Lock()
+        self._counters = {'batches': 0, 'items': 0, 'rejected': 0, 'timeouts': 0, 'failed': 0, 'split': 0}
+        self._batch_sizes = {}
+        self._collector = threading.Thread(target=self._collect, name='openvoice-batcher', daemon=True)
+        self._collector.start()
+
+    def submit(self, payload, timeout=None, wait_for_slot=False):
+        """Queue one payload and wait for its share of the batch result"""
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        try:
+            if wait_for_slot:
+                self._queue.put((future, payload), timeout=timeout)
+            else:
+                self._queue.put_nowait((future, payload))
+        except queue.Full:
+            self._count('rejected')
+            raise PoolBusyError(f'Batch queue is full ({self.queue_size} waiting)')
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            self._count('timeouts')
+            raise InferenceTimeoutError(f'Synthesis did not finish within {timeout}s')
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _collect(self):
+        while True:
+            # Wait for a free slot first so everything queued meanwhile joins this batch
+            self._slots.acquire()
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.window
+            while len(batch) < self.max_batch:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            # Drop requests whose caller already timed out
+            batch = [(future, payload) for future, payload in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                self._slots.release()
+                continue
+            threading.Thread(target=self._run, args=(batch,), name='openvoice-batch', daemon=True).start()
+
+    def _run(self, batch):
+        try:
+            try:
+                results = self.run_batch([payload for _, payload in batch])
+            except (InferenceTimeoutError, PoolBusyError):
+                raise
+            except Exception:
+                if len(batch) == 1:
+                    raise
+                # One bad item must not fail the requests batched with it: retry each on its own
+                self._count('split')
+                for future, payload in batch:
+                    self._run_alone(future, payload)
+                return
+            for (future, _), result in zip(batch, results):
+                future.set_result(result)
+        except BaseException as e:
+            self._count('failed', len(batch))
+            for future, _ in batch:
+                future.set_exception(e)
+        finally:
+            with self._lock:
+                self._counters['batches'] += 1
+                self._counters['items'] += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+            self._slots.release()
+
+    def _run_alone(self, future, payload):
+        try:
+            future.set_result(self.run_batch([payload])[0])
+        except BaseException as e:
+            self._count('failed')
+            future.set_exception(e)
+
+    def stats(self):
+        """Batch counters and batch size distribution"""
+        with self._lock:
+            batches = self._counters['batches']
+            return {
+                'window_ms': round(self.window * 1000, 1),
+                'max_batch': self.max_batch,
+                'queued': self._queue.qsize(),
+                'mean_batch_size': round(self._counters['items'] / batches, 2) if batches else None,
+                'batch_sizes': {str(size): count for size, count in sorted(self._batch_sizes.items())},
+                **self._counters,
+            }
@@ -0,0 +1,179 @@
+#!/usr/bin/env python3
+"""
+Speaker embedding store for the Sprout OpenVoice service
+Caches tone-color embeddings keyed by a hash of the reference audio bytes
+"""
+
+import os
+import shutil
+import hashlib
+import tempfile
+import threading
+
+
+def hash_file(path, chunk_size=1 << 20):
+    """Return the sha256 hex digest of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def embedding_export_path(audio_path):
+    """Return the .npy export path for a reference file (jon_reference.wav -> jon_embedding.npy)"""
+    directory, filename = os.path.split(audio_path)
+    stem = os.path.splitext(filename)[0]
+    if stem.endswith('_reference'):
+        stem = stem[:-len('_reference')]
+    return os.path.join(directory, f'{stem}_embedding.npy')
+
+
+class SpeakerEmbeddingStore:
+    """In-memory and on-disk cache of speaker embeddings
+
+    Embeddings are keyed by the sha256 of the reference audio, so replacing
+    the file (or uploading a new one through /clone) picks a new key and the
+    stale embedding is never served. The file is only re-hashed when its
+    size or mtime changes. With persist=False embeddings live in memory only.
+    """
+
+    def __init__(self, cache_dir, persist=True):
+        self.cache_dir = cache_dir
+        self.persist = persist
+        self._embeddings = {}   # digest -> embedding tensor
+        self._file_keys = {}    # path -> ((mtime_ns, size), digest)
+        self._lock = threading.Lock()
+        self._extract_locks = {}  # digest -> [lock, callers holding or waiting for it]
+
+    def content_key(self, audio_path):
+        """Return the content hash of a reference file, re-hashing only if it changed"""
+        stat = os.stat(audio_path)
+        signature = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            cached = self._file_keys.get(audio_path)
+        if cached is not None and cached[0] == signature:
+            return cached[1]
+
+        digest = hash_file(audio_path)
+        with self._lock:
+            self._file_keys[audio_path] = (signature, digest)
+        return digest
+
+    def invalidate(self, audio_path):
+        """Forget the cached hash for a path (its embedding is re-resolved on next use)"""
+        with self._lock:
+            self._file_keys.pop(audio_path, None)
+
+    def _cache_path(self, digest):
+        return os.path.join(self.cache_dir, f'{digest}.pth')
+
+    def get(self, audio_path, tone_color_converter, get_se, device='cpu'):
+        """Return the embedding for a reference file, extracting it at most once per content hash"""
+        digest = self.content_key(audio_path)
+
+        with self._lock:
+            se = self._embeddings.get(digest)
+            if se is not None:
+                return se
+            entry = self._extract_locks.setdefault(digest, [threading.Lock(), 0])
+            entry[1] += 1
+            extract_lock = entry[0]
+
+        try:
+            with extract_lock:
+                # Another request may have finished the extraction while we waited
+                with self._lock:
+                    se = self._embeddings.get(digest)
+                if se is not None:
+                    return se
+
+                cache_path = self._cache_path(digest)
+                if self.persist and os.path.exists(cache_path):
+                    import torch
+                    print(f"📦 Loading cached speaker embedding: {os.path.basename(audio_path)}")
+                    se = torch.load(cache_path, map_location=device)
+                else:
+                    print(f"🔧 Extracting speaker embedding: {os.path.basename(audio_path)}")
+                    # get_se writes its VAD segments to target_dir; keep them out of the CWD
+                    work_dir = tempfile.mkdtemp(prefix='sprout_se_')
+                    try:
+                        se, _ = get_se(audio_path, tone_color_converter, target_dir=work_dir, vad=True)
+                    finally:
+                        shutil.rmtree(work_dir, ignore_errors=True)
+                    if self.persist:
+                        self._persist(digest, se, audio_path)
+
+                with self._lock:
+                    self._embeddings[digest] = se
+                return se
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._extract_locks[digest]
+
+    def put(self, audio_path, se):
+        """Record an embedding computed elsewhere (e.g. by open.py) for a reference file"""
+        digest = self.content_key(audio_path)
+        with self._lock:
+            self._embeddings[digest] = se
+        if self.persist:
+            self._persist(digest, se, audio_path)
+
+    def _persist(self, digest, se, audio_path):
+        """Write the embedding to the cache dir (.pth) and next to the reference audio (.npy)"""
+        import numpy as np
+        import torch
+
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            cache_path = self._cache_path(digest)
+            tmp_path = f'{cache_path}.tmp'
+            torch.save(se.detach().cpu(), tmp_path)
+            os.replace(tmp_path, cache_path)
+
+            np.save(embedding_export_path(audio_path), se.detach().cpu().numpy())
+            print(f"✅ Speaker embedding cached: {cache_path}")
+        except OSError as e:
+            print(f"⚠️  Could not persist speaker embedding: {e}")
+
+
+# Base speaker embeddings shipped with the OpenVoice EN checkpoints:
+# the default speaker has its own, every emotional style shares en_style_se.pth
+SOURCE_SE_FILES = {'default': 'en_default_se.pth'}
+STYLE_SE_FILE = 'en_style_se.pth'
+
+
+def load_source_embeddings(ckpt_base, styles, extract, cache_dir, tag, device='cpu'):
+    """Resolve the source (base speaker) embedding for every style once
+
+    Checkpoint files are loaded once and shared between the styles that use
+    them. A style without a checkpoint file is computed once with
+    extract(style), persisted to cache_dir (tagged with the checkpoint hash)
+    and loaded from there on later starts. Returns a dict style -> embedding
+    so the request path is a plain lookup with no disk I/O.
+    """
+    import torch
+
+    registry = {}
+    loaded = {}  # path -> embedding, so styles sharing a file share the tensor
+    for style in styles:
+        path = os.path.join(ckpt_base, SOURCE_SE_FILES.get(style, STYLE_SE_FILE))
+        if not os.path.exists(path):
+            path = os.path.join(cache_dir, f'source_{style}_{tag[:16]}.pth')
+
+        if path not in loaded:
+            if os.path.exists(path):
+                loaded[path] = torch.load(path, map_location=device)
+            else:
+                print(f"🔧 Computing source speaker embedding for style '{style}'")
+                se = extract(style)
+                try:
+                    os.makedirs(cache_dir, exist_ok=True)
+                    torch.save(se.detach().cpu(), path)
+                except OSError as e:
+                    print(f"⚠️  Could not persist source embedding: {e}")
+                loaded[path] = se
+        registry[style] = loaded[path]
+    return registry
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Export, verify and benchmark the CPU backends of the Sprout OpenVoice service
+--export writes TorchScript / ONNX decoders for OPENVOICE_BACKEND=torchscript|onnx,
+--check compares every backend's audio with the eager models (SNR / mel distance),
+--benchmark compares their real-time factor on this host
+Usage: python services/export_models.py --export torchscript,onnx --check --benchmark
+"""
+
+import os
+import sys
+import copy
+import time
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import openvoice_service
+from openvoice_backend import create_backend
+from optimized_backend import (
+    BACKEND_VARIANTS, EXPORT_FORMATS, StaleExportError, apply_variant, export_decoders, mel_distance, snr_db
+)
+
+PARITY_TEXTS = [
+    "Hello Seedling!",
+    "Take a slow breath in, and let it go.",
+    "Today you have three things on your list, so let's start with the one that feels lightest.",
+]
+# fp32 exports must reproduce the eager decoders sample for sample; int8 shifts
+# durations slightly, so it is held to a spectral tolerance instead
+PARITY_METRIC = {'torchscript': 'snr', 'onnx': 'snr', 'int8': 'mel'}
+
+
+def build_backend(variant, model):
+    """Backend for a variant, on copies of the loaded eager models"""
+    base_speaker_tts = copy.deepcopy(model['base_speaker_tts'])
+    tone_color_converter = copy.deepcopy(model['tone_color_converter'])
+    apply_variant(variant, base_speaker_tts, tone_color_converter, openvoice_service.EXPORT_DIR, model['weights_hash'])
+    backend = create_backend(base_speaker_tts, tone_color_converter, model['device'])
+    backend.name = variant
+    return backend
+
+
+def run_stages(backend, texts, source_se, target_se, base_audio=None):
+    """(base speaker audio, converted audio) with fixed seeds so the sampling noise matches"""
+    import torch
+    if base_audio is None:
+        torch.manual_seed(0)
+        base_audio = backend.tts_batch(texts, ['default'] * len(texts), speed=openvoice_service.SPEECH_SPEED)
+    torch.manual_seed(0)
+    converted = backend.convert_batch(base_audio, [source_se] * len(texts), [target_se] * len(texts))
+    return base_audio, converted
+
+
+def check_parity(backends, model, min_snr, max_mel):
+    """Print per-stage SNR and mel distance against eager; returns False if any backend is out of tolerance"""
+    source_se = model['source_embeddings']['default']
+    target_se = model['reference_se'] if model['reference_se'] is not None else source_se
+    sample_rate = backends['eager'].sampling_rate
+    eager_tts, eager_converted = run_stages(backends['eager'], PARITY_TEXTS, source_se, target_se)
+
+    print(f"\n{'backend':<12} {'stage':<8} {'min SNR':>9} {'max mel':>9}  result")
+    print("-" * 52)
+    passed = True
+    for variant, backend in backends.items():
+        if variant == 'eager':
+            continue
+        candidate_tts, _ = run_stages(backend, PARITY_TEXTS, source_se, target_se)
+        # Convert the eager TTS output so converter differences aren't mixed with TTS ones
+        _, candidate_converted = run_stages(backend, PARITY_TEXTS, source_se, target_se, base_audio=eager_tts)
+        for stage, reference, candidate in (('tts', eager_tts, candidate_tts), ('convert', eager_converted, candidate_converted)):
+            snrs = [snr_db(ref, cand) for ref, cand in zip(reference, candidate)]
+            mels = [mel_distance(ref, cand, sample_rate) for ref, cand in zip(reference, candidate)]
+            min_snr_seen = None if None in snrs else min(snrs)
+            if PARITY_METRIC[variant] == 'snr':
+                ok = min_snr_seen is not None and min_snr_seen >= min_snr
+            else:
+                ok = max(mels) <= max_mel
+            passed = passed and ok
+            snr_text = 'length≠' if min_snr_seen is None else f'{min_snr_seen:.1f}dB'
+            print(f"{variant:<12} {stage:<8} {snr_text:>9} {max(mels):>9.3f}  {'✅' if ok else '❌'}")
+    print(f"\nTolerances: SNR >= {min_snr}dB for exported decoders, mel distance <= {max_mel} for int8")
+    return passed
+
+
+def benchmark(backends, model, repeat):
+    """Real-time factor (compute seconds per second of audio) of each backend, one request at a time"""
+    source_se = model['source_embeddings']['default']
+    target_se = model['reference_se'] if model['reference_se'] is not None else source_se
+    results = {}
+    for variant, backend in backends.items():
+        run_stages(backend, PARITY_TEXTS[:1], source_se, target_se)  # Warm-up
+        tts_time = convert_time = audio_seconds = 0.0
+        for _ in range(repeat):
+            for text in PARITY_TEXTS:
+                start = time.perf_counter()
+                base_audio = backend.tts_batch([text], ['default'], speed=openvoice_service.SPEECH_SPEED)
+                tts_time += time.perf_counter() - start
+                start = time.perf_counter()
+                converted = backend.convert_batch(base_audio, [source_se], [target_se])
+                convert_time += time.perf_counter() - start
+                audio_seconds += len(converted[0]) / backend.sampling_rate
+        results[variant] = (tts_time / audio_seconds, convert_time / audio_seconds)
+
+    eager_rtf = sum(results['eager'])
+    print(f"\n{'backend':<12} {'tts RTF':>9} {'conv RTF':>9} {'total':>9} {'speedup':>8}")
+    print("-" * 51)
+    for variant, (tts_rtf, convert_rtf) in results.items():
+        total = tts_rtf + convert_rtf
+        print(f"{variant:<12} {tts_rtf:>9.3f} {convert_rtf:>9.3f} {total:>9.3f} {eager_rtf / total:>7.2f}x")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export, verify and benchmark OpenVoice CPU backends")
+    parser.add_argument('--export', help=f"Comma-separated export formats ({', '.join(EXPORT_FORMATS)})")
+    parser.add_argument('--check', action='store_true', help="Compare every available backend with the eager models")
+    parser.add_argument('--benchmark', action='store_true', help="Compare real-time factor across backends")
+    parser.add_argument('--backends', default=','.join(BACKEND_VARIANTS),
+                        help=f"Backends to check/benchmark (default: {','.join(BACKEND_VARIANTS)})")
+    parser.add_argument('--repeat', type=int, default=3, help="Benchmark passes over the texts (default: 3)")
+    parser.add_argument('--min-snr', type=float, default=30.0, help="Parity tolerance for exported decoders in dB (default: 30)")
+    parser.add_argument('--max-mel', type=float, default=0.3, help="Parity tolerance for int8 as mean log-mel difference (default: 0.3)")
+    args = parser.parse_args()
+    if not (args.export or args.check or args.benchmark):
+        parser.error("nothing to do: pass --export, --check and/or --benchmark")
+
+    print("🔧 Loading eager OpenVoice models...")
+    model = openvoice_service.load_checkpoint_models({}, variant='eager')
+    if model['device'] != 'cpu':
+        print(f"⚠️  Models are on {model['device']}; these backends target CPU hosts")
+
+    for export_format in filter(None, (args.export or '').split(',')):
+        if export_format not in EXPORT_FORMATS:
+            parser.error(f"unknown export format: {export_format}")
+        paths = export_decoders(
+            model['base_speaker_tts'], model['tone_color_converter'], export_format,
+            openvoice_service.EXPORT_DIR, model['weights_hash']
+        )
+        print(f"📦 {export_format}: {', '.join(paths.values())}")
+
+    if not (args.check or args.benchmark):
+        return 0
+
+    backends = {'eager': model['backend']}
+    for variant in args.backends.split(','):
+        if variant == 'eager':
+            continue
+        try:
+            backends[variant] = build_backend(variant, model)
+        except (StaleExportError, ImportError, ValueError) as e:
+            print(f"⚠️  Skipping {variant}: {e}")
+
+    ok = True
+    if args.check:
+        ok = check_parity(backends, model, args.min_snr, args.max_mel)
+    if args.benchmark:
+        benchmark(backends, model, args.repeat)
+    return 0 if ok else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
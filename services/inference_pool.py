@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Bounded inference worker pool for the Sprout OpenVoice service
+Each worker thread owns one model replica; a bounded queue provides admission control
+"""
+
+import queue
+import threading
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class PoolBusyError(Exception):
+    """The request queue is full - the caller should retry later"""
+
+
+class InferenceTimeoutError(Exception):
+    """A request did not finish within its timeout"""
+
+
+class InferencePool:
+    """Fixed-size pool of inference workers in front of the models
+
+    submit(fn, *args) runs fn(replica, *args) on whichever worker is free
+    next, so no two requests ever touch the same replica at once.
+    """
+
+    def __init__(self, replicas, queue_size=8, timeout=60.0):
+        self.timeout = timeout
+        self.queue_size = queue_size
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._active = 0
+        self._counters = {'completed': 0, 'failed': 0, 'rejected': 0, 'timeouts': 0}
+        self._threads = []
+        for index, replica in enumerate(replicas):
+            thread = threading.Thread(
+                target=self._worker, args=(replica,), name=f'openvoice-worker-{index}', daemon=True
+            )
+            thread.start()
+            self._threads.append(thread)
+
+    @property
+    def workers(self):
+        return len(self._threads)
+
+    def _worker(self, replica):
+        while True:
+            future, fn, args, kwargs = self._queue.get()
+            try:
+                # Skip requests whose caller already gave up while queued
+                if not future.set_running_or_notify_cancel():
+                    continue
+                with self._lock:
+                    self._active += 1
+                try:
+                    future.set_result(fn(replica, *args, **kwargs))
+                    self._count('completed')
+                except BaseException as e:
+                    future.set_exception(e)
+                    self._count('failed')
+                finally:
+                    with self._lock:
+                        self._active -= 1
+            finally:
+                self._queue.task_done()
+
+    def _count(self, name):
+        with self._lock:
+            self._counters[name] += 1
+
+    def submit(self, fn, *args, timeout=None, wait_for_slot=False, **kwargs):
+        """Run fn(replica, *args, **kwargs) on a worker and return its result
+
+        Raises PoolBusyError when the queue is full (unless wait_for_slot is
+        set, for follow-up work of an already admitted request) and
+        InferenceTimeoutError when the result is not ready within timeout.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        future = Future()
+        item = (future, fn, args, kwargs)
+        try:
+            if wait_for_slot:
+                self._queue.put(item, timeout=timeout)
+            else:
+                self._queue.put_nowait(item)
+        except queue.Full:
+            self._count('rejected')
+            raise PoolBusyError(f'Inference queue is full ({self.queue_size} waiting)')
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            # Still queued: drop it. Already running: it finishes but the result is discarded.
+            future.cancel()
+            self._count('timeouts')
+            raise InferenceTimeoutError(f'Synthesis did not finish within {timeout}s')
+
+    def stats(self):
+        """Snapshot of pool occupancy and counters"""
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'active': self._active,
+                'queued': self._queue.qsize(),
+                'queue_size': self.queue_size,
+                **self._counters,
+            }
@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Latency instrumentation for the Sprout OpenVoice service
+Per-request stage spans (also rendered as a Server-Timing header) and a small
+Prometheus text-format registry of counters and histograms served on /metrics
+"""
+
+import time
+import threading
+from contextlib import contextmanager
+
+# Seconds; covers cache hits (sub-millisecond) through long paragraphs on CPU
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+class Spans:
+    """Stage durations for one request (or one batch) in the order they started
+
+    A stage recorded twice accumulates, so per-sentence work adds up.
+    `path` names the synthesis code path that produced the audio and
+    `plan` the stages it ran (e.g. 'tts+convert+watermark').
+    """
+
+    def __init__(self):
+        self.durations = {}
+        self.path = None
+        self.plan = None
+
+    @contextmanager
+    def span(self, stage):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(stage, time.perf_counter() - start)
+
+    def add(self, stage, seconds):
+        self.durations[stage] = self.durations.get(stage, 0.0) + seconds
+
+    def merge(self, other):
+        """Fold in the spans of a batch this request was part of"""
+        for stage, seconds in other.durations.items():
+            self.add(stage, seconds)
+        self.path = self.path or other.path
+        self.plan = self.plan or other.plan
+
+    def total(self):
+        return sum(self.durations.values())
+
+    def server_timing(self):
+        """Server-Timing header value, durations in milliseconds"""
+        return ', '.join(f'{stage};dur={seconds * 1000:.1f}' for stage, seconds in self.durations.items())
+
+
+def _label_string(labelnames, values):
+    if not labelnames:
+        return ''
+    pairs = []
+    for name, value in zip(labelnames, values):
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+        pairs.append(f'{name}="{value}"')
+    return '{' + ','.join(pairs) + '}'
+
+
+class Counter:
+    """Monotonic counter with labels"""
+
+    kind = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            return [(self.name, _label_string(self.labelnames, key), value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels"""
+
+    kind = 'histogram'
+
+    def __init__(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._values = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, value, **labels):
+        key = tuple(labels.get(name, '') for name in self.labelnames)
+        with self._lock:
+            entry = self._values.get(key)
+            if entry is None:
+                entry = self._values[key] = [0] * len(self.buckets) + [0, 0.0]
+            for index, bound in enumerate(self.buckets):
+                if value <= bound:
+                    entry[index] += 1
+            entry[-2] += 1
+            entry[-1] += value
+
+    def samples(self):
+        samples = []
+        with self._lock:
+            items = sorted((key, list(entry)) for key, entry in self._values.items())
+        for key, entry in items:
+            for bound, count in zip(self.buckets + (float('inf'),), entry[:len(self.buckets)] + [entry[-2]]):
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                labels = _label_string(self.labelnames + ('le',), key + (le,))
+                samples.append((f'{self.name}_bucket', labels, count))
+            labels = _label_string(self.labelnames, key)
+            samples.append((f'{self.name}_count', labels, entry[-2]))
+            samples.append((f'{self.name}_sum', labels, round(entry[-1], 6)))
+        return samples
+
+
+class Gauge:
+    """Value read from a callback at scrape time"""
+
+    kind = 'gauge'
+
+    def __init__(self, name, documentation, read):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def samples(self):
+        value = self.read()
+        return [] if value is None else [(self.name, '', value)]
+
+
+class CallbackCounter(Gauge):
+    """Monotonic total kept elsewhere, read from a callback at scrape time"""
+
+    kind = 'counter'
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered in the Prometheus text exposition format"""
+
+    def __init__(self):
+        self._metrics = []
+
+    def register(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labelnames=()):
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name, documentation, labelnames=(), buckets=LATENCY_BUCKETS):
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def gauge(self, name, documentation, read):
+        return self.register(Gauge(name, documentation, read))
+
+    def counter_func(self, name, documentation, read):
+        return self.register(CallbackCounter(name, documentation, read))
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.append(f'# HELP {metric.name} {metric.documentation}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            for name, labels, value in metric.samples():
+                lines.append(f'{name}{labels} {value}')
+        return '\n'.join(lines) + '\n'
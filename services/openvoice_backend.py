@@ -0,0 +1,250 @@
+#!/usr/bin/env python3
+"""
+OpenVoice model backends for the Sprout OpenVoice service
+Pass audio between the base speaker, MeloTTS and the tone color converter as
+NumPy waveforms instead of round-tripping through WAV files on disk
+"""
+
+import os
+import shutil
+import tempfile
+
+import numpy as np
+
+from text_frontend import TextFrontend
+
+# Rows (sentence chunks) per base speaker forward pass; with chunks bounded by
+# the text front-end this bounds peak memory however long the reply is
+MAX_TTS_ROWS = 8
+
+
+def resample(audio, orig_sr, target_sr):
+    """Resample a float waveform (no-op when the rates already match)"""
+    if orig_sr == target_sr:
+        return audio
+    import librosa
+    return librosa.resample(audio, orig_sr=orig_sr, target_sr=target_sr).astype(np.float32)
+
+
+def write_temp_wav(audio, sample_rate):
+    """Write a waveform to a private temp WAV and return its path (caller removes it)"""
+    import soundfile
+    fd, path = tempfile.mkstemp(prefix='sprout_', suffix='.wav')
+    os.close(fd)
+    soundfile.write(path, audio, sample_rate)
+    return path
+
+
+class OpenVoiceBackend:
+    """In-memory backend over the eager OpenVoice PyTorch models"""
+
+    name = 'eager'
+    needs_temp_files = False
+
+    def __init__(self, base_speaker_tts, tone_color_converter, device, melo_tts=None, frontend=None):
+        self.base_speaker_tts = base_speaker_tts
+        self.tone_color_converter = tone_color_converter
+        self.device = device
+        self.melo_tts = melo_tts
+        self.frontend = frontend or TextFrontend()
+
+    def replicate(self):
+        """Independent copy of the models for another inference worker"""
+        import copy
+        melo_tts = copy.deepcopy(self.melo_tts) if self.melo_tts is not None else None
+        replica = self.__class__(
+            copy.deepcopy(self.base_speaker_tts), copy.deepcopy(self.tone_color_converter), self.device, melo_tts,
+            self.frontend  # Shared, so every replica hits the same token cache
+        )
+        replica.name = self.name  # Keeps the variant (int8, onnx, ...) in /health
+        return replica
+
+    @property
+    def sampling_rate(self):
+        """Output sampling rate of the tone color converter"""
+        return self.tone_color_converter.hps.data.sampling_rate
+
+    @property
+    def base_sampling_rate(self):
+        return self.base_speaker_tts.hps.data.sampling_rate
+
+    def tts(self, text, speaker='default', speed=1.0):
+        """Base speaker TTS straight to a float32 waveform at the converter rate"""
+        return self.tts_batch([text], [speaker], speed=speed)[0]
+
+    def tts_batch(self, texts, speakers, speed=1.0):
+        """Base speaker TTS for several texts in padded forward passes
+
+        Mirrors BaseSpeakerTTS.tts: every front-end chunk of every text
+        becomes a row, rows of similar length run together (at most
+        MAX_TTS_ROWS per pass), and the rows are stitched back together per
+        text. Token ids come from the front-end cache.
+        """
+        import re
+        import torch
+
+        tts = self.base_speaker_tts
+        hps = tts.hps
+        mark = tts.language_marks['english']
+
+        def get_text(marked):
+            return tts.get_text(marked, hps, False)
+
+        pieces = []  # (text index, token ids, speaker id)
+        for index, (text, speaker) in enumerate(zip(texts, speakers)):
+            for sentence in self.frontend.segments(text):
+                sentence = re.sub(r'([a-z])([A-Z])', r'\1 \2', sentence)
+                tokens = self.frontend.tokens(f'[{mark}]{sentence}[{mark}]', get_text)
+                pieces.append((index, tokens, hps.speakers[speaker]))
+
+        rendered = [None] * len(pieces)
+        order = sorted(range(len(pieces)), key=lambda row: pieces[row][1].size(0))
+        for start in range(0, len(order), MAX_TTS_ROWS):
+            rows = order[start:start + MAX_TTS_ROWS]
+            with torch.no_grad():
+                lengths = torch.LongTensor([pieces[row][1].size(0) for row in rows])
+                x = torch.zeros(len(rows), int(lengths.max()), dtype=torch.long)
+                for position, row in enumerate(rows):
+                    x[position, :pieces[row][1].size(0)] = pieces[row][1]
+                sid = torch.LongTensor([pieces[row][2] for row in rows])
+                audio, _, y_mask, _ = tts.model.infer(
+                    x.to(self.device), lengths.to(self.device), sid=sid.to(self.device),
+                    noise_scale=0.667, noise_scale_w=0.6, length_scale=1.0 / speed
+                )
+                audio_lengths = (y_mask.sum(dim=(1, 2)) * hps.data.hop_length).long().tolist()
+                audio = audio[:, 0].data.cpu().float().numpy()
+            for position, row in enumerate(rows):
+                rendered[row] = audio[position, :audio_lengths[position]].copy()
+
+        segments = [[] for _ in texts]
+        for (index, _, _), audio in zip(pieces, rendered):
+            segments[index].append(audio)
+
+        return [
+            resample(tts.audio_numpy_concat(segment, sr=hps.data.sampling_rate, speed=speed),
+                     self.base_sampling_rate, self.sampling_rate)
+            for segment in segments
+        ]
+
+    def melo(self, text, speed=1.0):
+        """MeloTTS straight to a float32 waveform at the converter rate"""
+        speaker_ids = self.melo_tts.hps.data.spk2id
+        speaker_id = speaker_ids.get('EN-US', 0)
+        audio = self.melo_tts.tts_to_file(' '.join(self.frontend.segments(text)), speaker_id, None, speed=speed)
+        return resample(np.asarray(audio, dtype=np.float32), self.melo_tts.hps.data.sampling_rate, self.sampling_rate)
+
+    def convert(self, audio, src_se, tgt_se, tau=0.3, message=None):
+        """Tone color conversion on a waveform (mirrors ToneColorConverter.convert without the file I/O)"""
+        return self.convert_batch([audio], [src_se], [tgt_se], tau=tau, message=message)[0]
+
+    def convert_batch(self, audios, src_ses, tgt_ses, tau=0.3, message=None):
+        """Tone color conversion for several waveforms in one padded forward pass"""
+        import torch
+        from openvoice.mel_processing import spectrogram_torch
+
+        hps = self.tone_color_converter.hps
+        with torch.no_grad():
+            specs = []
+            for audio in audios:
+                y = torch.from_numpy(np.ascontiguousarray(audio, dtype=np.float32)).to(self.device).unsqueeze(0)
+                specs.append(spectrogram_torch(
+                    y, hps.data.filter_length, hps.data.sampling_rate,
+                    hps.data.hop_length, hps.data.win_length, center=False
+                ))
+            spec_lengths = torch.LongTensor([spec.size(-1) for spec in specs])
+            spec = torch.zeros(len(specs), specs[0].size(1), int(spec_lengths.max()), device=self.device)
+            for row, item in enumerate(specs):
+                spec[row, :, :item.size(-1)] = item[0]
+
+            converted = self.tone_color_converter.model.voice_conversion(
+                spec, spec_lengths.to(self.device),
+                sid_src=torch.cat([se.to(self.device) for se in src_ses]),
+                sid_tgt=torch.cat([se.to(self.device) for se in tgt_ses]),
+                tau=tau
+            )[0][:, 0].data.cpu().float().numpy()
+
+        outputs = []
+        for row, length in enumerate(spec_lengths.tolist()):
+            audio = converted[row, :length * hps.data.hop_length]
+            if message:
+                audio = self.tone_color_converter.add_watermark(audio, message)
+            outputs.append(audio)
+        return outputs
+
+    def watermark(self, audio, message):
+        """Embed the wavmark watermark (a second neural pass over the audio)"""
+        # add_watermark writes into the array it is given
+        return self.tone_color_converter.add_watermark(np.array(audio, dtype=np.float32), message)
+
+    def extract_se(self, audio, get_se):
+        """Speaker embedding of a waveform
+
+        se_extractor only works on file paths (it runs VAD and writes
+        segments to disk), so this step still goes through a temp file.
+        """
+        src_path = write_temp_wav(audio, self.sampling_rate)
+        work_dir = tempfile.mkdtemp(prefix='sprout_se_')
+        try:
+            se, _ = get_se(src_path, self.tone_color_converter, target_dir=work_dir, vad=True)
+            return se
+        finally:
+            os.remove(src_path)
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+
+class TempFileOpenVoiceBackend(OpenVoiceBackend):
+    """Fallback for models that only expose the path-based tts()/convert() API
+
+    ToneColorConverter.convert watermarks whenever the converter has a
+    watermark model, so the model is detached for the call: watermarking
+    stays a separate stage (message, or the service's watermark stage).
+    """
+
+    name = 'eager-tempfile'
+    needs_temp_files = True
+
+    def tts_batch(self, texts, speakers, speed=1.0):
+        outputs = []
+        for text, speaker in zip(texts, speakers):
+            text = ' '.join(self.frontend.segments(text))
+            audio = self.base_speaker_tts.tts(text, None, speaker=speaker, language='English', speed=speed)
+            outputs.append(resample(np.asarray(audio, dtype=np.float32), self.base_sampling_rate, self.sampling_rate))
+        return outputs
+
+    def convert_batch(self, audios, src_ses, tgt_ses, tau=0.3, message=None):
+        converter = self.tone_color_converter
+        # Safe to swap out: each inference worker has its own replica and runs one call at a time
+        watermark_model = getattr(converter, 'watermark_model', None)
+        converter.watermark_model = None
+        outputs = []
+        try:
+            for audio, src_se, tgt_se in zip(audios, src_ses, tgt_ses):
+                src_path = write_temp_wav(audio, self.sampling_rate)
+                try:
+                    converted = converter.convert(
+                        audio_src_path=src_path,
+                        src_se=src_se,
+                        tgt_se=tgt_se,
+                        output_path=None,
+                        tau=tau,
+                        message='default'  # Unused without a watermark model
+                    )
+                finally:
+                    os.remove(src_path)
+                outputs.append(np.asarray(converted, dtype=np.float32))
+        finally:
+            converter.watermark_model = watermark_model
+        if message:
+            outputs = [self.watermark(audio, message) for audio in outputs]
+        return outputs
+
+
+def create_backend(base_speaker_tts, tone_color_converter, device, melo_tts=None, frontend=None):
+    """Pick the in-memory backend when both models expose their networks, else the temp-file one"""
+    converter_model = getattr(tone_color_converter, 'model', None)
+    base_model = getattr(base_speaker_tts, 'model', None)
+    if (converter_model is not None and hasattr(converter_model, 'voice_conversion')
+            and base_model is not None and hasattr(base_model, 'infer')):
+        return OpenVoiceBackend(base_speaker_tts, tone_color_converter, device, melo_tts, frontend)
+    print("⚠️  OpenVoice models have no in-memory API, falling back to temp files")
+    return TempFileOpenVoiceBackend(base_speaker_tts, tone_color_converter, device, melo_tts, frontend)
@@ -9,285 +9,1357 @@ import os
 os.environ['KMP_DUPLICATE_LIB_OK'] = 'TRUE'
 os.environ['OMP_NUM_THREADS'] = '1'
 
-from flask import Flask, request, jsonify, send_file
+from flask import Flask, Response, g, request, jsonify
 from flask_cors import CORS
 import io
+import re
 import sys
 import json
+import time
+import atexit
+import shutil
+import zipfile
+import tempfile
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import numpy as np
+
+from audio_encoding import (
+    FILE_EXTENSIONS, FRAMES_MIMETYPE, STREAM_FORMATS, UnsupportedFormatError, content_type, encode_audio, encode_frame,
+    encode_wav, float_to_pcm16, negotiate_format, silence_pcm16, streaming_wav_header
+)
+from audio_cache import AudioCache, utterance_key
+from embedding_store import SpeakerEmbeddingStore, hash_file, load_source_embeddings
+from batching import MicroBatcher
+from inference_pool import InferencePool, InferenceTimeoutError, PoolBusyError
+from metrics import MetricsRegistry, Spans
+from singleflight import SingleFlight
+from openvoice_backend import create_backend, resample
+from optimized_backend import BACKEND_VARIANTS, StaleExportError, apply_variant
+from text_frontend import TextFrontend
+from voice_registry import VoiceNotFoundError, VoiceNotReadyError, VoiceRegistry
 
 # Add OpenVoice to path
 sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'openvoice'))
 
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+AUDIO_DIR = os.path.join(PROJECT_ROOT, 'resources', 'audio')
+
 app = Flask(__name__)
 CORS(app)
 
-# Initialize OpenVoice (will be loaded on first request)
+# Initialize OpenVoice (loaded in the background at startup, or on first request)
 openvoice_model = None
 tts_model = None
 
-def load_openvoice():
-    """Lazy load OpenVoice model"""
-    global openvoice_model, tts_model
+# Model backend: 'eager' (checkpoints/), 'int8' (dynamically quantized), 'torchscript' / 'onnx'
+# (exported decoders from services/export_models.py) or 'stub' (synthetic audio, no checkpoints needed)
+MODEL_BACKEND = os.environ.get('OPENVOICE_BACKEND', 'eager')
+if MODEL_BACKEND not in BACKEND_VARIANTS + ('stub',):
+    print(f"⚠️  Unknown OPENVOICE_BACKEND '{MODEL_BACKEND}', using 'eager'")
+    MODEL_BACKEND = 'eager'
+STUB_RTF = float(os.environ.get('OPENVOICE_STUB_RTF', '0.05'))
+EXPORT_DIR = os.environ.get('OPENVOICE_EXPORT_DIR', os.path.join(PROJECT_ROOT, 'checkpoints', 'exported'))
+
+# Inference workers (one model replica each) behind a bounded request queue
+INFERENCE_WORKERS = max(1, int(os.environ.get('OPENVOICE_WORKERS', '1')))
+INFERENCE_QUEUE_SIZE = max(1, int(os.environ.get('OPENVOICE_QUEUE_SIZE', '8')))
+REQUEST_TIMEOUT = float(os.environ.get('OPENVOICE_REQUEST_TIMEOUT', '60'))
+inference_pool = None
+
+# Supervisor mode: worker processes, each pinned to its own cores (1 = single process)
+PROCESSES = max(1, int(os.environ.get('OPENVOICE_PROCESSES', '1')))
+THREADS_PER_PROCESS = int(os.environ.get('OPENVOICE_THREADS', '0')) or None  # Default: one per pinned core
+
+# Watermark stage: 'on' (inline), 'off', or 'async' (only audio persisted to the disk cache)
+WATERMARK_MODES = ('on', 'off', 'async')
+WATERMARK_MODE = os.environ.get('OPENVOICE_WATERMARK', 'on')
+if WATERMARK_MODE not in WATERMARK_MODES:
+    print(f"⚠️  Unknown OPENVOICE_WATERMARK '{WATERMARK_MODE}', using 'on'")
+    WATERMARK_MODE = 'on'
+WATERMARK_MESSAGE = "@MyShell"
+
+# Micro-batching of concurrent requests (window 0 disables it)
+BATCH_WINDOW_MS = float(os.environ.get('OPENVOICE_BATCH_WINDOW_MS', '0'))
+MAX_BATCH = max(1, int(os.environ.get('OPENVOICE_MAX_BATCH', '8')))
+batcher = None
+
+# Speaker embeddings keyed by reference audio content hash
+embedding_store = SpeakerEmbeddingStore(os.path.join(AUDIO_DIR, 'embeddings'))
+
+# Voices uploaded through /clone, with the most recently used embeddings kept in memory
+VOICES_DIR = os.environ.get('OPENVOICE_VOICES_DIR', os.path.join(AUDIO_DIR, 'voices'))
+VOICE_CACHE_SIZE = max(1, int(os.environ.get('OPENVOICE_VOICE_CACHE_SIZE', '32')))
+voice_registry = VoiceRegistry(VOICES_DIR, capacity=VOICE_CACHE_SIZE)
+
+# Text normalization and chunking before the models, with token ids cached per chunk
+MAX_SEGMENT_CHARS = max(20, int(os.environ.get('OPENVOICE_MAX_SEGMENT_CHARS', '200')))
+TOKEN_CACHE_SIZE = max(0, int(os.environ.get('OPENVOICE_TOKEN_CACHE_SIZE', '4096')))
+frontend = TextFrontend(max_chars=MAX_SEGMENT_CHARS, cache_size=TOKEN_CACHE_SIZE)
+
+# Rendered utterances keyed by text, style, speed, reference voice and checkpoints
+CACHE_MB = float(os.environ.get('OPENVOICE_CACHE_MB', '64'))
+DISK_CACHE_MB = float(os.environ.get('OPENVOICE_DISK_CACHE_MB', '0'))
+DISK_CACHE_DIR = os.environ.get('OPENVOICE_CACHE_DIR', os.path.join(PROJECT_ROOT, 'cache', 'utterances'))
+audio_cache = AudioCache(
+    int(CACHE_MB * 1024 * 1024),
+    disk_dir=DISK_CACHE_DIR,
+    disk_max_bytes=int(DISK_CACHE_MB * 1024 * 1024)
+)
+
+# Concurrent cache misses for the same utterance share one render
+inflight = SingleFlight()
+
+# Per-stage latency metrics for /metrics, optionally echoed in a Server-Timing header
+SERVER_TIMING = os.environ.get('OPENVOICE_SERVER_TIMING', '0') == '1'
+metrics = MetricsRegistry()
+stage_seconds = metrics.histogram(
+    'sprout_stage_seconds', 'Time spent in each synthesis stage', ('stage', 'style', 'path')
+)
+request_seconds = metrics.histogram(
+    'sprout_request_seconds', 'End-to-end synthesis request latency', ('endpoint', 'style', 'path', 'status')
+)
+requests_total = metrics.counter('sprout_requests_total', 'Synthesis requests by outcome', ('endpoint', 'status'))
+plans_total = metrics.counter(
+    'sprout_synthesis_plans_total', 'Synthesis requests by code path and the stages they ran', ('path', 'plan')
+)
+metrics.gauge('sprout_inference_active', 'Requests running on an inference worker',
+              lambda: inference_pool.stats()['active'] if inference_pool is not None else None)
+metrics.gauge('sprout_inference_queued', 'Requests waiting for an inference worker',
+              lambda: inference_pool.stats()['queued'] if inference_pool is not None else None)
+metrics.gauge('sprout_cache_bytes', 'Bytes held by the in-memory utterance cache', lambda: audio_cache.stats()['bytes'])
+metrics.gauge('sprout_cache_hit_rate', 'Utterance cache hit rate', lambda: audio_cache.stats()['hit_rate'])
+metrics.gauge('sprout_token_cache_hit_rate', 'Text front-end token cache hit rate', lambda: frontend.stats()['hit_rate'])
+metrics.counter_func('sprout_coalesced_requests_total', 'Renders that waited for an identical in-flight render',
+                     lambda: inflight.stats()['coalesced'])
+metrics.counter_func('sprout_coalescing_leaders_total', 'Renders that ran the models for themselves and any followers',
+                     lambda: inflight.stats()['leaders'])
+INSTRUMENTED_ENDPOINTS = ('synthesize', 'synthesize_stream')
+
+# Startup state reported by /health: cold -> loading -> ready | failed
+service_state = {
+    'state': 'cold',
+    'eager': False,
+    'started_at': time.time(),
+    'timings': {},
+    'error': None,
+}
+load_lock = threading.Lock()
+
+# Largest /synthesize/batch request (the CLI splits bigger manifests)
+BATCH_MAX_ITEMS = max(1, int(os.environ.get('OPENVOICE_BATCH_MAX_ITEMS', '256')))
+BATCH_MAX_STEM = 80  # Longest item id used as a file name as is
+
+VOICE_STYLES = ['default', 'excited', 'friendly', 'cheerful', 'sad', 'angry', 'terrified', 'shouting', 'whispering']
+WARMUP_TEXT = "Hello Seedling!"
+# Calibration text for styles whose source embedding is not shipped with the checkpoints
+SOURCE_SE_TEXT = (
+    "The sun rose slowly over the quiet garden. Every leaf was bright with morning dew, "
+    "and the air smelled of fresh soil. A small sprout stretched toward the light."
+)
+SPEECH_SPEED = 1.1  # 10% faster
+# Synthesis plan: code path ('reference', 'melotts' or 'base') and the stages it runs
+Plan = namedtuple('Plan', 'path stages')
+SENTENCE_GAP = 0.05  # Pause between sentences, matching BaseSpeakerTTS
+
+def find_reference_audio():
+    """Return the default reference voice path
+
+    The voice open.py last built (voice_manifest.json, so any --name works)
+    comes first, then jon_reference.wav, then reference.wav.
+    """
+    names = ['jon_reference.wav', 'reference.wav']
+    try:
+        with open(os.path.join(AUDIO_DIR, 'voice_manifest.json')) as f:
+            built = (json.load(f).get('voice') or {}).get('reference')
+        if isinstance(built, str):
+            names.insert(0, built)
+    except (OSError, ValueError, AttributeError):
+        pass  # No voice built with open.py yet
+    for name in names:
+        path = os.path.join(AUDIO_DIR, name)
+        if os.path.exists(path):
+            return path
+    return None
+
+def load_checkpoint_models(timings, variant=None):
+    """Load MeloTTS, the base speaker and the tone color converter from checkpoints/
+
+    variant (default OPENVOICE_BACKEND) selects eager, int8, torchscript or onnx models.
+    """
+    global tts_model
+    variant = variant or MODEL_BACKEND
+    
+    # Import OpenVoice modules
+    # Add openvoice to path first
+    openvoice_path = os.path.join(os.path.dirname(__file__), '..', 'openvoice')
+    if openvoice_path not in sys.path:
+        sys.path.insert(0, openvoice_path)
+    
+    import torch
     
-    if openvoice_model is not None:
-        return
+    # Import se_extractor
+    from openvoice.se_extractor import get_se
     
+    # Import API classes
+    from openvoice.api import BaseSpeakerTTS, ToneColorConverter
+    
+    # MeloTTS is optional - don't fail if not available
+    step_start = time.perf_counter()
     try:
-        print("🔧 Loading OpenVoice models...")
-        
-        # Import OpenVoice modules
-        # Add openvoice to path first
-        openvoice_path = os.path.join(os.path.dirname(__file__), '..', 'openvoice')
-        if openvoice_path not in sys.path:
-            sys.path.insert(0, openvoice_path)
-        
-        # Import se_extractor
-        from openvoice.se_extractor import get_se
+        from melo.api import TTS
+        tts_model = TTS(language='EN', device='cpu')
+        timings['melotts'] = round(time.perf_counter() - step_start, 3)
+        print("✅ MeloTTS loaded")
+    except ImportError:
+        print("⚠️ MeloTTS not available, will use base TTS only")
+        TTS = None
+        tts_model = None
+    
+    # Load models - check if checkpoints exist
+    ckpt_base = os.path.join(PROJECT_ROOT, 'checkpoints', 'base_speakers', 'EN')
+    ckpt_converter = os.path.join(PROJECT_ROOT, 'checkpoints', 'converter')
+    
+    if not os.path.exists(ckpt_base):
+        print(f"❌ Base speaker checkpoints not found at: {ckpt_base}")
+        print("   Please download checkpoints from: https://github.com/myshell-ai/OpenVoice")
+        raise FileNotFoundError(f"Checkpoints not found: {ckpt_base}")
+    
+    if not os.path.exists(ckpt_converter):
+        print(f"❌ Converter checkpoints not found at: {ckpt_converter}")
+        print("   Please download checkpoints from: https://github.com/myshell-ai/OpenVoice")
+        raise FileNotFoundError(f"Checkpoints not found: {ckpt_converter}")
+    
+    # Ask torch directly instead of spawning an nvidia-smi subprocess
+    device = 'cuda' if torch.cuda.is_available() else 'cpu'
+    print(f"🔧 Using device: {device}")
+    
+    print("   Loading BaseSpeakerTTS...")
+    step_start = time.perf_counter()
+    base_speaker_tts = BaseSpeakerTTS(f'{ckpt_base}/config.json', device=device)
+    base_speaker_tts.load_ckpt(f'{ckpt_base}/checkpoint.pth')
+    timings['base_speaker_tts'] = round(time.perf_counter() - step_start, 3)
+    print("   ✅ BaseSpeakerTTS loaded")
+    
+    print("   Loading ToneColorConverter...")
+    step_start = time.perf_counter()
+    tone_color_converter = ToneColorConverter(
+        f'{ckpt_converter}/config.json', device=device
+    )
+    tone_color_converter.load_ckpt(f'{ckpt_converter}/checkpoint.pth')
+    timings['tone_color_converter'] = round(time.perf_counter() - step_start, 3)
+    print("   ✅ ToneColorConverter loaded")
+    
+    # Checkpoint identity for the utterance cache key
+    step_start = time.perf_counter()
+    weights_hash = utterance_key(
+        hash_file(f'{ckpt_base}/checkpoint.pth'),
+        hash_file(f'{ckpt_converter}/checkpoint.pth')
+    )
+    timings['checkpoint_hash'] = round(time.perf_counter() - step_start, 3)
+    
+    if variant != 'eager' and device != 'cpu':
+        print(f"⚠️  The {variant} backend is for CPU inference, using eager models on {device}")
+        variant = 'eager'
+    if variant != 'eager':
+        step_start = time.perf_counter()
+        try:
+            apply_variant(variant, base_speaker_tts, tone_color_converter, EXPORT_DIR, weights_hash, device=device)
+            timings['variant'] = round(time.perf_counter() - step_start, 3)
+        except (StaleExportError, ImportError) as e:
+            print(f"⚠️  Cannot use the {variant} backend ({e}), using eager models")
+            variant = 'eager'
+    # Variants render slightly different audio, so they don't share cache entries
+    checkpoint_hash = weights_hash if variant == 'eager' else utterance_key(weights_hash, variant)
+    
+    backend = create_backend(base_speaker_tts, tone_color_converter, device, melo_tts=tts_model, frontend=frontend)
+    if variant != 'eager':
+        backend.name = f'{backend.name}-{variant}' if backend.needs_temp_files else variant
+    print(f"   Using {backend.name} backend")
+    
+    # Source (base speaker) embeddings for every style and the target (reference voice) embedding
+    step_start = time.perf_counter()
+    
+    def extract_source_se(style):
+        audio = backend.tts(SOURCE_SE_TEXT, speaker=style, speed=SPEECH_SPEED)
+        return backend.extract_se(audio, get_se)
+    
+    source_embeddings = load_source_embeddings(
+        ckpt_base, VOICE_STYLES, extract_source_se, embedding_store.cache_dir, checkpoint_hash, device=device
+    )
+    
+    default_voice = load_default_voice(tone_color_converter, get_se, device)
+    timings['embeddings'] = round(time.perf_counter() - step_start, 3)
+    
+    return {
+        'base_speaker_tts': base_speaker_tts,
+        'tone_color_converter': tone_color_converter,
+        'backend': backend,
+        'device': device,
+        'get_se': get_se,  # Store the get_se function
+        'source_embeddings': source_embeddings,
+        'checkpoint_hash': checkpoint_hash,
+        'weights_hash': weights_hash,
+        **default_voice
+    }
+
+def load_default_voice(tone_color_converter, get_se, device):
+    """Resolve the default reference voice once, so requests without a voice do no file lookups
+
+    Rebuilding the voice with open.py (or replacing the reference wav) takes effect on the next start;
+    /clone registers additional voices instead.
+    """
+    reference_path = find_reference_audio()
+    if reference_path is None:
+        return {'reference_se': None, 'reference_key': None}
+    return {
+        'reference_se': embedding_store.get(reference_path, tone_color_converter, get_se, device=device),
+        'reference_key': embedding_store.content_key(reference_path),
+    }
+
+def load_stub_models():
+    """Checkpoint-free stand-in models (OPENVOICE_BACKEND=stub) for benchmarks and load tests"""
+    global tts_model, embedding_store, voice_registry
+    from stub_backend import StubBackend, stub_get_se
+    
+    tts_model = None
+    backend = StubBackend(rtf=STUB_RTF, frontend=frontend)
+    print(f"   Using {backend.name} backend (synthetic audio, {STUB_RTF} s compute per s of audio)")
+    
+    # Stub embeddings and cloned voices must never land in the real caches
+    embedding_store = SpeakerEmbeddingStore(embedding_store.cache_dir, persist=False)
+    voices_dir = tempfile.mkdtemp(prefix='sprout_voices_')
+    atexit.register(shutil.rmtree, voices_dir, ignore_errors=True)
+    voice_registry = VoiceRegistry(voices_dir, capacity=voice_registry.capacity, persist=False)
+    
+    return {
+        'base_speaker_tts': backend.base_speaker_tts,
+        'tone_color_converter': backend.tone_color_converter,
+        'backend': backend,
+        'device': backend.device,
+        'get_se': stub_get_se,
+        'source_embeddings': backend.source_embeddings(VOICE_STYLES),
+        'checkpoint_hash': utterance_key('stub', STUB_RTF),
+        **load_default_voice(backend.tone_color_converter, stub_get_se, backend.device)
+    }
+
+def load_openvoice(warm=False, start_workers=True):
+    """Load OpenVoice models (safe to call from the warm-up thread and request handlers)
+
+    With warm=True every model replica runs a dummy synthesis before the
+    service reports ready. start_workers=False stops once the weights are
+    loaded: the supervisor forks its worker processes at that point and
+    each of them calls start_inference().
+    """
+    global openvoice_model
+    
+    with load_lock:
+        if openvoice_model is not None:
+            return
         
-        # Import API classes
-        from openvoice.api import BaseSpeakerTTS, ToneColorConverter
+        service_state['state'] = 'loading'
+        service_state['error'] = None
+        timings = service_state['timings']
+        load_start = time.perf_counter()
         
-        # MeloTTS is optional - don't fail if not available
         try:
-            from melo.api import TTS
-            tts_model = TTS(language='EN', device='cpu')
-            print("✅ MeloTTS loaded")
-        except ImportError:
-            print("⚠️ MeloTTS not available, will use base TTS only")
-            TTS = None
-            tts_model = None
+            print("🔧 Loading OpenVoice models...")
+            
+            if MODEL_BACKEND == 'stub':
+                openvoice_model = load_stub_models()
+            else:
+                openvoice_model = load_checkpoint_models(timings)
+            
+            if start_workers:
+                start_inference(warm=warm)
+            timings['load_total'] = round(time.perf_counter() - load_start, 3)
+            
+        except Exception as e:
+            print(f"❌ OpenVoice loading failed: {e}")
+            import traceback
+            traceback.print_exc()
+            openvoice_model = None
+            service_state['state'] = 'failed'
+            service_state['error'] = str(e)
+
+def start_inference(warm=False):
+    """Create the model replicas, warm them up and start the inference workers and micro-batcher"""
+    global inference_pool, batcher
+    
+    timings = service_state['timings']
+    backend = openvoice_model['backend']
+    
+    # One replica per worker; the first worker uses the loaded models
+    step_start = time.perf_counter()
+    replicas = [backend] + [backend.replicate() for _ in range(INFERENCE_WORKERS - 1)]
+    if len(replicas) > 1:
+        timings['replicas'] = round(time.perf_counter() - step_start, 3)
+    
+    # Requests still get 503 (state is 'loading') until warm-up finishes
+    if warm:
+        warm_up(replicas)
+    
+    inference_pool = InferencePool(replicas, queue_size=INFERENCE_QUEUE_SIZE, timeout=REQUEST_TIMEOUT)
+    print(f"   {inference_pool.workers} inference worker(s), queue size {INFERENCE_QUEUE_SIZE}")
+    
+    if BATCH_WINDOW_MS > 0:
+        batcher = MicroBatcher(
+            run_batch, window_ms=BATCH_WINDOW_MS, max_batch=MAX_BATCH, concurrency=inference_pool.workers,
+            queue_size=INFERENCE_QUEUE_SIZE, timeout=REQUEST_TIMEOUT
+        )
+        print(f"   Micro-batching: {BATCH_WINDOW_MS}ms window, up to {MAX_BATCH} per batch")
+    
+    # Voices whose preparation was cut short (e.g. by a restart) get their embedding now
+    voice_registry.resume(extract_voice_embedding)
+    
+    service_state['state'] = 'ready'
+    print("✅ OpenVoice models loaded successfully!")
+
+def warm_up(replicas):
+    """Run one dummy synthesis per replica so kernels, allocators and caches are hot before real traffic"""
+    print("🔥 Warming up OpenVoice...")
+    step_start = time.perf_counter()
+    try:
+        for replica in replicas:
+            synthesize_audio(WARMUP_TEXT, 'default', backend=replica)
+        service_state['timings']['warmup'] = round(time.perf_counter() - step_start, 3)
+        print(f"✅ Warm-up finished in {service_state['timings']['warmup']}s")
+    except Exception as e:
+        # A failed warm-up is not fatal - the models themselves loaded fine
+        print(f"⚠️  Warm-up synthesis failed: {e}")
+
+def start_background_load():
+    """Load models and warm up on a background thread so /health answers immediately"""
+    thread = threading.Thread(target=load_openvoice, kwargs={'warm': True}, name='openvoice-warmup', daemon=True)
+    thread.start()
+    return thread
+
+def peak_rss_bytes():
+    """Peak resident set size of this process (ru_maxrss is KiB on Linux, bytes on macOS)"""
+    import resource
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+def current_rss_bytes():
+    """Resident set size right now (None where neither /proc nor psutil is available)"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        pass
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss
+    except ImportError:
+        return None
+
+def temp_usage():
+    """(entries, bytes) the service left in the temp dir: sprout_*.wav files and sprout_se_* VAD dirs"""
+    entries = size = 0
+    root = tempfile.gettempdir()
+    for name in os.listdir(root):
+        if not name.startswith('sprout_'):
+            continue
+        entries += 1
+        path = os.path.join(root, name)
+        try:
+            if os.path.isdir(path):
+                size += sum(os.path.getsize(os.path.join(d, f)) for d, _, files in os.walk(path) for f in files)
+            else:
+                size += os.path.getsize(path)
+        except OSError:
+            pass  # Removed while we looked
+    return entries, size
+
+def process_stats():
+    """Resource usage of this process for /health; the soak harness watches these for leaks"""
+    try:
+        open_fds = len(os.listdir('/dev/fd')) - 1  # Minus the descriptor listdir itself holds
+    except OSError:
+        open_fds = None
+    temp_entries, temp_bytes = temp_usage()
+    return {
+        'pid': os.getpid(),
+        'peak_rss_bytes': peak_rss_bytes(),
+        'rss_bytes': current_rss_bytes(),
+        'open_fds': open_fds,
+        'threads': threading.active_count(),
+        'temp_entries': temp_entries,
+        'temp_bytes': temp_bytes,
+    }
+
+def is_ready():
+    """Whether synthesis requests can be served without waiting on model loading"""
+    state = service_state['state']
+    # Lazy mode: the first request loads the models itself
+    return state == 'ready' or (state == 'cold' and not service_state['eager'])
+
+@app.route('/health', methods=['GET'])
+def health():
+    """Health check endpoint (always 200 while the process is live)"""
+    return jsonify({
+        'status': 'ok',
+        'live': True,
+        'ready': is_ready(),
+        'state': service_state['state'],
+        'openvoice_loaded': openvoice_model is not None,
+        'backend': openvoice_model['backend'].name if openvoice_model is not None else MODEL_BACKEND,
+        'timings': service_state['timings'],
+        'uptime': round(time.time() - service_state['started_at'], 1),
+        'error': service_state['error'],
+        'inference': inference_pool.stats() if inference_pool is not None else None,
+        'batching': batcher.stats() if batcher is not None else None,
+        'watermark': WATERMARK_MODE,
+        'cache': audio_cache.stats(),
+        'coalescing': inflight.stats(),
+        'text_frontend': frontend.stats(),
+        'voices': voice_registry.stats(),
+        'process': process_stats()
+    })
+
+@app.route('/ready', methods=['GET'])
+def ready():
+    """Readiness probe - 503 until the models are loaded and warmed up"""
+    if is_ready():
+        return jsonify({'ready': True})
+    response = jsonify({'ready': False, 'state': service_state['state']})
+    response.headers['Retry-After'] = '2'
+    return response, 503
+
+def synthesize_audio(text, style='default', backend=None, watermark=None, spans=None, voice=None):
+    """Render text to a float waveform with the loaded OpenVoice models
+
+    Returns (audio, sample_rate). Request handlers go through render() so
+    each call runs on its own worker's replica.
+    """
+    if watermark is None:
+        watermark = WATERMARK_MODE == 'on'
+    return synthesize_batch([(text, style, watermark, voice)], backend=backend, spans=spans)[0]
+
+def target_embedding(voice, backend):
+    """Target speaker embedding: a registered voice, else the default reference (None without one)"""
+    if voice is None:
+        return openvoice_model['reference_se']
+    get_se = openvoice_model['get_se']
+    return voice_registry.get(
+        voice, lambda audio: backend.extract_se(audio, get_se), device=openvoice_model['device']
+    )
+
+def same_speaker(se, other):
+    """Whether two speaker embeddings (tensors or arrays) hold the same values; a voice id never matches"""
+    if se is other:
+        return True
+    if isinstance(se, str) or isinstance(other, str):
+        return False
+    se, other = (np.asarray(e.detach().cpu() if hasattr(e, 'detach') else e) for e in (se, other))
+    return se.shape == other.shape and np.array_equal(se, other)
+
+def plan_synthesis(style, target_se, watermark, melo_available):
+    """Cheapest stage graph that renders one request with the loaded models
+
+    target_se is the target speaker embedding (None: no reference voice);
+    a cloned voice that isn't loaded yet can be passed as its id, since the
+    planner only needs to know there is another speaker. Stages that could
+    not change the output are left out:
+    - MeloTTS only when the default style is asked for: it has no styles,
+      while the base speaker renders all of them.
+    - no embedding extraction or conversion without a target voice: both
+      would convert the audio to its own speaker.
+    - no conversion when the target is the style's own source speaker
+      (compared by value: every load of an embedding is a new object).
+    Returns a Plan(path, stages) such as ('reference', ('tts', 'convert', 'watermark')).
+    """
+    speaker_style = style if style in VOICE_STYLES else 'default'
+    stages = ['tts']
+    if target_se is None:
+        path = 'melotts' if melo_available and speaker_style == 'default' else 'base'
+    else:
+        path = 'reference'
+        if not same_speaker(target_se, openvoice_model['source_embeddings'][speaker_style]):
+            stages.append('convert')
+    if watermark:
+        stages.append('watermark')
+    return Plan(path, tuple(stages))
+
+def synthesize_batch(requests, backend=None, spans=None, item_spans=None):
+    """Render several (text, style, watermark, voice) requests, batching the model passes where possible
+
+    Returns a list of (audio, sample_rate) in request order. Audio stays in
+    memory between the base speaker, the tone color converter and the encoder.
+    Each request runs the stages of its plan (see plan_synthesis); requests
+    with the same path share model passes. Stage durations are recorded into
+    spans, and each request's path and plan into its entry of item_spans
+    (default: spans itself for a single request).
+    """
+    backend = backend or openvoice_model['backend']
+    spans = spans if spans is not None else Spans()
+    if item_spans is None:
+        item_spans = [spans] if len(requests) == 1 else [Spans() for _ in requests]
+    
+    # Target speaker per request: its cloned voice, or the default reference voice
+    lookup_start = time.perf_counter()
+    target_ses = [target_embedding(voice, backend) for _, _, _, voice in requests]
+    if any(target_se is not None for target_se in target_ses):
+        spans.add('embedding', time.perf_counter() - lookup_start)
+    plans = [
+        plan_synthesis(style, target_se, watermark, backend.melo_tts is not None)
+        for (_, style, watermark, _), target_se in zip(requests, target_ses)
+    ]
+    for request_spans, plan in zip(item_spans, plans):
+        request_spans.path, request_spans.plan = plan.path, '+'.join(plan.stages)
+    
+    results = [None] * len(requests)
+    for path, synthesize_path in (
+        ('melotts', synthesize_melotts), ('base', synthesize_base), ('reference', synthesize_with_reference)
+    ):
+        indices = [index for index, plan in enumerate(plans) if plan.path == path]
+        if not indices:
+            continue
+        rendered = synthesize_path(
+            [requests[index] for index in indices], [plans[index] for index in indices],
+            [target_ses[index] for index in indices], backend, spans
+        )
+        for index, result in zip(indices, rendered):
+            results[index] = result
+    return results
+
+def apply_watermarks(audios, plans, backend, spans):
+    """Watermark stage for the requests whose plan includes it"""
+    if not any('watermark' in plan.stages for plan in plans):
+        return audios
+    with spans.span('watermark'):
+        return [
+            backend.watermark(audio, WATERMARK_MESSAGE) if 'watermark' in plan.stages else audio
+            for audio, plan in zip(audios, plans)
+        ]
+
+def synthesize_melotts(requests, plans, target_ses, backend, spans):
+    """No reference voice, default style: MeloTTS output as is"""
+    audios = []
+    for text, _, _, _ in requests:  # MeloTTS has no batch API
+        with spans.span('tts'):
+            audios.append(backend.melo(text, speed=SPEECH_SPEED))
+    audios = apply_watermarks(audios, plans, backend, spans)
+    return [(audio, backend.sampling_rate) for audio in audios]
+
+def synthesize_base(requests, plans, target_ses, backend, spans):
+    """No reference voice: the base speaker in the requested style (no voice cloning)"""
+    texts = [text for text, _, _, _ in requests]
+    speaker_styles = [style if style in VOICE_STYLES else 'default' for _, style, _, _ in requests]
+    with spans.span('tts'):
+        audios = backend.tts_batch(texts, speaker_styles, speed=SPEECH_SPEED)
+    audios = apply_watermarks(audios, plans, backend, spans)
+    return [(audio, backend.sampling_rate) for audio in audios]
+
+def synthesize_with_reference(requests, plans, target_ses, backend, spans):
+    """Base speaker in the requested style, converted to each request's target voice"""
+    print(f"🎤 Using reference voice ({len(requests)} request(s))")
+    texts = [text for text, _, _, _ in requests]
+    speaker_styles = [style if style in VOICE_STYLES else 'default' for _, style, _, _ in requests]
+    
+    # Step 1: Generate base speech from text with selected voice style
+    with spans.span('tts'):
+        audios = backend.tts_batch(texts, speaker_styles, speed=SPEECH_SPEED)
+    
+    # Step 2: Convert tone color, from each style's source speaker (resolved once at startup)
+    convert = [index for index, plan in enumerate(plans) if 'convert' in plan.stages]
+    if convert:
+        source_embeddings = openvoice_model['source_embeddings']
+        with spans.span('convert'):
+            converted = backend.convert_batch(
+                [audios[index] for index in convert],
+                [source_embeddings[speaker_styles[index]] for index in convert],
+                [target_ses[index] for index in convert]
+            )
+        for index, audio in zip(convert, converted):
+            audios[index] = audio
+    
+    # Step 3: Watermark (optional stage - a second neural pass over the audio)
+    audios = apply_watermarks(audios, plans, backend, spans)
+    return [(audio, backend.sampling_rate) for audio in audios]
+
+def request_plan(style, voice, watermark_mode=None):
+    """Plan a request will run, without loading its voice's embedding"""
+    target = openvoice_model['reference_se'] if voice is None else voice
+    inline_watermark = (watermark_mode or WATERMARK_MODE) == 'on'
+    return plan_synthesis(style, target, inline_watermark, openvoice_model['backend'].melo_tts is not None)
+
+def cache_key(text, style, watermark_mode=None, voice=None):
+    """Utterance cache key: text, style, speed, watermark mode, target voice, synthesis path and model checkpoints
+
+    The mode itself is keyed, not just whether the reply is watermarked:
+    'async' persists a watermarked copy that an 'off' request must never read.
+    """
+    reference_key = voice if voice is not None else openvoice_model['reference_key']
+    speaker_style = style if style in VOICE_STYLES else 'default'
+    watermark_mode = watermark_mode or WATERMARK_MODE
+    path = request_plan(style, voice, watermark_mode).path
+    return utterance_key(
+        text, speaker_style, SPEECH_SPEED, watermark_mode, reference_key, path, openvoice_model['checkpoint_hash']
+    )
+
+def watermark_in_background(audio):
+    """Watermark audio that is about to be persisted, on an inference worker"""
+    return inference_pool.submit(
+        lambda backend: backend.watermark(audio, WATERMARK_MESSAGE), wait_for_slot=True
+    )
+
+def run_batch(requests):
+    """Run one micro-batch on an inference worker
+
+    Every item gets the batch's stage durations, but its own path and plan.
+    """
+    spans = Spans()
+    item_spans = [Spans() for _ in requests]
+    results = inference_pool.submit(
+        lambda backend: synthesize_batch(requests, backend=backend, spans=spans, item_spans=item_spans),
+        wait_for_slot=True
+    )
+    for request_spans in item_spans:
+        request_spans.merge(spans)
+    return [(audio, sample_rate, request_spans) for (audio, sample_rate), request_spans in zip(results, item_spans)]
+
+def render(text, style, timeout=None, wait_for_slot=False, use_cache=True, watermark_mode=None, spans=None, voice=None):
+    """Synthesize through the utterance cache, the micro-batcher and the inference pool
+
+    Raises PoolBusyError / InferenceTimeoutError on a cache miss that
+    can't be served. Concurrent misses for the same key share one render.
+    use_cache=False skips the lookup and the sharing (benchmarks), but
+    the result is still stored. watermark_mode overrides OPENVOICE_WATERMARK.
+    text is normalized here, once, unless it already is (a chunk from
+    frontend.segments()); raises ValueError if nothing speakable is left.
+    voice is a registered voice id (None: the default reference voice).
+    Stage durations (including time spent queued) are added to spans.
+    """
+    spans = spans if spans is not None else Spans()
+    text = frontend.normalize(text)
+    if not text:
+        raise ValueError('Nothing to synthesize once markup and emoji are removed')
+    watermark_mode = watermark_mode or WATERMARK_MODE
+    inline_watermark = watermark_mode == 'on'
+    with spans.span('cache'):
+        key = cache_key(text, style, watermark_mode, voice)
+        cached = audio_cache.get(key) if use_cache else None
+    if cached is not None:
+        spans.path = spans.path or 'cache'
+        spans.plan = spans.plan or 'cache'
+        return cached
+    
+    def compute():
+        submitted = time.perf_counter()
+        if batcher is not None:
+            audio, sample_rate, work_spans = batcher.submit(
+                (text, style, inline_watermark, voice), timeout=timeout, wait_for_slot=wait_for_slot
+            )
+        else:
+            work_spans = Spans()
+            audio, sample_rate = inference_pool.submit(
+                lambda backend: synthesize_audio(
+                    text, style, backend=backend, watermark=inline_watermark, spans=work_spans, voice=voice
+                ),
+                timeout=timeout, wait_for_slot=wait_for_slot
+            )
+        queued = max(0.0, time.perf_counter() - submitted - work_spans.total())
         
-        # Load models - check if checkpoints exist
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        project_root = os.path.dirname(script_dir)
-        ckpt_base = os.path.join(project_root, 'checkpoints', 'base_speakers', 'EN')
-        ckpt_converter = os.path.join(project_root, 'checkpoints', 'converter')
+        # Stored before the in-flight entry is released, so later requests hit the cache
+        # 'async': the reply goes out unwatermarked, only the persisted copy is watermarked
+        persist_transform = watermark_in_background if watermark_mode == 'async' else None
+        audio_cache.put(key, audio, sample_rate, persist_transform=persist_transform)
+        return audio, sample_rate, work_spans, queued
+    
+    waiting = time.perf_counter()
+    if use_cache:
+        result, leader = inflight.run(key, compute, timeout=timeout if timeout is not None else REQUEST_TIMEOUT)
+    else:
+        result, leader = compute(), True
+    audio, sample_rate, work_spans, queued = result
+    if leader:
+        spans.add('queue', queued)
+        spans.merge(work_spans)
+    else:
+        # Another request rendered this utterance while we waited for it
+        spans.add('coalesced', time.perf_counter() - waiting)
+        spans.path = spans.path or work_spans.path
+        spans.plan = spans.plan or work_spans.plan
+    return audio, sample_rate
+
+def synthesis_request_data():
+    """JSON body of a synthesis request, checked before anything is queued; raises ValueError
+
+    Requests share micro-batches, so a malformed one must be turned away
+    here: an error inside the models would fail every request batched with it.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    text = data.get('text')
+    if not isinstance(text, str) or not text.strip():
+        raise ValueError('No text provided')
+    for field in ('style', 'language', 'format'):
+        if not isinstance(data.get(field, ''), str):
+            raise ValueError(f'{field} must be a string')
+    return data
+
+def request_watermark_mode(data):
+    """Watermark mode from the JSON body (None means the deployment default)"""
+    mode = data.get('watermark')
+    if mode is None:
+        return None
+    if isinstance(mode, bool):
+        return 'on' if mode else 'off'
+    if mode not in WATERMARK_MODES:
+        raise ValueError(f"Unknown watermark mode: {mode} (expected one of {', '.join(WATERMARK_MODES)})")
+    return mode
+
+def request_timeout(data):
+    """Per-request timeout from the JSON body, capped at OPENVOICE_REQUEST_TIMEOUT; raises ValueError"""
+    timeout = data.get('timeout')
+    if timeout is None:
+        return REQUEST_TIMEOUT
+    if isinstance(timeout, bool) or not isinstance(timeout, (int, float)) or not timeout > 0:
+        raise ValueError('timeout must be a positive number of seconds')
+    return min(float(timeout), REQUEST_TIMEOUT)
+
+def request_use_cache(data):
+    """Whether the request may be served from (and share) the utterance cache; raises ValueError"""
+    use_cache = data.get('cache', True)
+    if not isinstance(use_cache, bool):
+        raise ValueError('cache must be true or false')
+    return use_cache
+
+def busy_response(error):
+    """503 with Retry-After for a full inference queue"""
+    print(f"⚠️  Rejecting synthesis: {error}")
+    response = jsonify({'error': str(error)})
+    response.headers['Retry-After'] = '1'
+    return response, 503
+
+def voice_error_response(voice):
+    """Error response if a requested voice can't be used (yet), else None"""
+    if voice is None:
+        return None
+    if not isinstance(voice, str):
+        return jsonify({'error': 'voice must be a voice id string'}), 400
+    try:
+        voice_registry.check(voice)
+    except VoiceNotFoundError:
+        return jsonify({'error': f'Unknown voice: {voice}'}), 404
+    except VoiceNotReadyError as e:
+        response = jsonify({'error': str(e), 'voice': voice, 'state': e.state})
+        if e.state == 'pending':
+            response.headers['Retry-After'] = '1'
+            return response, 409
+        return response, 422
+    return None
+
+def models_unavailable_response():
+    """Load the models if needed; return an error response if synthesis can't run, else None"""
+    # Don't queue behind a cold start - the client falls back to system TTS
+    if service_state['state'] == 'loading':
+        response = jsonify({'error': 'OpenVoice models are still loading'})
+        response.headers['Retry-After'] = '2'
+        return response, 503
+    
+    # Try to load OpenVoice if not loaded
+    if openvoice_model is None:
+        load_openvoice()
+    
+    if openvoice_model and openvoice_model.get('base_speaker_tts') is not None and inference_pool is not None:
+        return None
+    
+    # OpenVoice models failed to load - provide helpful error
+    error_msg = "OpenVoice models not loaded"
+    details = "Checkpoints missing or models failed to load. Check server console for details."
+    
+    print(f"❌ {error_msg}")
+    print(f"   Details: {details}")
+    print("   To fix:")
+    print("   1. Run: ./download_checkpoints.sh for instructions")
+    print("   2. Download checkpoints from: https://github.com/myshell-ai/OpenVoice")
+    print("   3. Place in: checkpoints/base_speakers/EN/ and checkpoints/converter/")
+    print("   4. Restart the service")
+    
+    return jsonify({
+        'error': error_msg,
+        'details': details,
+        'help': 'Run ./download_checkpoints.sh for setup instructions'
+    }), 503
+
+def observe_request(endpoint, style, spans, status, seconds):
+    """Record a finished request's stage spans and total latency"""
+    path = spans.path or 'none'
+    for stage, duration in spans.durations.items():
+        stage_seconds.observe(duration, stage=stage, style=style, path=path)
+    request_seconds.observe(seconds, endpoint=endpoint, style=style, path=path, status=str(status))
+    requests_total.inc(endpoint=endpoint, status=str(status))
+    if spans.plan is not None:
+        plans_total.inc(path=path, plan=spans.plan)
+
+@app.before_request
+def start_request_spans():
+    if request.endpoint in INSTRUMENTED_ENDPOINTS:
+        g.spans = Spans()
+        g.style = 'default'
+        g.started = time.perf_counter()
+
+@app.after_request
+def finish_request_spans(response):
+    """Add the plan and Server-Timing headers and record metrics once the body has been written"""
+    spans = g.get('spans')
+    if spans is None:
+        return response
+    if spans.plan is not None:
+        response.headers['X-Sprout-Path'] = spans.path or 'none'
+        response.headers['X-Sprout-Plan'] = spans.plan
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = spans.server_timing()
+    if g.get('metrics_deferred'):
+        return response  # The stream generator records its own metrics
+    
+    endpoint, style, started = request.endpoint, g.style, g.started
+    handed_off = time.perf_counter()
+    
+    def on_close():
+        spans.add('write', time.perf_counter() - handed_off)
+        observe_request(endpoint, style, spans, response.status_code, time.perf_counter() - started)
+    
+    response.call_on_close(on_close)
+    return response
+
+@app.route('/metrics', methods=['GET'])
+def metrics_endpoint():
+    """Prometheus text-format metrics: per-stage and per-request latency histograms"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
+@app.route('/synthesize', methods=['POST'])
+def synthesize():
+    """Synthesize speech from text
+
+    The response format is negotiated from the Accept header: WAV (default),
+    raw PCM at a requested rate and bit depth, FLAC or Ogg Opus.
+    """
+    try:
+        with g.spans.span('parse'):
+            try:
+                data = synthesis_request_data()
+                watermark_mode = request_watermark_mode(data)
+                timeout, use_cache = request_timeout(data), request_use_cache(data)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            text = frontend.normalize(data['text'])
+            language = data.get('language', 'en')
+            style = data.get('style', 'default')  # Voice type/emotion: default, excited, friendly, cheerful, sad
+            voice = data.get('voice')  # Voice id from /clone (default: the reference voice)
+            g.style = style if style in VOICE_STYLES else 'default'
+            if not text:
+                return jsonify({'error': 'No speakable text provided'}), 400
         
-        if not os.path.exists(ckpt_base):
-            print(f"❌ Base speaker checkpoints not found at: {ckpt_base}")
-            print("   Please download checkpoints from: https://github.com/myshell-ai/OpenVoice")
-            raise FileNotFoundError(f"Checkpoints not found: {ckpt_base}")
+        error_response = models_unavailable_response() or voice_error_response(voice)
+        if error_response is not None:
+            return error_response
         
-        if not os.path.exists(ckpt_converter):
-            print(f"❌ Converter checkpoints not found at: {ckpt_converter}")
-            print("   Please download checkpoints from: https://github.com/myshell-ai/OpenVoice")
-            raise FileNotFoundError(f"Checkpoints not found: {ckpt_converter}")
+        try:
+            audio_format = negotiate_format(request.headers.get('Accept'), openvoice_model['backend'].sampling_rate)
+        except UnsupportedFormatError as e:
+            return jsonify({'error': str(e), 'formats': ['audio/wav', 'audio/pcm', 'audio/flac', 'audio/ogg;codecs=opus']}), 406
         
-        device = 'cuda' if os.system('nvidia-smi') == 0 else 'cpu'
-        print(f"🔧 Using device: {device}")
+        audio, sample_rate = render(
+            text, style, timeout=timeout, use_cache=use_cache,
+            watermark_mode=watermark_mode, spans=g.spans, voice=voice
+        )
+        with g.spans.span('encode'):
+            body = encode_audio(resample(audio, sample_rate, audio_format.sample_rate), audio_format)
+        response = Response(body, content_type=content_type(audio_format))
+        response.headers['X-Audio-Sample-Rate'] = str(audio_format.sample_rate)
+        response.headers['Vary'] = 'Accept'
+        return response
+    
+    except PoolBusyError as e:
+        return busy_response(e)
+    except InferenceTimeoutError as e:
+        print(f"⏱️  {e}")
+        return jsonify({'error': str(e)}), 504
+    except Exception as e:
+        print(f"❌ Synthesis error: {e}")
+        import traceback
+        traceback.print_exc()
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/synthesize/stream', methods=['POST'])
+def synthesize_stream():
+    """Synthesize speech sentence by sentence, streaming each chunk as soon as it is ready
+
+    format 'frames' (default): [uint32 LE length][WAV file] per sentence
+    format 'wav': one open-ended WAV header followed by 16-bit PCM
+    """
+    spans = g.spans
+    try:
+        with spans.span('parse'):
+            try:
+                data = synthesis_request_data()
+                watermark_mode = request_watermark_mode(data)
+                timeout, use_cache = request_timeout(data), request_use_cache(data)
+            except ValueError as e:
+                return jsonify({'error': str(e)}), 400
+            text = data['text']
+            style = data.get('style', 'default')
+            voice = data.get('voice')
+            stream_format = data.get('format', 'frames')
+            g.style = style if style in VOICE_STYLES else 'default'
+            
+            if stream_format not in STREAM_FORMATS:
+                return jsonify({'error': f'Unknown stream format: {stream_format}', 'formats': list(STREAM_FORMATS)}), 400
         
-        print("   Loading BaseSpeakerTTS...")
-        base_speaker_tts = BaseSpeakerTTS(f'{ckpt_base}/config.json', device=device)
-        base_speaker_tts.load_ckpt(f'{ckpt_base}/checkpoint.pth')
-        print("   ✅ BaseSpeakerTTS loaded")
+        error_response = models_unavailable_response() or voice_error_response(voice)
+        if error_response is not None:
+            return error_response
         
-        print("   Loading ToneColorConverter...")
-        tone_color_converter = ToneColorConverter(
-            f'{ckpt_converter}/config.json', device=device
+        # Normalized once here; render() and the models take the chunks as they are
+        chunks = frontend.segments(text)
+        if not chunks:
+            return jsonify({'error': 'No speakable text provided'}), 400
+        sample_rate = openvoice_model['backend'].sampling_rate
+        
+        # Admission control happens on the first chunk, before any bytes are sent
+        first_chunk = render(
+            chunks[0], style, timeout=timeout, use_cache=use_cache, watermark_mode=watermark_mode, spans=spans,
+            voice=voice
         )
-        tone_color_converter.load_ckpt(f'{ckpt_converter}/checkpoint.pth')
-        print("   ✅ ToneColorConverter loaded")
         
-        openvoice_model = {
-            'base_speaker_tts': base_speaker_tts,
-            'tone_color_converter': tone_color_converter,
-            'device': device,
-            'get_se': get_se  # Store the get_se function
-        }
+        # The Server-Timing header only covers the first chunk; /metrics gets the whole stream
+        started, metrics_style = g.started, g.style
+        g.metrics_deferred = True
         
-        print("✅ OpenVoice models loaded successfully!")
+        def generate():
+            status = 200
+            try:
+                if stream_format == 'wav':
+                    yield streaming_wav_header(sample_rate)
+                for index, chunk in enumerate(chunks):
+                    try:
+                        if index == 0:
+                            audio, chunk_rate = first_chunk
+                        else:
+                            # Already admitted - wait for a worker rather than failing mid-stream
+                            audio, chunk_rate = render(
+                                chunk, style, timeout=timeout, wait_for_slot=True,
+                                use_cache=use_cache, watermark_mode=watermark_mode, spans=spans, voice=voice
+                            )
+                    except Exception as e:
+                        # Headers are already sent - end the stream early
+                        print(f"❌ Streaming synthesis failed on chunk {index + 1}/{len(chunks)}: {e}")
+                        status = 500
+                        return
+                    with spans.span('encode'):
+                        if stream_format == 'wav':
+                            payload = float_to_pcm16(audio)
+                            if index < len(chunks) - 1:
+                                payload += silence_pcm16(chunk_rate, SENTENCE_GAP / SPEECH_SPEED)
+                        else:
+                            payload = encode_frame(encode_wav(audio, chunk_rate))
+                    write_start = time.perf_counter()
+                    yield payload
+                    spans.add('write', time.perf_counter() - write_start)
+            finally:
+                observe_request('synthesize_stream', metrics_style, spans, status, time.perf_counter() - started)
         
+        mimetype = 'audio/wav' if stream_format == 'wav' else FRAMES_MIMETYPE
+        response = Response(generate(), mimetype=mimetype, direct_passthrough=True)
+        response.headers['X-Sprout-Stream-Format'] = stream_format
+        response.headers['X-Sprout-Chunks'] = str(len(chunks))
+        response.headers['X-Audio-Sample-Rate'] = str(sample_rate)
+        return response
+    
+    except PoolBusyError as e:
+        return busy_response(e)
+    except InferenceTimeoutError as e:
+        print(f"⏱️  {e}")
+        return jsonify({'error': str(e)}), 504
     except Exception as e:
-        print(f"❌ OpenVoice loading failed: {e}")
+        print(f"❌ Streaming synthesis error: {e}")
         import traceback
         traceback.print_exc()
-        openvoice_model = None
+        return jsonify({'error': str(e)}), 500
 
-@app.route('/health', methods=['GET'])
-def health():
-    """Health check endpoint"""
-    return jsonify({'status': 'ok', 'openvoice_loaded': openvoice_model is not None})
+def parse_batch_items(data):
+    """Validate manifest items into (id, text, style, voice) tuples; raises ValueError"""
+    if not isinstance(data, dict):
+        raise ValueError('Request body must be a JSON object')
+    items = data.get('items')
+    if not isinstance(items, list) or not items:
+        raise ValueError('No items provided')
+    if len(items) > BATCH_MAX_ITEMS:
+        raise ValueError(f'Too many items ({len(items)} > {BATCH_MAX_ITEMS}), split the manifest')
+    for field in ('style', 'voice', 'format'):
+        if data.get(field) is not None and not isinstance(data[field], str):
+            raise ValueError(f'{field} must be a string')
+    if not isinstance(data.get('known') or {}, dict):
+        raise ValueError('known must be an object of item ids to keys')
+    default_style = data.get('style') or 'default'
+    default_voice = data.get('voice')
+    parsed, seen = [], set()
+    for number, item in enumerate(items, 1):
+        text = item.get('text') if isinstance(item, dict) else None
+        if not isinstance(text, str) or not text.strip() or item.get('id') in (None, ''):
+            raise ValueError(f'Item {number} needs an id and text')
+        item_id = str(item['id'])
+        if item_id in seen:
+            raise ValueError(f'Duplicate item id: {item_id}')
+        seen.add(item_id)
+        style, voice = item.get('style', default_style), item.get('voice', default_voice)
+        if not isinstance(style, str) or (voice is not None and not isinstance(voice, str)):
+            raise ValueError(f'Item {number}: style and voice must be strings')
+        parsed.append((item_id, text, style, voice))
+    return parsed
 
-@app.route('/synthesize', methods=['POST'])
-def synthesize():
-    """Synthesize speech from text"""
+def batch_filename(item_id, extension):
+    """Archive-safe file name for an item id
+
+    Ids that are already safe names are used as they are. Others get a safe
+    stem plus a hash of the id, so 'a/b' and 'a_b' never share a file. The
+    name depends on the id alone: the same in every request, chunk and run.
+    """
+    stem = re.sub(r'[^A-Za-z0-9._-]+', '_', item_id).strip('._') or 'item'
+    if stem != item_id or len(stem) > BATCH_MAX_STEM:
+        stem = f'{stem[:BATCH_MAX_STEM]}-{utterance_key(item_id)[:10]}'
+    return f'{stem}{extension}'
+
+@app.route('/synthesize/batch', methods=['POST'])
+def synthesize_batch_route():
+    """Render a manifest of phrases into a zip of audio files plus index.json
+
+    Body: {"items": [{"id": "breath-1", "text": "...", "style": "friendly"}, ...],
+           "format": "audio/wav", "voice": "<id from /clone>",
+           "known": {"breath-1": "<key from an earlier index.json>"}}
+    A JSONL body (application/jsonl or application/x-ndjson, one item per
+    line) is accepted too, with format, style and voice as query parameters.
+    Items may set their own voice. Every item's key covers its text, style,
+    voice, checkpoints and format. Items whose key
+    matches `known` are reported as unchanged and not rendered again.
+    """
     try:
-        data = request.json
-        text = data.get('text', '')
-        language = data.get('language', 'en')
-        style = data.get('style', 'default')  # Voice type/emotion: default, excited, friendly, cheerful, sad
+        try:
+            if request.mimetype in ('application/jsonl', 'application/x-ndjson'):
+                lines = request.get_data(as_text=True).splitlines()
+                try:
+                    items = [json.loads(line) for line in lines if line.strip()]
+                except ValueError:
+                    raise ValueError('Every JSONL line must be a JSON object')
+                data = {
+                    'items': items,
+                    'format': request.args.get('format'),
+                    'style': request.args.get('style', 'default'),
+                    'voice': request.args.get('voice'),
+                }
+            else:
+                data = request.get_json(silent=True)
+            items = parse_batch_items(data)
+        except ValueError as e:
+            return jsonify({'error': str(e)}), 400
+        known = data.get('known') or {}
         
-        if not text:
-            return jsonify({'error': 'No text provided'}), 400
+        error_response = models_unavailable_response()
+        for voice in {voice for _, _, _, voice in items}:
+            error_response = error_response or voice_error_response(voice)
+        if error_response is not None:
+            return error_response
         
-        # Try to load OpenVoice if not loaded
-        if openvoice_model is None:
-            load_openvoice()
+        try:
+            audio_format = negotiate_format(data.get('format'), openvoice_model['backend'].sampling_rate)
+        except UnsupportedFormatError as e:
+            return jsonify({'error': str(e)}), 406
         
-        # Use OpenVoice if available
-        if openvoice_model and openvoice_model.get('base_speaker_tts') is not None:
-            from scipy.io.wavfile import write
-            import numpy as np
-            import tempfile
-            
-            base_speaker_tts = openvoice_model['base_speaker_tts']
-            tone_color_converter = openvoice_model['tone_color_converter']
-            get_se = openvoice_model['get_se']
-            device = openvoice_model['device']
-            
-            # Generate base speech - try jon_reference first, then default
-            script_dir = os.path.dirname(os.path.abspath(__file__))
-            project_root = os.path.dirname(script_dir)
-            
-            src_path = os.path.join(project_root, 'resources', 'audio', 'jon_reference.wav')  # Jon's voice
-            if not os.path.exists(src_path):
-                src_path = os.path.join(project_root, 'resources', 'audio', 'reference.wav')  # Fallback reference
-            if not os.path.exists(src_path):
-                # No reference audio - use MeloTTS if available, otherwise use base speaker only
-                if tts_model is not None:
-                    # Use MeloTTS to generate base speech
-                    speaker_ids = tts_model.hps.data.spk2id
-                    speaker_id = speaker_ids.get('EN-US', 0)
-                    
-                    speed = 1.1  # 10% faster
-                    tmp_src_path = tempfile.mktemp(suffix='.wav')
-                    # Note: MeloTTS doesn't support emotion styles, so we use base speed
-                    tts_model.tts_to_file(text, speaker_id, tmp_src_path, speed=speed)
-                    
-                    # Extract embeddings from generated audio
-                    source_se, _ = get_se(tmp_src_path, tone_color_converter, vad=True)
-                    target_se = source_se  # Use same embedding if no reference
-                    
-                    # Convert tone (will just pass through since src_se == tgt_se)
-                    tgt_path = tempfile.mktemp(suffix='.wav')
-                    encode_message = "@MyShell"
-                    tone_color_converter.convert(
-                        audio_src_path=tmp_src_path,
-                        src_se=source_se,
-                        tgt_se=target_se,
-                        output_path=tgt_path,
-                        message=encode_message
-                    )
-                    
-                    # Read and return audio
-                    with open(tgt_path, 'rb') as f:
-                        audio_data = f.read()
-                    
-                    os.remove(tgt_path)
-                    os.remove(tmp_src_path)
-                    
-                    return send_file(
-                        io.BytesIO(audio_data),
-                        mimetype='audio/wav',
-                        as_attachment=False
-                    )
-                else:
-                    # Fallback: use base speaker TTS only (no voice cloning)
-                    tmp_src_path = tempfile.mktemp(suffix='.wav')
-                    speaker_style = style if style in ['default', 'excited', 'friendly', 'cheerful', 'sad', 'angry', 'terrified', 'shouting', 'whispering'] else 'default'
-                    base_speaker_tts.tts(text, tmp_src_path, speaker=speaker_style, language='English', speed=1.1)  # 10% faster
-                    
-                    with open(tmp_src_path, 'rb') as f:
-                        audio_data = f.read()
-                    
-                    os.remove(tmp_src_path)
-                    
-                    return send_file(
-                        io.BytesIO(audio_data),
-                        mimetype='audio/wav',
-                        as_attachment=False
-                    )
+        # One render per distinct key, even if several ids share the same phrase
+        entries, jobs = [], {}
+        for item_id, text, style, voice in items:
+            key = utterance_key(cache_key(frontend.normalize(text), style, voice=voice), content_type(audio_format))
+            entry = {'id': item_id, 'text': text, 'style': style, 'key': key}
+            if voice is not None:
+                entry['voice'] = voice
+            if known.get(item_id) == key:
+                entry['status'] = 'unchanged'
             else:
-                # Use reference voice (Jon's voice)
-                print(f"🎤 Using reference voice: {src_path}")
-                
-                # Step 1: Generate base speech from text with selected voice style
-                tmp_src_path = tempfile.mktemp(suffix='.wav')
-                speaker_style = style if style in ['default', 'excited', 'friendly', 'cheerful', 'sad', 'angry', 'terrified', 'shouting', 'whispering'] else 'default'
-                base_speaker_tts.tts(text, tmp_src_path, speaker=speaker_style, language='English', speed=1.1)  # 10% faster
-                
-                # Step 2: Extract target speaker embedding from reference audio
-                target_se, audio_name = get_se(src_path, tone_color_converter, vad=True)
-                
-                # Step 3: Load source speaker embedding (default English speaker)
-                source_se_path = os.path.join(project_root, 'checkpoints', 'base_speakers', 'EN', 'en_default_se.pth')
-                if not os.path.exists(source_se_path):
-                    # Fallback: try to extract from generated audio (less ideal)
-                    print("⚠️  en_default_se.pth not found, extracting from generated audio")
-                    source_se, _ = get_se(tmp_src_path, tone_color_converter, vad=True)
-                else:
-                    import torch
-                    source_se = torch.load(source_se_path, map_location=device)
-                
-                # Step 4: Convert tone color
-                tgt_path = tempfile.mktemp(suffix='.wav')
-                encode_message = "@MyShell"
-                tone_color_converter.convert(
-                    audio_src_path=tmp_src_path,
-                    src_se=source_se,
-                    tgt_se=target_se,
-                    output_path=tgt_path,
-                    message=encode_message
-                )
-                
-                # Step 5: Read and return audio
-                with open(tgt_path, 'rb') as f:
-                    audio_data = f.read()
-                
-                # Cleanup
-                os.remove(tgt_path)
-                os.remove(tmp_src_path)
-                
-                return send_file(
-                    io.BytesIO(audio_data),
-                    mimetype='audio/wav',
-                    as_attachment=False
-                )
-        else:
-            # OpenVoice models failed to load - provide helpful error
-            error_msg = "OpenVoice models not loaded"
-            details = "Checkpoints missing or models failed to load. Check server console for details."
-            
-            print(f"❌ {error_msg}")
-            print(f"   Details: {details}")
-            print("   To fix:")
-            print("   1. Run: ./download_checkpoints.sh for instructions")
-            print("   2. Download checkpoints from: https://github.com/myshell-ai/OpenVoice")
-            print("   3. Place in: checkpoints/base_speakers/EN/ and checkpoints/converter/")
-            print("   4. Restart the service")
-            
-            return jsonify({
-                'error': error_msg,
-                'details': details,
-                'help': 'Run ./download_checkpoints.sh for setup instructions'
-            }), 503
-            
+                jobs.setdefault(key, (frontend.normalize(text), style, voice))
+            entries.append(entry)
+        
+        # Enough requests in flight to fill every worker's micro-batches; similar
+        # lengths are submitted together so padded batches waste little
+        results = {}
+        if jobs:
+            parallel = inference_pool.workers * (MAX_BATCH if batcher is not None else 1)
+            ordered = sorted(jobs.items(), key=lambda job: len(job[1][0]))
+            with ThreadPoolExecutor(max_workers=min(parallel, len(jobs)), thread_name_prefix='openvoice-batch-render') as executor:
+                futures = {
+                    executor.submit(render, text, style, wait_for_slot=True, voice=voice): key
+                    for key, (text, style, voice) in ordered
+                }
+                for future in as_completed(futures):
+                    try:
+                        results[futures[future]] = future.result()
+                    except Exception as e:
+                        print(f"⚠️  Batch item failed: {e}")
+                        results[futures[future]] = e
+        
+        buffer, owners = io.BytesIO(), {}  # file name (case-folded, as on macOS) -> item id
+        extension = FILE_EXTENSIONS[audio_format.name]
+        with zipfile.ZipFile(buffer, 'w', zipfile.ZIP_STORED) as archive:
+            for entry in entries:
+                if entry.get('status') == 'unchanged':
+                    continue
+                result = results[entry['key']]
+                if isinstance(result, Exception):
+                    entry.update(status='failed', error=str(result))
+                    continue
+                name = batch_filename(entry['id'], extension)
+                owner = owners.setdefault(name.lower(), entry['id'])
+                if owner != entry['id']:
+                    entry.update(status='failed', error=f'File name {name} is already used by item {owner}')
+                    continue
+                audio, sample_rate = result
+                audio = resample(audio, sample_rate, audio_format.sample_rate)
+                entry.update(status='rendered', file=name, duration=round(len(audio) / audio_format.sample_rate, 3))
+                archive.writestr(entry['file'], encode_audio(audio, audio_format))
+            archive.writestr('index.json', json.dumps(
+                {'format': content_type(audio_format), 'items': entries}, indent=2
+            ))
+        
+        summary = {status: sum(1 for entry in entries if entry['status'] == status)
+                   for status in ('rendered', 'unchanged', 'failed')}
+        print(f"📦 Batch synthesis: {summary}")
+        response = Response(buffer.getvalue(), mimetype='application/zip')
+        for status, count in summary.items():
+            response.headers[f'X-Sprout-{status.capitalize()}'] = str(count)
+        return response
+    
     except Exception as e:
-        print(f"❌ Synthesis error: {e}")
+        print(f"❌ Batch synthesis error: {e}")
         import traceback
         traceback.print_exc()
         return jsonify({'error': str(e)}), 500
 
+@app.route('/cache/prewarm', methods=['POST'])
+def cache_prewarm():
+    """Render phrases ahead of time so later requests for them are cache hits
+
+    Body: {"phrases": ["Hello Seedling!", {"text": "...", "style": "cheerful"}], "style": "default"}
+    """
+    try:
+        data = request.get_json(silent=True)
+        if not isinstance(data, dict):
+            return jsonify({'error': 'Request body must be a JSON object'}), 400
+        phrases = data.get('phrases', [])
+        default_style = data.get('style', 'default')
+        
+        if not isinstance(phrases, list) or not phrases:
+            return jsonify({'error': 'No phrases provided'}), 400
+        if not isinstance(default_style, str):
+            return jsonify({'error': 'style must be a string'}), 400
+        
+        error_response = models_unavailable_response()
+        if error_response is not None:
+            return error_response
+        
+        summary = {'rendered': 0, 'cached': 0, 'failed': 0}
+        for phrase in phrases:
+            if isinstance(phrase, dict):
+                text, style = phrase.get('text', ''), phrase.get('style', default_style)
+            else:
+                text, style = str(phrase), default_style
+            text = frontend.normalize(text) if isinstance(text, str) else ''
+            if not text or not isinstance(style, str):
+                summary['failed'] += 1
+                continue
+            
+            if cache_key(text, style) in audio_cache:
+                summary['cached'] += 1
+                continue
+            try:
+                # Background work - wait for a worker instead of competing for queue slots
+                render(text, style, wait_for_slot=True)
+                summary['rendered'] += 1
+            except Exception as e:
+                print(f"⚠️  Prewarm failed for '{text[:40]}': {e}")
+                summary['failed'] += 1
+        
+        print(f"🔥 Prewarmed cache: {summary}")
+        return jsonify({'status': 'success', **summary, 'cache': audio_cache.stats()})
+        
+    except Exception as e:
+        print(f"❌ Cache prewarm error: {e}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/cache/stats', methods=['GET'])
+def cache_stats():
+    """Utterance cache hit/miss counters and occupancy"""
+    return jsonify(audio_cache.stats())
+
 @app.route('/clone', methods=['POST'])
 def clone_voice():
-    """Clone voice from reference audio"""
+    """Register a voice from reference audio and prepare it in the background
+
+    Accepts a multipart upload (field 'audio') or a raw audio body. Returns
+    202 with the voice id to pass as `voice` to the synthesis endpoints;
+    GET /voices/<id> reports when it is ready. Uploading the same audio
+    again returns the same id.
+    """
     try:
-        if 'audio' not in request.files:
+        if 'audio' in request.files:
+            data = request.files['audio'].read()
+        elif request.mimetype.startswith('audio/') or request.mimetype == 'application/octet-stream':
+            data = request.get_data()
+        else:
+            data = b''
+        if not data:
             return jsonify({'error': 'No audio file provided'}), 400
         
-        audio_file = request.files['audio']
-        
-        # Save reference audio
-        reference_path = 'resources/audio/reference.wav'
-        os.makedirs(os.path.dirname(reference_path), exist_ok=True)
-        audio_file.save(reference_path)
+        error_response = models_unavailable_response()
+        if error_response is not None:
+            return error_response
         
-        return jsonify({'status': 'success', 'message': 'Voice cloned successfully'})
+        voice = voice_registry.add(data, openvoice_model['backend'].sampling_rate, extract_voice_embedding)
+        print(f"🎙️  Voice {voice} registered ({len(data):,} bytes)")
+        return jsonify({'status': 'accepted', **voice_registry.describe(voice)}), 202
         
     except Exception as e:
         print(f"❌ Voice cloning error: {e}")
         return jsonify({'error': str(e)}), 500
 
+def extract_voice_embedding(audio):
+    """Speaker embedding of a normalized reference; runs on the registry's job thread"""
+    get_se = openvoice_model['get_se']
+    # The model pass waits for an inference worker
+    return inference_pool.submit(lambda backend: backend.extract_se(audio, get_se), wait_for_slot=True)
+
+@app.route('/voices/<voice>', methods=['GET'])
+def voice_status(voice):
+    """State of a cloned voice: pending, ready or failed"""
+    description = voice_registry.describe(voice)
+    if description['state'] == 'unknown':
+        return jsonify({'error': f'Unknown voice: {voice}'}), 404
+    return jsonify(description)
+
+def serve(port, wsgi_app=None, threads=None):
+    """Run the app (or the supervisor front end) with the server selected by OPENVOICE_SERVER (flask or waitress)"""
+    wsgi_app = wsgi_app or app
+    server = os.environ.get('OPENVOICE_SERVER', 'flask')
+    if server == 'waitress':
+        try:
+            from waitress import serve as waitress_serve
+        except ImportError:
+            print("⚠️  waitress not installed (pip install waitress), using Flask's server")
+        else:
+            # Enough threads for every queued request plus health checks
+            threads = threads or INFERENCE_WORKERS + INFERENCE_QUEUE_SIZE + 4
+            print(f"🚀 Serving with waitress ({threads} threads)")
+            waitress_serve(wsgi_app, host='0.0.0.0', port=port, threads=threads)
+            return
+    elif server != 'flask':
+        print(f"⚠️  Unknown OPENVOICE_SERVER '{server}', using Flask's server")
+    
+    wsgi_app.run(host='0.0.0.0', port=port, debug=False, threaded=True)
+
 if __name__ == '__main__':
     import socket
     
@@ -316,6 +1388,27 @@ if __name__ == '__main__':
             print(f"❌ No available ports found (6000-6009)")
             sys.exit(1)
     
+    # Supervisor mode: load once, fork one worker process per core set, route to the least loaded
+    if PROCESSES > 1:
+        from supervisor import run_supervisor
+        
+        def load_models():
+            load_openvoice(start_workers=False)
+            return openvoice_model is not None
+        
+        service_state['eager'] = True
+        print(f"🌱 Starting Sprout OpenVoice Service on port {port} ({PROCESSES} worker processes)...")
+        run_supervisor(
+            app, load_models, start_inference, lambda front, threads: serve(port, front, threads),
+            PROCESSES, threads_per_process=THREADS_PER_PROCESS, timeout=REQUEST_TIMEOUT
+        )
+        sys.exit(0)
+    
+    # Load and warm up the models in the background unless OPENVOICE_EAGER_LOAD=0
+    if os.environ.get('OPENVOICE_EAGER_LOAD', '1') != '0':
+        service_state['eager'] = True
+        start_background_load()
+    
     print(f"🌱 Starting Sprout OpenVoice Service on port {port}...")
-    app.run(host='0.0.0.0', port=port, debug=False)
+    serve(port)
 
@@ -0,0 +1,212 @@
+#!/usr/bin/env python3
+"""
+CPU-optimized variants of the OpenVoice models for the Sprout OpenVoice service
+int8: dynamic quantization of the linear and recurrent layers.
+torchscript / onnx: the HiFi-GAN decoders of both models (most of the CPU
+time) replaced by exported graphs; text encoder, duration predictor and flow
+stay eager because their shapes depend on the predicted durations.
+Exports are written by export_models.py and tied to the checkpoint hash.
+"""
+
+import os
+import copy
+import json
+
+import numpy as np
+
+BACKEND_VARIANTS = ('eager', 'int8', 'torchscript', 'onnx')
+EXPORT_FORMATS = ('torchscript', 'onnx')
+EXPORT_MANIFEST = 'manifest.json'
+EXPORT_FILES = {
+    'torchscript': {'base': 'base_speaker_decoder.pt', 'converter': 'converter_decoder.pt'},
+    'onnx': {'base': 'base_speaker_decoder.onnx', 'converter': 'converter_decoder.onnx'},
+}
+ONNX_OPSET = 17
+
+
+class StaleExportError(RuntimeError):
+    """Exported decoders are missing or were made from other checkpoints"""
+
+
+def model_networks(base_speaker_tts, tone_color_converter):
+    """{'base': SynthesizerTrn, 'converter': SynthesizerTrn}"""
+    return {'base': base_speaker_tts.model, 'converter': tone_color_converter.model}
+
+
+def quantize_models(base_speaker_tts, tone_color_converter):
+    """Dynamic int8 quantization (in place) of every Linear/GRU/LSTM layer
+
+    Convolutions have no dynamic quantization in PyTorch, so the decoders
+    stay fp32 - the parity check and the backend benchmark show what this
+    buys on a given host.
+    """
+    import torch
+    from torch.ao.quantization import quantize_dynamic
+
+    for network in model_networks(base_speaker_tts, tone_color_converter).values():
+        quantize_dynamic(network, {torch.nn.Linear, torch.nn.GRU, torch.nn.LSTM}, dtype=torch.qint8, inplace=True)
+
+
+def _decoder_for_export(network):
+    """fp32 copy of a model's decoder with weight norm folded into the weights"""
+    decoder = copy.deepcopy(network.dec).cpu().eval()
+    if hasattr(decoder, 'remove_weight_norm'):
+        decoder.remove_weight_norm()
+    return decoder
+
+
+def _example_inputs(decoder, batch=2, frames=64):
+    import torch
+    x = torch.randn(batch, decoder.conv_pre.in_channels, frames)
+    g = torch.randn(batch, decoder.cond.in_channels, 1)
+    return x, g
+
+
+def export_decoders(base_speaker_tts, tone_color_converter, export_format, export_dir, weights_hash):
+    """Write TorchScript or ONNX versions of both decoders plus a manifest; returns the paths"""
+    import torch
+
+    os.makedirs(export_dir, exist_ok=True)
+    paths = {}
+    for name, network in model_networks(base_speaker_tts, tone_color_converter).items():
+        decoder = _decoder_for_export(network)
+        x, g = _example_inputs(decoder)
+        path = os.path.join(export_dir, EXPORT_FILES[export_format][name])
+        with torch.no_grad():
+            if export_format == 'torchscript':
+                torch.jit.save(torch.jit.trace(decoder, (x, g)), path)
+            else:
+                torch.onnx.export(
+                    decoder, (x, g), path, input_names=['x', 'g'], output_names=['audio'],
+                    dynamic_axes={'x': {0: 'batch', 2: 'frames'}, 'g': {0: 'batch'}, 'audio': {0: 'batch', 2: 'samples'}},
+                    opset_version=ONNX_OPSET
+                )
+        paths[name] = path
+
+    manifest_path = os.path.join(export_dir, EXPORT_MANIFEST)
+    try:
+        with open(manifest_path) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        manifest = {}
+    manifest[export_format] = {'weights_hash': weights_hash, 'torch': torch.__version__, 'files': EXPORT_FILES[export_format]}
+    with open(f'{manifest_path}.tmp', 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(f'{manifest_path}.tmp', manifest_path)
+    return paths
+
+
+class TorchScriptDecoder:
+    """Calls a traced decoder with the eager module's dec(x, g=g) signature
+
+    The traced graph holds no state, so model replicas share it.
+    """
+
+    def __init__(self, path, device):
+        import torch
+        self.module = torch.jit.load(path, map_location=device).eval()
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def __call__(self, x, g=None):
+        return self.module(x, g)
+
+
+class OnnxDecoder:
+    """Runs an ONNX decoder with ONNX Runtime behind the eager dec(x, g=g) signature
+
+    The session is created lazily in the process that uses it: supervisor
+    workers are forked after loading, and ONNX Runtime thread pools don't
+    survive a fork. Sessions are thread-safe, so replicas share this object.
+    """
+
+    def __init__(self, path):
+        import onnxruntime  # noqa: F401 - fail at load time, not on the first request
+        self.path = path
+        self._session = None
+        self._pid = None
+
+    def __deepcopy__(self, memo):
+        return self
+
+    def _get_session(self):
+        if self._session is None or self._pid != os.getpid():
+            import torch
+            import onnxruntime
+            options = onnxruntime.SessionOptions()
+            # Follow the process's torch thread budget (set per supervisor worker)
+            options.intra_op_num_threads = torch.get_num_threads()
+            self._session = onnxruntime.InferenceSession(self.path, options, providers=['CPUExecutionProvider'])
+            self._pid = os.getpid()
+        return self._session
+
+    def __call__(self, x, g=None):
+        import torch
+        audio = self._get_session().run(['audio'], {
+            'x': x.detach().cpu().numpy().astype(np.float32),
+            'g': g.detach().cpu().numpy().astype(np.float32),
+        })[0]
+        return torch.from_numpy(audio).to(x.device)
+
+
+def load_exported_decoders(base_speaker_tts, tone_color_converter, export_format, export_dir, weights_hash, device='cpu'):
+    """Swap both models' decoders (in place) for their exported versions
+
+    Raises StaleExportError if the exports are missing or were made from
+    other checkpoints (re-run export_models.py after updating checkpoints).
+    """
+    try:
+        with open(os.path.join(export_dir, EXPORT_MANIFEST)) as f:
+            entry = json.load(f).get(export_format)
+    except (OSError, ValueError):
+        entry = None
+    if entry is None:
+        raise StaleExportError(f'No {export_format} export in {export_dir} (run services/export_models.py --export {export_format})')
+    if entry['weights_hash'] != weights_hash:
+        raise StaleExportError(f'{export_format} export in {export_dir} was made from other checkpoints, export again')
+
+    networks = model_networks(base_speaker_tts, tone_color_converter)
+    decoders = {}
+    for name in networks:
+        path = os.path.join(export_dir, entry['files'][name])
+        decoders[name] = TorchScriptDecoder(path, device) if export_format == 'torchscript' else OnnxDecoder(path)
+    for name, network in networks.items():
+        # The wrappers aren't nn.Modules; drop the registered submodule before assigning
+        del network._modules['dec']
+        network.dec = decoders[name]
+
+
+def apply_variant(variant, base_speaker_tts, tone_color_converter, export_dir, weights_hash, device='cpu'):
+    """Turn freshly loaded eager models into the requested variant (in place)"""
+    if variant == 'int8':
+        quantize_models(base_speaker_tts, tone_color_converter)
+    elif variant in EXPORT_FORMATS:
+        load_exported_decoders(base_speaker_tts, tone_color_converter, variant, export_dir, weights_hash, device)
+    elif variant != 'eager':
+        raise ValueError(f'Unknown backend variant: {variant}')
+
+
+def snr_db(reference, candidate):
+    """Signal-to-noise ratio of candidate against reference in dB (None if the lengths differ)"""
+    if len(reference) != len(candidate):
+        return None
+    noise = np.sum((np.asarray(reference, dtype=np.float64) - candidate) ** 2)
+    if noise == 0:
+        return float('inf')
+    return float(10 * np.log10(np.sum(np.asarray(reference, dtype=np.float64) ** 2) / noise))
+
+
+def mel_distance(reference, candidate, sample_rate):
+    """Mean absolute difference of log10 mel spectrograms (over the shorter signal)"""
+    import librosa
+
+    def log_mel(audio):
+        mel = librosa.feature.melspectrogram(
+            y=np.asarray(audio, dtype=np.float32), sr=sample_rate, n_fft=1024, hop_length=256, n_mels=80
+        )
+        return np.log10(np.maximum(mel, 1e-5))
+
+    reference, candidate = log_mel(reference), log_mel(candidate)
+    frames = min(reference.shape[1], candidate.shape[1])
+    return float(np.mean(np.abs(reference[:, :frames] - candidate[:, :frames])))
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Request coalescing for the Sprout OpenVoice service
+Concurrent renders of the same utterance key share one computation instead of
+each queueing for the models
+"""
+
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+from inference_pool import InferenceTimeoutError, PoolBusyError
+
+
+class SingleFlight:
+    """At most one in-flight call per key; callers arriving meanwhile wait for its result
+
+    The first caller (the leader) runs fn(); followers get the same result
+    or exception, except PoolBusyError, after which they retry. The key is released as soon as the call finishes, so fn
+    should store its result (e.g. in the utterance cache) before returning.
+    """
+
+    def __init__(self):
+        self._calls = {}  # key -> Future of the leader's call
+        self._lock = threading.Lock()
+        self._counters = {'leaders': 0, 'coalesced': 0, 'shared_failures': 0, 'busy_retries': 0}
+
+    def run(self, key, fn, timeout=None):
+        """Return (result, leader): leader is False when the result came from another caller's call
+
+        A leader turned away by a full inference queue doesn't speak for its
+        followers: they try again, the first of them as the new leader.
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            with self._lock:
+                call = self._calls.get(key)
+                if call is None:
+                    call = self._calls[key] = Future()
+                    self._counters['leaders'] += 1
+                    leader = True
+                else:
+                    self._counters['coalesced'] += 1
+                    leader = False
+
+            if leader:
+                break
+            try:
+                remaining = None if deadline is None else max(0, deadline - time.monotonic())
+                return call.result(timeout=remaining), False
+            except FutureTimeoutError:
+                raise InferenceTimeoutError(f'Synthesis did not finish within {timeout}s')
+            except PoolBusyError:
+                with self._lock:
+                    self._counters['busy_retries'] += 1
+            except Exception:
+                with self._lock:
+                    self._counters['shared_failures'] += 1
+                raise
+
+        try:
+            result = fn()
+        except BaseException as e:
+            call.set_exception(e)
+            raise
+        else:
+            call.set_result(result)
+            return result, True
+        finally:
+            with self._lock:
+                del self._calls[key]
+
+    def stats(self):
+        """Coalescing counters and the number of calls in flight"""
+        with self._lock:
+            calls = self._counters['leaders'] + self._counters['coalesced']
+            return {
+                'in_flight': len(self._calls),
+                'coalesce_rate': round(self._counters['coalesced'] / calls, 3) if calls else None,
+                **self._counters,
+            }
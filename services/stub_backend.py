@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+"""
+Stub model backend for the Sprout OpenVoice service
+Checkpoint-free stand-in with the OpenVoiceBackend interface, used to benchmark
+and load-test everything around the models (queueing, batching, caching,
+encoding, HTTP) without downloading checkpoints
+"""
+
+import time
+import hashlib
+
+import numpy as np
+
+from text_frontend import TextFrontend
+
+STUB_SAMPLING_RATE = 22050
+SECONDS_PER_CHAR = 0.065  # Roughly the pace of the base speaker at speed 1.0
+EMBEDDING_SIZE = 256
+
+
+def stub_embedding(data):
+    """Deterministic pseudo speaker embedding derived from some bytes"""
+    seed = int.from_bytes(hashlib.sha256(data).digest()[:4], 'little')
+    return np.random.default_rng(seed).standard_normal((1, EMBEDDING_SIZE, 1)).astype(np.float32)
+
+
+def stub_get_se(audio_path, tone_color_converter, target_dir=None, vad=True):
+    """Stand-in for se_extractor.get_se (hashes the file instead of running VAD and the encoder)"""
+    with open(audio_path, 'rb') as f:
+        return stub_embedding(f.read()), None
+
+
+class StubModel:
+    """Placeholder for BaseSpeakerTTS / ToneColorConverter"""
+
+    def __init__(self, sampling_rate):
+        self.sampling_rate = sampling_rate
+
+
+class StubBackend:
+    """Synthetic backend: tones whose length follows the text, with simulated compute time
+
+    Every model pass sleeps for rtf seconds per second of audio it produces
+    (a padded batch costs as much as its longest row). Sleeping releases the
+    GIL like the PyTorch kernels do, so worker and batching behaviour stays
+    representative; absolute latencies say nothing about the real models.
+    """
+
+    name = 'stub'
+    needs_temp_files = False
+
+    def __init__(self, rtf=0.05, sampling_rate=STUB_SAMPLING_RATE, frontend=None):
+        self.rtf = rtf
+        self.base_speaker_tts = StubModel(sampling_rate)
+        self.tone_color_converter = StubModel(sampling_rate)
+        self.device = 'cpu'
+        self.melo_tts = None
+        self.frontend = frontend or TextFrontend()
+
+    def replicate(self):
+        return self.__class__(self.rtf, self.sampling_rate, self.frontend)
+
+    @property
+    def sampling_rate(self):
+        return self.tone_color_converter.sampling_rate
+
+    @property
+    def base_sampling_rate(self):
+        return self.base_speaker_tts.sampling_rate
+
+    def _compute(self, seconds_of_audio):
+        time.sleep(self.rtf * seconds_of_audio)
+
+    def tts(self, text, speaker='default', speed=1.0):
+        return self.tts_batch([text], [speaker], speed=speed)[0]
+
+    def tts_batch(self, texts, speakers, speed=1.0):
+        # Front-end chunks stand in for token ids: their length sets the duration
+        lengths = [sum(self.frontend.tokens(segment, len) for segment in self.frontend.segments(text)) for text in texts]
+        durations = [max(0.2, length * SECONDS_PER_CHAR / speed) for length in lengths]
+        self._compute(max(durations, default=0))
+        outputs = []
+        for duration, speaker in zip(durations, speakers):
+            pitch = 110 + int(hashlib.md5(speaker.encode('utf-8')).hexdigest()[:2], 16)
+            t = np.arange(int(duration * self.sampling_rate), dtype=np.float32) / self.sampling_rate
+            outputs.append((0.3 * np.sin(2 * np.pi * pitch * t)).astype(np.float32))
+        return outputs
+
+    def convert(self, audio, src_se, tgt_se, tau=0.3, message=None):
+        return self.convert_batch([audio], [src_se], [tgt_se], tau=tau, message=message)[0]
+
+    def convert_batch(self, audios, src_ses, tgt_ses, tau=0.3, message=None):
+        self._compute(max((len(audio) / self.sampling_rate for audio in audios), default=0))
+        outputs = [np.asarray(audio, dtype=np.float32) * 0.9 for audio in audios]
+        if message:
+            outputs = [self.watermark(audio, message) for audio in outputs]
+        return outputs
+
+    def watermark(self, audio, message):
+        self._compute(len(audio) / self.sampling_rate)
+        return np.array(audio, dtype=np.float32)
+
+    def extract_se(self, audio, get_se):
+        return stub_embedding(np.asarray(audio, dtype=np.float32).tobytes())
+
+    def source_embeddings(self, styles):
+        """Per-style source embeddings (the real ones come from the checkpoints)"""
+        return {style: stub_embedding(style.encode('utf-8')) for style in styles}
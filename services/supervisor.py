@@ -0,0 +1,399 @@
+#!/usr/bin/env python3
+"""
+Multi-process supervisor for the Sprout OpenVoice service
+Loads the models once, forks one worker process per core set (sharing the
+weights copy-on-write), and routes each request to the least-loaded worker
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import signal
+import threading
+import http.client
+
+from flask import Flask, Response, request, jsonify
+from flask_cors import CORS
+
+# Hop-by-hop headers are per connection and must not be forwarded
+HOP_BY_HOP_HEADERS = {
+    'connection', 'keep-alive', 'proxy-authenticate', 'proxy-authorization',
+    'te', 'trailers', 'transfer-encoding', 'upgrade', 'host',
+}
+
+
+def available_cores():
+    """CPU ids this process may run on"""
+    if hasattr(os, 'sched_getaffinity'):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def partition_cores(cores, processes):
+    """Split cores into `processes` contiguous, near-equal groups (cores are shared if there are too few)"""
+    if len(cores) < processes:
+        return [[cores[index % len(cores)]] for index in range(processes)]
+    size, extra = divmod(len(cores), processes)
+    groups, start = [], 0
+    for index in range(processes):
+        end = start + size + (1 if index < extra else 0)
+        groups.append(cores[start:end])
+        start = end
+    return groups
+
+
+def limit_threads(cores, threads):
+    """Pin the current process to cores (Linux only) and size torch's thread pool"""
+    if hasattr(os, 'sched_setaffinity'):
+        os.sched_setaffinity(0, cores)
+    try:
+        import torch
+    except ImportError:
+        return
+    torch.set_num_threads(threads)
+
+
+class Worker:
+    """One forked model-replica process and its dispatch counters"""
+
+    def __init__(self, index, pid, port, cores, threads):
+        self.index = index
+        self.pid = pid
+        self.port = port
+        self.cores = cores
+        self.threads = threads
+        self.alive = True
+        self.inflight = 0
+        self.served = 0
+        self.failed = 0
+        self._connections = []  # Idle keep-alive connections
+        self._lock = threading.Lock()
+
+    def connection(self, timeout):
+        """Return (connection, reused) - an idle keep-alive connection if there is one"""
+        with self._lock:
+            if self._connections:
+                return self._connections.pop(), True
+        return http.client.HTTPConnection('127.0.0.1', self.port, timeout=timeout), False
+
+    def release_connection(self, connection):
+        with self._lock:
+            self._connections.append(connection)
+
+    def stats(self):
+        return {
+            'index': self.index,
+            'pid': self.pid,
+            'port': self.port,
+            'cores': self.cores,
+            'threads': self.threads,
+            'alive': self.alive,
+            'inflight': self.inflight,
+            'served': self.served,
+            'failed': self.failed,
+        }
+
+
+class Supervisor:
+    """Forks worker processes and dispatches requests to them over loopback HTTP
+
+    The parent never runs inference: it loads the weights, forks before
+    starting any thread, then only proxies. Each worker creates its own
+    inference pool (threads don't survive fork), pins itself to its cores
+    and serves the same Flask app on a private port.
+    """
+
+    def __init__(self, app, start_inference, processes, threads_per_process=None, timeout=60.0):
+        self.app = app
+        self.start_inference = start_inference
+        self.processes = processes
+        self.threads_per_process = threads_per_process
+        self.timeout = timeout
+        self.workers = []
+        self._lock = threading.Lock()
+        self._next = 0
+
+    def start(self):
+        """Fork every worker and wait until each one is warmed up and listening"""
+        parent_pid = os.getpid()
+        pending = []
+        for index, cores in enumerate(partition_cores(available_cores(), self.processes)):
+            threads = self.threads_per_process or len(cores)
+            read_fd, write_fd = os.pipe()
+            pid = os.fork()
+            if pid == 0:
+                os.close(read_fd)
+                self._run_worker(index, cores, threads, write_fd, parent_pid)
+                os._exit(0)
+            os.close(write_fd)
+            pending.append((index, pid, cores, threads, read_fd))
+
+        for index, pid, cores, threads, read_fd in pending:
+            with os.fdopen(read_fd) as pipe:
+                port = pipe.read().strip()
+            if not port:
+                print(f"❌ Worker {index} (pid {pid}) exited before it was ready")
+                continue
+            self.workers.append(Worker(index, pid, int(port), cores, threads))
+            print(f"   Worker {index}: pid {pid}, port {port}, cores {cores}, {threads} thread(s)")
+
+        atexit.register(self.stop)
+        threading.Thread(target=self._reap, name='openvoice-reaper', daemon=True).start()
+        return bool(self.workers)
+
+    def _run_worker(self, index, cores, threads, write_fd, parent_pid):
+        """Worker process body: pin, start inference, report the port, serve forever"""
+        from werkzeug.serving import make_server
+
+        # Ctrl-C goes to the whole process group; let the parent shut workers down
+        signal.signal(signal.SIGINT, signal.SIG_IGN)
+        limit_threads(cores, threads)
+        self.start_inference(warm=True)
+
+        server = make_server('127.0.0.1', 0, self.app, threaded=True)
+        with os.fdopen(write_fd, 'w') as pipe:
+            pipe.write(str(server.server_port))
+
+        def exit_with_parent():
+            while os.getppid() == parent_pid:
+                time.sleep(1)
+            os._exit(0)
+
+        threading.Thread(target=exit_with_parent, daemon=True).start()
+        server.serve_forever()
+
+    def _reap(self):
+        """Mark workers that exited so they get no more traffic"""
+        while True:
+            for worker in self.workers:
+                if not worker.alive:
+                    continue
+                try:
+                    pid, status = os.waitpid(worker.pid, os.WNOHANG)
+                except ChildProcessError:
+                    pid, status = worker.pid, 0
+                if pid:
+                    worker.alive = False
+                    print(f"❌ Worker {worker.index} (pid {worker.pid}) exited with status {status}")
+            time.sleep(1)
+
+    def stop(self):
+        for worker in self.workers:
+            if worker.alive:
+                try:
+                    os.kill(worker.pid, signal.SIGTERM)
+                except ProcessLookupError:
+                    pass
+
+    def acquire(self, exclude=()):
+        """Reserve the alive worker with the fewest requests in flight (round-robin on ties)"""
+        with self._lock:
+            candidates = [worker for worker in self.workers if worker.alive and worker not in exclude]
+            if not candidates:
+                return None
+            self._next += 1
+            worker = min(
+                candidates,
+                key=lambda w: (w.inflight, (w.index - self._next) % len(self.workers))
+            )
+            worker.inflight += 1
+            return worker
+
+    def release(self, worker, ok=True):
+        with self._lock:
+            worker.inflight -= 1
+            worker.served += 1
+            if not ok:
+                worker.failed += 1
+
+    def send(self, worker, method, path, body, headers):
+        """Send one request to a worker; returns (connection, response), retrying once on a stale keep-alive connection"""
+        for attempt in range(2):
+            connection, reused = worker.connection(self.timeout + 5)
+            try:
+                connection.request(method, path, body=body, headers=headers)
+                return connection, connection.getresponse()
+            except (ConnectionError, http.client.HTTPException, OSError):
+                connection.close()
+                if not reused or attempt:
+                    raise
+
+    def forward(self, method, path, body, headers):
+        """Proxy a request; a worker that is busy (503) or unreachable is skipped for the next least-loaded one"""
+        tried = []
+        while True:
+            worker = self.acquire(exclude=tried)
+            if worker is None:
+                response = jsonify({'error': 'No OpenVoice worker available'})
+                response.headers['Retry-After'] = '1'
+                return response, 503
+            tried.append(worker)
+            try:
+                connection, upstream = self.send(worker, method, path, body, headers)
+            except (ConnectionError, http.client.HTTPException, OSError) as e:
+                print(f"⚠️  Worker {worker.index} unreachable: {e}")
+                self.release(worker, ok=False)
+                continue
+            if upstream.status == 503 and len(tried) < len(self.workers):
+                upstream.read()
+                worker.release_connection(connection)
+                self.release(worker, ok=False)
+                continue
+            return self._relay(worker, connection, upstream)
+
+    def _relay(self, worker, connection, upstream):
+        """Stream a worker's response back to the client"""
+        def generate():
+            ok = False
+            try:
+                while True:
+                    chunk = upstream.read1(65536)
+                    if not chunk:
+                        break
+                    yield chunk
+                ok = True
+            finally:
+                if ok and not upstream.will_close:
+                    worker.release_connection(connection)
+                else:
+                    connection.close()
+                self.release(worker, ok=ok and upstream.status < 500)
+
+        headers = [(name, value) for name, value in upstream.getheaders() if name.lower() not in HOP_BY_HOP_HEADERS]
+        headers.append(('X-Sprout-Worker', str(worker.index)))
+        return Response(generate(), status=upstream.status, headers=headers, direct_passthrough=True)
+
+    def fetch(self, worker, path):
+        """GET a small response from a worker (health and metrics scraping)"""
+        connection = http.client.HTTPConnection('127.0.0.1', worker.port, timeout=5)
+        try:
+            connection.request('GET', path)
+            response = connection.getresponse()
+            return response.read().decode('utf-8')
+        finally:
+            connection.close()
+
+
+def label_worker_metrics(text, index, seen_headers):
+    """Add worker="<index>" to every sample; keep each HELP/TYPE line once"""
+    lines = []
+    for line in text.splitlines():
+        if line.startswith('#'):
+            if line not in seen_headers:
+                seen_headers.add(line)
+                lines.append(line)
+            continue
+        if not line:
+            continue
+        name, _, rest = line.partition(' ')
+        if '{' in name:
+            name = name.replace('{', f'{{worker="{index}",', 1)
+        else:
+            name = f'{name}{{worker="{index}"}}'
+        lines.append(f'{name} {rest}')
+    return lines
+
+
+def aggregate_process_stats(stats):
+    """Worker process stats summed for the supervisor's /health
+
+    Pages shared copy-on-write are counted once per worker. The temp dir is
+    shared, so every worker reports the same temp entries: those take the max.
+    """
+    def total(key):
+        values = [entry[key] for entry in stats if entry.get(key) is not None]
+        return sum(values) if values else None
+
+    return {
+        'pid': os.getpid(),
+        'peak_rss_bytes': total('peak_rss_bytes') or 0,
+        'rss_bytes': total('rss_bytes'),
+        'open_fds': total('open_fds'),
+        'threads': total('threads'),
+        'temp_entries': max((entry.get('temp_entries') or 0 for entry in stats), default=None),
+        'temp_bytes': max((entry.get('temp_bytes') or 0 for entry in stats), default=None),
+    }
+
+
+def create_supervisor_app(supervisor):
+    """Front-end app: aggregated /health and /metrics, everything else proxied to a worker"""
+    app = Flask('sprout_supervisor')
+    CORS(app)
+
+    @app.route('/health', methods=['GET'])
+    def health():
+        workers = []
+        for worker in supervisor.workers:
+            entry = worker.stats()
+            if worker.alive:
+                try:
+                    entry['health'] = json.loads(supervisor.fetch(worker, '/health'))
+                except (OSError, ValueError, http.client.HTTPException) as e:
+                    entry['error'] = str(e)
+            workers.append(entry)
+        healthy = [entry['health'] for entry in workers if 'health' in entry]
+        ready = any(entry.get('ready') for entry in healthy)
+        return jsonify({
+            'status': 'ok',
+            'live': True,
+            'ready': ready,
+            'state': 'ready' if ready else (healthy[0]['state'] if healthy else 'failed'),
+            'openvoice_loaded': any(entry.get('openvoice_loaded') for entry in healthy),
+            'backend': healthy[0].get('backend') if healthy else None,
+            'process': aggregate_process_stats([entry.get('process') or {} for entry in healthy]),
+            'supervisor': {'processes': supervisor.processes, 'workers': workers},
+        })
+
+    @app.route('/ready', methods=['GET'])
+    def ready():
+        for worker in supervisor.workers:
+            if worker.alive:
+                try:
+                    if json.loads(supervisor.fetch(worker, '/ready')).get('ready'):
+                        return jsonify({'ready': True})
+                except (OSError, ValueError, http.client.HTTPException):
+                    continue
+        response = jsonify({'ready': False})
+        response.headers['Retry-After'] = '2'
+        return response, 503
+
+    @app.route('/metrics', methods=['GET'])
+    def metrics():
+        lines, seen_headers = [], set()
+        for worker in supervisor.workers:
+            if worker.alive:
+                try:
+                    lines.extend(label_worker_metrics(supervisor.fetch(worker, '/metrics'), worker.index, seen_headers))
+                except (OSError, http.client.HTTPException):
+                    continue
+        return Response('\n'.join(lines) + '\n', mimetype='text/plain; version=0.0.4')
+
+    @app.route('/', defaults={'path': ''}, methods=['GET', 'POST'])
+    @app.route('/<path:path>', methods=['GET', 'POST'])
+    def proxy(path):
+        headers = {name: value for name, value in request.headers.items() if name.lower() not in HOP_BY_HOP_HEADERS}
+        target = request.full_path if request.query_string else request.path
+        return supervisor.forward(request.method, target, request.get_data(), headers)
+
+    return app
+
+
+def run_supervisor(app, load_models, start_inference, serve, processes, threads_per_process=None, timeout=60.0):
+    """Load the models, fork the workers, then serve the routing front end (blocks)
+
+    load_models() must leave the weights in memory without starting any
+    thread, so the forked workers start from a clean, single-threaded copy.
+    """
+    print(f"🔧 Supervisor: loading models once for {processes} worker processes...")
+    if not load_models():
+        print("❌ Models failed to load, not starting workers")
+        sys.exit(1)
+
+    supervisor = Supervisor(app, start_inference, processes, threads_per_process, timeout)
+    if not supervisor.start():
+        print("❌ No worker process started")
+        sys.exit(1)
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    serve(create_supervisor_app(supervisor), processes * 8 + 4)
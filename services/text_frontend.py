@@ -0,0 +1,284 @@
+#!/usr/bin/env python3
+"""
+Text front-end for the Sprout OpenVoice service
+Normalizes LLM replies (numbers, symbols, markdown) into speakable text, splits
+them into length-bounded sentence/clause chunks that can be synthesized in
+order, and memoizes the text-to-token conversion of the models
+"""
+
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+SENTENCE_BREAK = re.compile(r'(?<=[.!?…])\s+|\n+')
+CLAUSE_BREAK = re.compile(r'(?<=[,;:—–])\s+')
+
+# Longest chunk handed to the models in one piece; bounds the padded row length
+MAX_SEGMENT_CHARS = 200
+
+
+def split_sentences(text, max_chars=200):
+    """Split text into sentences, breaking sentences longer than max_chars at clause boundaries
+
+    A clause that is still longer than max_chars is broken between words,
+    and a single word longer than max_chars (a hash, a run of letters) into
+    max_chars slices.
+    """
+    chunks = []
+    for sentence in SENTENCE_BREAK.split(text.strip()):
+        sentence = sentence.strip()
+        if not sentence:
+            continue
+        if len(sentence) <= max_chars:
+            chunks.append(sentence)
+            continue
+
+        # Pack clauses (or words of overlong clauses) back together up to max_chars
+        current = ''
+        for clause in CLAUSE_BREAK.split(sentence):
+            pieces = [clause]
+            if len(clause) > max_chars:
+                pieces = [word[start:start + max_chars] for word in clause.split()
+                          for start in range(0, len(word), max_chars)]
+            for piece in pieces:
+                if current and len(current) + 1 + len(piece) > max_chars:
+                    chunks.append(current)
+                    current = piece
+                else:
+                    current = f'{current} {piece}'.strip()
+        if current:
+            chunks.append(current)
+    return chunks
+
+
+# Normalization
+
+ONES = [
+    'zero', 'one', 'two', 'three', 'four', 'five', 'six', 'seven', 'eight', 'nine', 'ten', 'eleven', 'twelve',
+    'thirteen', 'fourteen', 'fifteen', 'sixteen', 'seventeen', 'eighteen', 'nineteen',
+]
+TENS = ['', '', 'twenty', 'thirty', 'forty', 'fifty', 'sixty', 'seventy', 'eighty', 'ninety']
+SCALES = [(10 ** 9, 'billion'), (10 ** 6, 'million'), (1000, 'thousand'), (100, 'hundred')]
+MONTHS = ('January', 'February', 'March', 'April', 'May', 'June', 'July', 'August', 'September', 'October',
+          'November', 'December')
+IRREGULAR_ORDINALS = {'one': 'first', 'two': 'second', 'three': 'third', 'five': 'fifth', 'eight': 'eighth',
+                      'nine': 'ninth', 'twelve': 'twelfth'}
+CURRENCIES = {'$': ('dollar', 'cent'), '€': ('euro', 'cent'), '£': ('pound', 'penny')}
+ABBREVIATIONS = {
+    'e.g.': 'for example', 'i.e.': 'that is', 'etc.': 'et cetera', 'vs.': 'versus', 'approx.': 'about',
+    'and/or': 'and or', 'Dr.': 'Doctor', 'Mr.': 'Mister', 'Mrs.': 'Missus', 'Ms.': 'Miz', 'St.': 'Saint',
+}
+SYMBOLS = {'&': ' and ', '+': ' plus ', '=': ' equals ', '@': ' at ', '°': ' degrees ', '~': ' about ', '/': ' '}
+
+MARKDOWN_LINK = re.compile(r'\[([^\]]+)\]\([^)]*\)')
+URL = re.compile(r'\b(?:https?://|www\.)([^\s/?#<>()]+)[^\s<>()]*?(?=[.,;:!?)]*(?:\s|$))', re.IGNORECASE)
+# Phone numbers and other digit groups: 555-1234, (415) 555-1234, +1 415.555.1234
+PHONE_NUMBER = re.compile(r'(?<![\w+-])(\+)?((?:\d{1,3}[ .-])?(?:\(\d{3}\) ?|\d{3}[.-])?\d{3}[.-]\d{4})\b')
+DOTTED_NUMBER = re.compile(r'(?<![\w.])\d+(?:\.\d+){2,}\b')  # Versions, IP addresses: 3.2.1
+DECADE = re.compile(r"(?<![\w.])(\d{3}0)'?s\b")
+MARKDOWN_MARKUP = re.compile(r'(\*\*|__|[*_`]|^#+\s*|^\s*(?:[-*•]|\d+\.)\s+)', re.MULTILINE)
+ABBREVIATION = re.compile('|'.join(re.escape(abbreviation) for abbreviation in ABBREVIATIONS) + r'(?=\s|$)')
+CURRENCY = re.compile(r'([$€£])(\d[\d,]*)(?:\.(\d{2}))?\b')
+PERCENT = re.compile(r'(\d[\d,]*(?:\.\d+)?)\s?%')
+CLOCK_TIME = re.compile(r'\b(\d{1,2}):(\d{2})\b')
+ORDINAL = re.compile(r'\b(\d[\d,]*)(st|nd|rd|th)\b', re.IGNORECASE)
+WORD_ALTERNATIVE = re.compile(r'(?<=[^\W\d])/(?=[^\W\d])')
+NUMBER = re.compile(r'(?<![\w.])(-)?(\d[\d,]*)(?:\.(\d+))?\b')
+# What makes a bare four-digit number a year: "in 1999", "May 4, 2021", "1990 to 1995"
+YEAR_CONTEXT = re.compile(
+    r'(?:\b(?:in|since|by|from|until|till|year|circa|before|after|during|early|late|mid)'
+    r'|\b(?:' + '|'.join(MONTHS) + r')\.?(?: (?:\d{1,2}|[a-z-]+(?:st|nd|rd|th)),?)?'
+    r'|\b1[1-9]\d\d ?(?:-|–|to|and|or)|\b20\d\d ?(?:-|–|to|and|or))[ -]?$',
+    re.IGNORECASE
+)
+SYMBOL = re.compile('|'.join(re.escape(symbol) for symbol in SYMBOLS))
+WHITESPACE = re.compile(r'[ \t]+')
+SPACE_BEFORE_PUNCTUATION = re.compile(r' +(?=[.,!?;:])')
+
+
+def number_to_words(n):
+    """English words for a non-negative integer (digit by digit from a trillion up)"""
+    if n >= 10 ** 12:
+        return ' '.join(ONES[int(digit)] for digit in str(n))
+    if n < 20:
+        return ONES[n]
+    if n < 100:
+        return TENS[n // 10] + (f'-{ONES[n % 10]}' if n % 10 else '')
+    for value, name in SCALES:
+        if n >= value:
+            head, rest = divmod(n, value)
+            words = f'{number_to_words(head)} {name}'
+            return f'{words} {number_to_words(rest)}' if rest else words
+
+
+def year_to_words(n):
+    """1999 -> nineteen ninety-nine, 2024 -> twenty twenty-four, 1500 -> fifteen hundred"""
+    head, rest = divmod(n, 100)
+    if rest == 0:
+        return f'{number_to_words(head)} hundred'
+    return f"{number_to_words(head)} {'oh ' if rest < 10 else ''}{number_to_words(rest)}"
+
+
+def ordinal_to_words(n):
+    words = number_to_words(n)
+    head, _, last = words.rpartition(' ')
+    head, hyphen, last = last.rpartition('-') if '-' in last else (head, '', last)
+    if last in IRREGULAR_ORDINALS:
+        last = IRREGULAR_ORDINALS[last]
+    elif last.endswith('y'):
+        last = f'{last[:-1]}ieth'
+    else:
+        last = f'{last}th'
+    prefix = f'{head}{hyphen}' if hyphen else (f'{head} ' if head else '')
+    return f'{prefix}{last}'
+
+
+def _integer(digits):
+    return int(digits.replace(',', ''))
+
+
+def _is_year(value):
+    return 1100 <= value <= 1999 or 2010 <= value <= 2099
+
+
+def _spell_number(match):
+    sign, digits, fraction = match.groups()
+    value = _integer(digits)
+    context = match.string[max(0, match.start() - 24):match.start()]
+    if fraction is None and sign is None and len(digits) == 4 and _is_year(value) and YEAR_CONTEXT.search(context):
+        words = year_to_words(value)
+    else:
+        words = number_to_words(value)
+    if fraction is not None:
+        words += ' point ' + ' '.join(ONES[int(digit)] for digit in fraction)
+    return f'minus {words}' if sign else words
+
+
+def _spell_digits(match):
+    """Digit by digit, one group at a time: 555-1234 -> five five five, one two three four"""
+    groups = [' '.join(ONES[int(digit)] for digit in group) for group in re.findall(r'\d+', match.group(2))]
+    return ('plus ' if match.group(1) else '') + ', '.join(groups)
+
+
+def _spell_dotted(match):
+    return ' point '.join(number_to_words(int(part)) for part in match.group(0).split('.'))
+
+
+def _spell_decade(match):
+    value = int(match.group(1))
+    words = year_to_words(value) if _is_year(value) else number_to_words(value)
+    return f'{words[:-1]}ies' if words.endswith('y') else f'{words}s'
+
+
+def _spell_url(match):
+    """Just the host, as people read links out: www.example.com/a -> example dot com"""
+    host = match.group(1).lower()
+    host = host[4:] if host.startswith('www.') else host
+    return host.split(':')[0].replace('.', ' dot ')
+
+
+def _spell_currency(match):
+    symbol, digits, cents = match.groups()
+    unit, subunit = CURRENCIES[symbol]
+    value = _integer(digits)
+    words = f"{number_to_words(value)} {unit}{'' if value == 1 else 's'}"
+    if cents and int(cents):
+        plural = ('pence' if subunit == 'penny' else 'cents') if int(cents) != 1 else subunit
+        words += f' and {number_to_words(int(cents))} {plural}'
+    return words
+
+
+def _spell_time(match):
+    hours, minutes = int(match.group(1)), int(match.group(2))
+    if hours > 24 or minutes > 59:
+        return match.group(0)
+    if minutes == 0:
+        return f"{number_to_words(hours)} o'clock"
+    return f"{number_to_words(hours)} {'oh ' if minutes < 10 else ''}{number_to_words(minutes)}"
+
+
+def normalize_text(text):
+    """Speakable text: markdown and emoji removed, abbreviations, numbers and symbols spelled out"""
+    text = MARKDOWN_LINK.sub(r'\1', text)
+    text = URL.sub(_spell_url, text)
+    text = MARKDOWN_MARKUP.sub('', text)
+    # Emoji and pictographs (the app's LLM replies use them) are not speakable
+    text = ''.join(
+        char for char in text if char in SYMBOLS or unicodedata.category(char) not in ('So', 'Cs', 'Co')
+    )
+    text = ABBREVIATION.sub(lambda match: ABBREVIATIONS[match.group(0)], text)
+    text = PHONE_NUMBER.sub(_spell_digits, text)
+    text = DOTTED_NUMBER.sub(_spell_dotted, text)
+    text = CURRENCY.sub(_spell_currency, text)
+    text = PERCENT.sub(lambda match: f'{match.group(1)} percent', text)
+    text = CLOCK_TIME.sub(_spell_time, text)
+    text = ORDINAL.sub(lambda match: ordinal_to_words(_integer(match.group(1))), text)
+    text = DECADE.sub(_spell_decade, text)
+    text = WORD_ALTERNATIVE.sub(' or ', text)
+    text = NUMBER.sub(_spell_number, text)
+    text = SYMBOL.sub(lambda match: SYMBOLS[match.group(0)], text)
+    text = SPACE_BEFORE_PUNCTUATION.sub('', WHITESPACE.sub(' ', text))
+    return '\n'.join(line.strip() for line in text.splitlines() if line.strip())
+
+
+class NormalizedText(str):
+    """Text normalize_text() already produced; TextFrontend passes it through without normalizing it again"""
+
+    __slots__ = ()
+
+
+class TextFrontend:
+    """Normalization, segmentation and a bounded LRU of model tokens per segment
+
+    One instance is shared by every model replica: token conversion
+    (phonemization) is pure, so a segment is converted once however many
+    requests, styles or workers use it.
+    """
+
+    def __init__(self, max_chars=MAX_SEGMENT_CHARS, cache_size=4096):
+        self.max_chars = max_chars
+        self.cache_size = cache_size
+        self._tokens = OrderedDict()  # segment key -> tokens, least recently used first
+        self._lock = threading.Lock()
+        self._counters = {'hits': 0, 'misses': 0}
+
+    def normalize(self, text):
+        """Speakable text (see normalize_text), marked as normalized"""
+        if isinstance(text, NormalizedText):
+            return text
+        return NormalizedText(normalize_text(text))
+
+    def segments(self, text):
+        """Normalized chunks of at most max_chars, split at sentence and clause boundaries
+
+        A chunk from an earlier call can be passed back in (e.g. rendered on
+        its own): it is only split, which leaves it as it is.
+        """
+        return [NormalizedText(chunk) for chunk in split_sentences(self.normalize(text), self.max_chars)]
+
+    def tokens(self, key, convert):
+        """convert(key), memoized; the cached value must not be modified by the caller"""
+        with self._lock:
+            tokens = self._tokens.get(key)
+            if tokens is not None:
+                self._tokens.move_to_end(key)
+                self._counters['hits'] += 1
+                return tokens
+            self._counters['misses'] += 1
+
+        tokens = convert(key)
+        if self.cache_size > 0:
+            with self._lock:
+                self._tokens[key] = tokens
+                while len(self._tokens) > self.cache_size:
+                    self._tokens.popitem(last=False)
+        return tokens
+
+    def stats(self):
+        with self._lock:
+            lookups = self._counters['hits'] + self._counters['misses']
+            return {
+                'max_chars': self.max_chars, 'cached': len(self._tokens), 'capacity': self.cache_size,
+                'hit_rate': round(self._counters['hits'] / lookups, 3) if lookups else None, **self._counters,
+            }
@@ -0,0 +1,296 @@
+#!/usr/bin/env python3
+"""
+Cloned voice registry for the Sprout OpenVoice service
+Uploaded reference audio is normalized once and its speaker embedding
+extracted in the background; requests then name a voice id and get the
+embedding from a bounded in-memory LRU
+"""
+
+import io
+import os
+import re
+import wave
+import hashlib
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from audio_encoding import encode_wav
+from openvoice_backend import resample
+
+MIN_REFERENCE_SECONDS = 1.0
+TARGET_PEAK = 0.9  # About -1 dBFS
+TRIM_THRESHOLD = 0.01  # Leading/trailing samples quieter than this (relative to the peak) are cut
+VOICE_ID = re.compile(r'[0-9a-f]{16}')
+
+
+class VoiceNotFoundError(KeyError):
+    """No voice with this id was ever registered"""
+
+
+class VoiceNotReadyError(Exception):
+    """The voice is still being prepared (or preparing it failed)"""
+
+    def __init__(self, voice_id, state, error=None):
+        message = f"Voice {voice_id} is {state}" + (f": {error}" if error else '')
+        super().__init__(message)
+        self.voice_id = voice_id
+        self.state = state
+        self.error = error
+
+
+def decode_audio(data, sample_rate):
+    """Mono float32 waveform at sample_rate
+
+    PCM WAV (what the Sprout app records) is decoded in-process; other
+    containers go through librosa.
+    """
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            frames = wav.readframes(wav.getnframes())
+    except (wave.Error, EOFError):
+        import librosa
+        audio, _ = librosa.load(io.BytesIO(data), sr=sample_rate, mono=True)
+        return audio.astype(np.float32)
+
+    if width == 1:
+        audio = (np.frombuffer(frames, dtype=np.uint8).astype(np.float32) - 128) / 128
+    elif width == 3:
+        raw = np.frombuffer(frames, dtype=np.uint8).reshape(-1, 3)
+        audio = (raw[:, 0].astype(np.int32) | raw[:, 1].astype(np.int32) << 8 | raw[:, 2].astype(np.int8).astype(np.int32) << 16)
+        audio = audio.astype(np.float32) / (1 << 23)
+    else:
+        dtype = {2: np.int16, 4: np.int32}[width]
+        audio = np.frombuffer(frames, dtype=dtype).astype(np.float32) / np.iinfo(dtype).max
+    audio = audio.reshape(-1, channels).mean(axis=1)
+    return resample(audio, rate, sample_rate)
+
+
+def normalize_reference(audio, sample_rate):
+    """Trim leading/trailing silence and peak-normalize; raises ValueError if too little speech is left"""
+    peak = float(np.max(np.abs(audio))) if len(audio) else 0.0
+    if peak == 0.0:
+        raise ValueError('Reference audio is silent')
+    voiced = np.flatnonzero(np.abs(audio) > peak * TRIM_THRESHOLD)
+    audio = audio[voiced[0]:voiced[-1] + 1]
+    if len(audio) < MIN_REFERENCE_SECONDS * sample_rate:
+        raise ValueError(f'Reference audio needs at least {MIN_REFERENCE_SECONDS:g}s of speech')
+    return (audio * (TARGET_PEAK / peak)).astype(np.float32)
+
+
+class VoiceRegistry:
+    """Registered voices keyed by the content hash of their upload
+
+    Each voice keeps its normalized audio on disk (voices_dir/<id>.wav) and,
+    with persist=True, its embedding next to it (<id>.pth), so a voice
+    evicted from the in-memory LRU - or registered before a restart - is
+    reloaded rather than re-extracted. An <id>.ready marker is written last:
+    audio without it is from a preparation that never finished and is
+    reported as pending until it is prepared again (resume() or a new
+    upload). Registering the same upload twice returns the same id without
+    redoing any work.
+    """
+
+    def __init__(self, voices_dir, capacity=32, persist=True):
+        self.voices_dir = voices_dir
+        self.capacity = capacity
+        self.persist = persist
+        self._embeddings = OrderedDict()  # voice id -> embedding, least recently used first
+        self._pending = {}  # voice id -> Future of the preparation job
+        self._failed = {}  # voice id -> error message
+        self._lock = threading.Lock()
+        self._load_locks = {}  # voice id -> [lock, callers holding or waiting for it]
+        self._counters = {'hits': 0, 'loads': 0, 'extractions': 0, 'evictions': 0}
+        # One job at a time; extraction shares the model with the inference workers
+        self._jobs = ThreadPoolExecutor(max_workers=1, thread_name_prefix='voice-registry')
+
+    def _audio_path(self, voice_id):
+        return os.path.join(self.voices_dir, f'{voice_id}.wav')
+
+    def _embedding_path(self, voice_id):
+        return os.path.join(self.voices_dir, f'{voice_id}.pth')
+
+    def _ready_path(self, voice_id):
+        return os.path.join(self.voices_dir, f'{voice_id}.ready')
+
+    def _prepared(self, voice_id):
+        """Whether a preparation of the voice finished (an embedding without a marker predates the markers)"""
+        return os.path.exists(self._ready_path(voice_id)) or (
+            self.persist and os.path.exists(self._embedding_path(voice_id))
+        )
+
+    def add(self, data, sample_rate, extract):
+        """Register uploaded audio bytes and prepare the voice in the background; returns its id
+
+        extract(audio) -> embedding runs on the job thread once the audio is normalized.
+        """
+        voice_id = hashlib.sha256(data).hexdigest()[:16]
+        with self._lock:
+            if voice_id in self._embeddings or voice_id in self._pending:
+                return voice_id
+            if voice_id not in self._failed and self._prepared(voice_id):
+                return voice_id
+            self._failed.pop(voice_id, None)
+            self._pending[voice_id] = self._jobs.submit(self._prepare, voice_id, data, sample_rate, extract)
+        return voice_id
+
+    def _prepare(self, voice_id, data, sample_rate, extract):
+        try:
+            audio = normalize_reference(decode_audio(data, sample_rate), sample_rate)
+            os.makedirs(self.voices_dir, exist_ok=True)
+            path = self._audio_path(voice_id)
+            with open(f'{path}.tmp', 'wb') as f:
+                f.write(encode_wav(audio, sample_rate))
+            os.replace(f'{path}.tmp', path)
+            self._extract(voice_id, audio, extract)
+            with open(self._ready_path(voice_id), 'wb'):
+                pass
+            print(f"✅ Voice {voice_id} ready ({len(audio) / sample_rate:.1f}s of reference audio)")
+        except Exception as e:
+            print(f"❌ Preparing voice {voice_id} failed: {e}")
+            with self._lock:
+                self._failed[voice_id] = str(e)
+        finally:
+            with self._lock:
+                self._pending.pop(voice_id, None)
+
+    def resume(self, extract):
+        """Prepare again every voice whose audio was stored but whose preparation never finished
+
+        Called once the models are loaded; returns the ids queued.
+        """
+        try:
+            names = os.listdir(self.voices_dir)
+        except OSError:
+            return []
+        resumed = []
+        for name in sorted(names):
+            voice_id, extension = os.path.splitext(name)
+            if extension != '.wav' or not VOICE_ID.fullmatch(voice_id) or self._prepared(voice_id):
+                continue
+            try:
+                with open(self._audio_path(voice_id), 'rb') as f:
+                    data = f.read()
+                with wave.open(io.BytesIO(data)) as wav:
+                    sample_rate = wav.getframerate()
+            except (OSError, wave.Error, EOFError) as e:
+                with self._lock:
+                    self._failed[voice_id] = f'Stored audio is unreadable: {e}'
+                continue
+            with self._lock:
+                if voice_id in self._embeddings or voice_id in self._pending:
+                    continue
+                self._failed.pop(voice_id, None)
+                self._pending[voice_id] = self._jobs.submit(self._prepare, voice_id, data, sample_rate, extract)
+            resumed.append(voice_id)
+        if resumed:
+            print(f"🔁 Resuming preparation of {len(resumed)} voice(s)")
+        return resumed
+
+    def _extract(self, voice_id, audio, extract):
+        se = extract(audio)
+        with self._lock:
+            self._counters['extractions'] += 1
+        if self.persist:
+            self._persist(voice_id, se)
+        self._remember(voice_id, se)
+        return se
+
+    def _persist(self, voice_id, se):
+        import torch
+        try:
+            path = self._embedding_path(voice_id)
+            torch.save(se.detach().cpu(), f'{path}.tmp')
+            os.replace(f'{path}.tmp', path)
+        except OSError as e:
+            print(f"⚠️  Could not persist embedding for voice {voice_id}: {e}")
+
+    def _remember(self, voice_id, se):
+        with self._lock:
+            self._embeddings[voice_id] = se
+            self._embeddings.move_to_end(voice_id)
+            while len(self._embeddings) > self.capacity:
+                self._embeddings.popitem(last=False)
+                self._counters['evictions'] += 1
+
+    def state(self, voice_id):
+        """'ready', 'pending', 'failed' or 'unknown'"""
+        if not VOICE_ID.fullmatch(voice_id):
+            return 'unknown'
+        with self._lock:
+            if voice_id in self._embeddings:
+                return 'ready'
+            if voice_id in self._pending:
+                return 'pending'
+            if voice_id in self._failed:
+                return 'failed'
+        if self._prepared(voice_id):
+            return 'ready'
+        # Audio without a marker: preparation was interrupted (resume() queues it again)
+        return 'pending' if os.path.exists(self._audio_path(voice_id)) else 'unknown'
+
+    def describe(self, voice_id):
+        """State of a voice for the API"""
+        state = self.state(voice_id)
+        with self._lock:
+            return {'voice': voice_id, 'state': state, 'loaded': voice_id in self._embeddings,
+                    'error': self._failed.get(voice_id)}
+
+    def check(self, voice_id):
+        """Raise VoiceNotFoundError / VoiceNotReadyError unless the voice can be used"""
+        state = self.state(voice_id)
+        if state == 'unknown':
+            raise VoiceNotFoundError(voice_id)
+        if state != 'ready':
+            with self._lock:
+                error = self._failed.get(voice_id)
+            raise VoiceNotReadyError(voice_id, state, error)
+
+    def get(self, voice_id, extract, device='cpu'):
+        """Embedding of a ready voice: from memory, else from disk (or re-extracted from its normalized audio)"""
+        with self._lock:
+            se = self._embeddings.get(voice_id)
+            if se is not None:
+                self._embeddings.move_to_end(voice_id)
+                self._counters['hits'] += 1
+                return se
+            entry = self._load_locks.setdefault(voice_id, [threading.Lock(), 0])
+            entry[1] += 1
+            load_lock = entry[0]
+
+        try:
+            with load_lock:
+                with self._lock:
+                    se = self._embeddings.get(voice_id)
+                if se is not None:
+                    return se
+                self.check(voice_id)
+
+                embedding_path = self._embedding_path(voice_id)
+                if self.persist and os.path.exists(embedding_path):
+                    import torch
+                    se = torch.load(embedding_path, map_location=device)
+                    with self._lock:
+                        self._counters['loads'] += 1
+                    self._remember(voice_id, se)
+                else:
+                    with open(self._audio_path(voice_id), 'rb') as f:
+                        audio_bytes = f.read()
+                    with wave.open(io.BytesIO(audio_bytes)) as wav:
+                        sample_rate = wav.getframerate()
+                    se = self._extract(voice_id, decode_audio(audio_bytes, sample_rate), extract)
+                return se
+        finally:
+            with self._lock:
+                # Only the last caller drops the lock; earlier ones would let a newcomer load alongside a waiter
+                entry[1] -= 1
+                if entry[1] == 0:
+                    del self._load_locks[voice_id]
+
+    def stats(self):
+        with self._lock:
+            return {'loaded': len(self._embeddings), 'capacity': self.capacity,
+                    'pending': len(self._pending), 'failed': len(self._failed), **self._counters}
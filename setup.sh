@@ -25,6 +25,7 @@ source venv/bin/activate
 echo "📦 Installing Python dependencies..."
 pip install -q --upgrade pip
 pip install -q -r services/requirements.txt
+pip install -q -r openvoice_client/requirements.txt
 
 # Check if OpenVoice is cloned
 if [ ! -d "openvoice" ]; then
@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+"""
+Soak-test the OpenVoice service for memory, descriptor and temp-file leaks
+Replays a conversation-like request mix at a fixed rate for a long time, samples
+RSS, open file descriptors, leftover temp files and latency from /health as it
+goes, and fails when any of them keeps growing faster than the thresholds
+(per 1k requests, after a warm-up that lets the caches fill)
+Usage: python soak_voice.py --duration 2h [--rate 4] [--report soak.md] [--output soak.json]
+       python soak_voice.py --in-process --duration 10m --rate 20
+"""
+
+import sys
+import json
+import time
+import random
+import argparse
+import platform
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from benchmark_voice import (
+    BENCHMARK_TEXTS, VOICE_STYLES, HTTPTarget, InProcessTarget, git_revision, percentile, summarize
+)
+
+# What the Sprout app sends over a conversation: the same short check-ins again
+# and again (cache hits), fresh replies of every length (model work), streamed
+# replies, and some requests the service must reject (error paths)
+GREETINGS = ["Hello Seedling!", "How are you feeling?", "Take a deep breath.", "Great job!", "I'm here for you."]
+CONVERSATION_MIX = (
+    ('greeting', 0.35),
+    ('reply', 0.30),
+    ('long', 0.10),
+    ('stream', 0.15),
+    ('rejected', 0.10),
+)
+UNKNOWN_VOICE = '0000000000000000'
+
+# Thresholds: growth per 1k requests (after warm-up) that fails the soak
+DEFAULT_MAX_RSS_MB = 2.0
+DEFAULT_MAX_FDS = 1.0
+DEFAULT_MAX_TEMP = 1.0
+DEFAULT_MAX_LATENCY_DRIFT = 0.25  # p50 of the last quarter vs the first quarter
+DEFAULT_MAX_ERROR_RATE = 0.01
+
+
+def parse_duration(value):
+    """'90s', '30m', '2h', '1h30m' or plain seconds -> seconds"""
+    total, number = 0.0, ''
+    for char in value.strip().lower():
+        if char.isdigit() or char == '.':
+            number += char
+        elif char in 'smh' and number:
+            total += float(number) * {'s': 1, 'm': 60, 'h': 3600}[char]
+            number = ''
+        else:
+            raise argparse.ArgumentTypeError(f"invalid duration: {value}")
+    return total + float(number or 0)
+
+
+def make_request(kind, index, rng):
+    """(path, payload, expected statuses) for one request of the mix; index keeps fresh texts unique"""
+    style = rng.choice(VOICE_STYLES)
+    if kind == 'greeting':
+        return '/synthesize', {'text': rng.choice(GREETINGS), 'style': style}, (200,)
+    if kind == 'reply':
+        return '/synthesize', {'text': f"{BENCHMARK_TEXTS['medium']} Reply {index}.", 'style': style}, (200,)
+    if kind == 'long':
+        return '/synthesize', {'text': f"{BENCHMARK_TEXTS['paragraph']} Reply {index}.", 'style': style}, (200,)
+    if kind == 'stream':
+        return '/synthesize/stream', {'text': f"{BENCHMARK_TEXTS['long']} Reply {index}.", 'style': style}, (200,)
+    if rng.random() < 0.5:
+        return '/synthesize', {'text': ''}, (400,)
+    return '/synthesize', {'text': "Hello Seedling!", 'voice': UNKNOWN_VOICE}, (404,)
+
+
+class SoakRun:
+    """Open-loop load at a fixed rate plus periodic resource samples"""
+
+    def __init__(self, target, rate, concurrency, interval, seed=0):
+        self.target = target
+        self.rate = rate
+        self.concurrency = concurrency
+        self.interval = interval
+        self.rng = random.Random(seed)
+        self.kinds = [kind for kind, _ in CONVERSATION_MIX]
+        self.weights = [weight for _, weight in CONVERSATION_MIX]
+        self.samples = []
+        self.counts = {'sent': 0, 'done': 0, 'ok': 0, 'rejected': 0, 'busy': 0, 'failed': 0, 'late': 0}
+        self._window = []  # (kind, latency) of successful requests since the last sample
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._started = None
+
+    def _one(self, kind, path, payload, expected):
+        stream = path.endswith('/stream')
+        try:
+            status, _, total, _ = self.target.post(path, payload, stream=stream)
+        except Exception:
+            status, total = None, None
+        with self._lock:
+            self.counts['done'] += 1
+            if status in expected and status == 200:
+                self.counts['ok'] += 1
+                self._window.append((kind, total))
+            elif status in expected:
+                self.counts['rejected'] += 1
+            elif status == 503:
+                self.counts['busy'] += 1  # Load shedding: the rate is above what the service sustains
+            else:
+                self.counts['failed'] += 1
+
+    def sample(self):
+        """Record one row of resource and latency measurements"""
+        health = self.target.health()
+        process = health.get('process') or {}
+        with self._lock:
+            window, self._window = self._window, []
+            counts = dict(self.counts)
+        self.samples.append({
+            'elapsed': round(time.monotonic() - self._started, 1),
+            'requests': counts['done'],
+            'rss_bytes': process.get('rss_bytes'),
+            'peak_rss_bytes': process.get('peak_rss_bytes'),
+            'open_fds': process.get('open_fds'),
+            'threads': process.get('threads'),
+            'temp_entries': process.get('temp_entries'),
+            'temp_bytes': process.get('temp_bytes'),
+            'cache_bytes': (health.get('cache') or {}).get('bytes'),
+            'failed': counts['failed'],
+            'busy': counts['busy'],
+            'window': len(window),
+            **summarize([latency for _, latency in window]),
+            # Fresh medium replies always do the same model work, so their latency shows drift
+            'reply_p50': summarize([latency for kind, latency in window if kind == 'reply'])['p50'],
+        })
+        return self.samples[-1]
+
+    def _sampler(self, on_sample):
+        while not self._stop.wait(self.interval):
+            try:
+                on_sample(self.sample())
+            except Exception as e:
+                print(f"⚠️  Sample failed: {e}")
+
+    def run(self, duration, max_requests=None, on_sample=lambda sample: None):
+        self._started = time.monotonic()
+        self.sample()
+        sampler = threading.Thread(target=self._sampler, args=(on_sample,), daemon=True)
+        sampler.start()
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            index = 0
+            while True:
+                due = self._started + index / self.rate
+                now = time.monotonic()
+                if due - self._started >= duration or (max_requests is not None and index >= max_requests):
+                    break
+                if due > now:
+                    time.sleep(due - now)
+                with self._lock:
+                    # More requests in flight than workers: the service can't keep up with the rate
+                    if self.counts['sent'] - self.counts['done'] >= self.concurrency:
+                        self.counts['late'] += 1
+                    self.counts['sent'] += 1
+                kind = self.rng.choices(self.kinds, self.weights)[0]
+                executor.submit(self._one, kind, *make_request(kind, index, self.rng))
+                index += 1
+        self._stop.set()
+        sampler.join()
+        self.sample()
+        return self.samples
+
+
+def slope_per_1k(points):
+    """Least-squares growth of value per 1000 requests for [(requests, value)]"""
+    points = [(x, y) for x, y in points if y is not None]
+    if len(points) < 3:
+        return None
+    mean_x = sum(x for x, _ in points) / len(points)
+    mean_y = sum(y for _, y in points) / len(points)
+    spread = sum((x - mean_x) ** 2 for x, _ in points)
+    if spread == 0:
+        return None
+    return sum((x - mean_x) * (y - mean_y) for x, y in points) / spread * 1000
+
+
+def floor_growth_per_1k(points):
+    """Growth per 1000 requests of the lowest value in the first vs the last quarter of [(requests, value)]
+
+    RSS swings by tens of MB as the allocator takes and returns large audio
+    buffers; a leak shows as a rising floor under those swings.
+    """
+    points = [(x, y) for x, y in points if y is not None]
+    if len(points) < 4:
+        return None
+    quarter = len(points) // 4
+    first, last = points[:quarter], points[-quarter:]
+    span = last[len(last) // 2][0] - first[len(first) // 2][0]
+    if span <= 0:
+        return None
+    return (min(y for _, y in last) - min(y for _, y in first)) / span * 1000
+
+
+def latency_drift(samples):
+    """Relative change of fresh-reply p50 latency between the first and last quarter of the samples"""
+    def quarter_p50(rows):
+        values = [row['reply_p50'] for row in rows if row['reply_p50'] is not None]
+        return percentile(values, 50) if values else None
+
+    quarter = max(1, len(samples) // 4)
+    first, last = quarter_p50(samples[:quarter]), quarter_p50(samples[-quarter:])
+    if not first or last is None or len(samples) < 4:
+        return None, first, last
+    return last / first - 1, first, last
+
+
+def analyze(samples, counts, warmup, thresholds):
+    """Growth per 1k requests after warm-up for every tracked resource, with a pass/fail verdict each"""
+    steady = [sample for sample in samples if sample['requests'] >= warmup]
+    checks = []
+    for key, label, scale, unit, growth_per_1k in (
+        ('rss_bytes', 'RSS floor', 1024 * 1024, 'MB', floor_growth_per_1k),
+        ('open_fds', 'Open file descriptors', 1, 'fds', slope_per_1k),
+        ('temp_entries', 'Temp files and dirs', 1, 'entries', slope_per_1k),
+    ):
+        growth = growth_per_1k([(sample['requests'], sample[key]) for sample in steady])
+        values = [sample[key] for sample in steady if sample[key] is not None]
+        limit = thresholds[key]
+        checks.append({
+            'metric': label,
+            'unit': f'{unit} per 1k requests',
+            'start': round(values[0] / scale, 2) if values else None,
+            'end': round(values[-1] / scale, 2) if values else None,
+            'growth': round(growth / scale, 3) if growth is not None else None,
+            'threshold': limit,
+            'passed': None if growth is None else growth / scale <= limit,
+        })
+
+    drift, first, last = latency_drift(steady)
+    checks.append({
+        'metric': 'Reply p50 drift', 'unit': 'relative', 'start': first, 'end': last,
+        'growth': round(drift, 3) if drift is not None else None,
+        'threshold': thresholds['latency_drift'], 'passed': None if drift is None else drift <= thresholds['latency_drift'],
+    })
+
+    error_rate = counts['failed'] / counts['done'] if counts['done'] else None
+    checks.append({
+        'metric': 'Unexpected responses', 'unit': 'fraction of requests', 'start': None, 'end': counts['failed'],
+        'growth': round(error_rate, 4) if error_rate is not None else None,
+        'threshold': thresholds['error_rate'], 'passed': None if error_rate is None else error_rate <= thresholds['error_rate'],
+    })
+    return checks
+
+
+def format_value(value):
+    return '-' if value is None else f'{value:g}'
+
+
+def verdict(check):
+    return {True: '✅ pass', False: '❌ fail', None: '⚪ no data'}[check['passed']]
+
+
+def markdown_report(result):
+    """Release-attachable summary of a soak run"""
+    meta, counts = result['meta'], result['counts']
+    lines = [
+        f"# OpenVoice soak report ({'PASS' if result['passed'] else 'FAIL'})",
+        '',
+        f"- Revision: `{meta['revision']}`, backend `{meta['backend']}`, {meta['target']}",
+        f"- {meta['started']} for {meta['duration_seconds'] / 60:.1f} min at {meta['rate']} req/s "
+        f"(concurrency {meta['concurrency']}, warm-up {meta['warmup']} requests)",
+        f"- Requests: {counts['done']} done, {counts['ok']} ok, {counts['rejected']} rejected as expected, "
+        f"{counts['busy']} shed with 503, {counts['failed']} unexpected, "
+        f"{counts['late']} sent late (service behind the target rate)",
+        f"- Host: {meta['platform']}",
+        '',
+        '| Check | Start | End | Growth | Threshold | Result |',
+        '|---|---|---|---|---|---|',
+    ]
+    for check in result['checks']:
+        lines.append(
+            f"| {check['metric']} ({check['unit']}) | {format_value(check['start'])} | {format_value(check['end'])} "
+            f"| {format_value(check['growth'])} | {check['threshold']:g} | {verdict(check)} |"
+        )
+    lines += ['', '| Elapsed | Requests | RSS MB | FDs | Temp | p50 s | p95 s |', '|---|---|---|---|---|---|---|']
+    step = max(1, len(result['samples']) // 24)
+    for sample in result['samples'][::step] + ([result['samples'][-1]] if (len(result['samples']) - 1) % step else []):
+        rss = f"{sample['rss_bytes'] / (1024 * 1024):.1f}" if sample['rss_bytes'] is not None else '-'
+        lines.append(
+            f"| {sample['elapsed']:.0f}s | {sample['requests']} | {rss} | {format_value(sample['open_fds'])} "
+            f"| {format_value(sample['temp_entries'])} | {format_value(sample['p50'])} | {format_value(sample['p95'])} |"
+        )
+    return '\n'.join(lines) + '\n'
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Soak-test the OpenVoice service for leaks and latency drift")
+    parser.add_argument('--duration', type=parse_duration, default=parse_duration('1h'),
+                        help="How long to run, e.g. 90s, 30m, 2h (default: 1h)")
+    parser.add_argument('--requests', type=int, help="Stop after this many requests instead")
+    parser.add_argument('--rate', type=float, default=4.0, help="Requests per second (default: 4)")
+    parser.add_argument('--concurrency', type=int, default=16, help="Most requests in flight (default: 16)")
+    parser.add_argument('--interval', type=float, default=30.0, help="Seconds between samples (default: 30)")
+    parser.add_argument('--warmup', type=int, default=500,
+                        help="Requests before growth is measured, while caches fill (default: 500)")
+    parser.add_argument('--max-rss-mb', type=float, default=DEFAULT_MAX_RSS_MB,
+                        help=f"RSS growth per 1k requests in MB (default: {DEFAULT_MAX_RSS_MB:g})")
+    parser.add_argument('--max-fds', type=float, default=DEFAULT_MAX_FDS,
+                        help=f"Open descriptor growth per 1k requests (default: {DEFAULT_MAX_FDS:g})")
+    parser.add_argument('--max-temp', type=float, default=DEFAULT_MAX_TEMP,
+                        help=f"Leftover temp file growth per 1k requests (default: {DEFAULT_MAX_TEMP:g})")
+    parser.add_argument('--max-latency-drift', type=float, default=DEFAULT_MAX_LATENCY_DRIFT,
+                        help=f"p50 latency growth, last vs first quarter (default: {DEFAULT_MAX_LATENCY_DRIFT:g})")
+    parser.add_argument('--max-error-rate', type=float, default=DEFAULT_MAX_ERROR_RATE,
+                        help=f"Unexpected responses as a fraction of requests (default: {DEFAULT_MAX_ERROR_RATE:g})")
+    parser.add_argument('--in-process', action='store_true',
+                        help="Run the service in this process (OPENVOICE_BACKEND defaults to stub)")
+    parser.add_argument('--seed', type=int, default=0, help="Request mix seed (default: 0)")
+    parser.add_argument('--output', help="Write samples and verdicts to this JSON file")
+    parser.add_argument('--report', help="Write a Markdown report to this file")
+    args = parser.parse_args()
+
+    if args.in_process:
+        target = InProcessTarget()
+        where = "in this process"
+    else:
+        from openvoice_client import discover
+        base_url = discover()
+        if base_url is None:
+            print("❌ OpenVoice service not found on ports 6000-6009")
+            print("   Make sure to start it: ./services/start_openvoice.sh")
+            return 1
+        target = HTTPTarget(base_url, pool_size=args.concurrency)
+        where = f"on {base_url}"
+    health = target.health()
+
+    limit = f"{args.requests} requests" if args.requests else f"{args.duration / 60:.1f} min"
+    print(f"🌱 Soaking OpenVoice {where} ({health.get('backend')} backend): {args.rate:g} req/s for {limit}")
+    print(f"{'elapsed':>8} {'requests':>9} {'RSS MB':>8} {'fds':>5} {'temp':>5} {'p50':>8} {'p95':>8} {'failed':>7}")
+
+    def print_sample(sample):
+        rss = f"{sample['rss_bytes'] / (1024 * 1024):.1f}" if sample['rss_bytes'] is not None else '-'
+        p50 = f"{sample['p50']:.3f}s" if sample['p50'] is not None else '-'
+        p95 = f"{sample['p95']:.3f}s" if sample['p95'] is not None else '-'
+        print(f"{sample['elapsed']:>7.0f}s {sample['requests']:>9} {rss:>8} {format_value(sample['open_fds']):>5} "
+              f"{format_value(sample['temp_entries']):>5} {p50:>8} {p95:>8} {sample['failed']:>7}")
+
+    run = SoakRun(target, args.rate, args.concurrency, args.interval, seed=args.seed)
+    started = time.strftime('%Y-%m-%dT%H:%M:%S%z')
+    samples = run.run(args.duration if not args.requests else float('inf'), args.requests, on_sample=print_sample)
+    print_sample(samples[-1])
+
+    thresholds = {
+        'rss_bytes': args.max_rss_mb, 'open_fds': args.max_fds, 'temp_entries': args.max_temp,
+        'latency_drift': args.max_latency_drift, 'error_rate': args.max_error_rate,
+    }
+    checks = analyze(samples, run.counts, args.warmup, thresholds)
+    passed = all(check['passed'] is not False for check in checks)
+    result = {
+        'meta': {
+            'revision': git_revision(),
+            'started': started,
+            'duration_seconds': samples[-1]['elapsed'],
+            'target': where,
+            'backend': health.get('backend'),
+            'rate': args.rate,
+            'concurrency': args.concurrency,
+            'warmup': args.warmup,
+            'platform': f"{platform.system()} {platform.machine()}, Python {platform.python_version()}",
+        },
+        'counts': run.counts,
+        'checks': checks,
+        'passed': passed,
+        'samples': samples,
+    }
+
+    print(f"\n{'check':<24} {'growth':>10} {'threshold':>10}  result")
+    print("-" * 58)
+    for check in checks:
+        print(f"{check['metric']:<24} {format_value(check['growth']):>10} {check['threshold']:>10g}  {verdict(check)}")
+    if run.counts['late'] or run.counts['busy']:
+        print(f"⚠️  {run.counts['busy']} requests shed with 503 and {run.counts['late']} sent while "
+              f"{args.concurrency} were still in flight: the service is slower than {args.rate:g} req/s")
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(result, f, indent=2)
+    if args.report:
+        with open(args.report, 'w') as f:
+            f.write(markdown_report(result))
+        print(f"📄 Report written to {args.report}")
+    return 0 if passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -5,21 +5,14 @@ Usage: python test_voice_styles.py [style] [text]
 """
 
 import sys
-import requests
-import json
-import os
-import socket
+from urllib.parse import urlsplit
+
+from openvoice_client import VOICE_STYLES, OpenVoiceClient, OpenVoiceError, discover
 
 def find_openvoice_port():
-    """Find which port OpenVoice service is running on"""
-    for port in range(6000, 6010):
-        try:
-            response = requests.get(f"http://localhost:{port}/health", timeout=1)
-            if response.status_code == 200:
-                return port
-        except:
-            continue
-    return None
+    """Find which port OpenVoice service is running on (cached between runs)"""
+    url = discover()
+    return urlsplit(url).port if url else None
 
 def test_voice_style(style="default", text="Hello Seedling! This is a test of the voice style."):
     """Test a voice style with OpenVoice service"""
@@ -37,58 +30,33 @@ def test_voice_style(style="default", text="Hello Seedling! This is a test of th
     print()
     
     # Make synthesis request
-    url = f"http://localhost:{port}/synthesize"
-    payload = {
-        "text": text,
-        "language": "en",
-        "style": style
-    }
-    
     try:
         print("⏳ Requesting synthesis...")
-        response = requests.post(url, json=payload, timeout=30)
+        with OpenVoiceClient(timeout=30) as client:
+            audio = client.synthesize(text, style=style, language="en")
         
-        if response.status_code == 200:
-            # Save audio to file
-            output_file = f"test_voice_{style}.wav"
-            with open(output_file, 'wb') as f:
-                f.write(response.content)
-            
-            file_size = len(response.content)
-            print(f"✅ Synthesis successful!")
-            print(f"📁 Saved to: {output_file} ({file_size:,} bytes)")
-            print(f"🔊 Play with: afplay {output_file}")
-            return True
-        else:
-            print(f"❌ Synthesis failed with status {response.status_code}")
-            try:
-                error_data = response.json()
-                print(f"   Error: {error_data}")
-            except:
-                print(f"   Response: {response.text}")
-            return False
+        # Save audio to file
+        output_file = f"test_voice_{style}.wav"
+        with open(output_file, 'wb') as f:
+            f.write(audio)
+        
+        print(f"✅ Synthesis successful!")
+        print(f"📁 Saved to: {output_file} ({len(audio):,} bytes)")
+        print(f"🔊 Play with: afplay {output_file}")
+        return True
             
-    except requests.exceptions.RequestException as e:
+    except OpenVoiceError as e:
+        print(f"❌ Synthesis failed: {e}")
+        return False
+    except Exception as e:
         print(f"❌ Request failed: {e}")
         return False
 
 def list_available_styles():
     """List all available voice styles"""
-    styles = [
-        "default",
-        "excited",
-        "friendly",
-        "cheerful",
-        "sad",
-        "angry",
-        "terrified",
-        "shouting",
-        "whispering"
-    ]
-    
     print("Available voice styles:")
     print("=" * 50)
-    for style in styles:
+    for style in VOICE_STYLES:
         print(f"  • {style}")
     print()
 
@@ -118,8 +86,7 @@ def main():
     text = sys.argv[2] if len(sys.argv) > 2 else "Hello Seedling! This is a test of the voice style."
     
     # Validate style
-    valid_styles = ["default", "excited", "friendly", "cheerful", "sad", "angry", "terrified", "shouting", "whispering"]
-    if style not in valid_styles:
+    if style not in VOICE_STYLES:
         print(f"❌ Invalid style: {style}")
         print()
         list_available_styles()
@@ -0,0 +1,14 @@
+"""Run the service modules the way the service does: flat imports from services/, stub models"""
+
+import os
+import sys
+import tempfile
+
+SERVICES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'services')
+sys.path.insert(0, SERVICES_DIR)
+
+os.environ.setdefault('OPENVOICE_BACKEND', 'stub')
+os.environ.setdefault('OPENVOICE_STUB_RTF', '0.002')
+os.environ.setdefault('OPENVOICE_BATCH_WINDOW_MS', '100')
+os.environ.setdefault('OPENVOICE_VOICES_DIR', tempfile.mkdtemp(prefix='sprout_test_voices_'))
+os.environ.setdefault('OPENVOICE_CACHE_DIR', tempfile.mkdtemp(prefix='sprout_test_cache_'))
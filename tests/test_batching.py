@@ -0,0 +1,52 @@
+import threading
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def run_in_threads(*calls):
+    """Start every call at once; returns each call's result or raised exception"""
+    results = [None] * len(calls)
+
+    def run(index, call):
+        try:
+            results[index] = call()
+        except Exception as e:
+            results[index] = e
+
+    threads = [threading.Thread(target=run, args=(index, call)) for index, call in enumerate(calls)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def upper_batch(texts):
+    return [text.upper() for text in texts]
+
+
+def test_failing_item_does_not_fail_its_batch():
+    batches = []
+
+    def run_batch(texts):
+        batches.append(len(texts))
+        return upper_batch(texts)
+
+    batcher = MicroBatcher(run_batch, window_ms=200, max_batch=4, timeout=5)
+    good, bad = run_in_threads(lambda: batcher.submit('hello'), lambda: batcher.submit(42))
+
+    assert good == 'HELLO'
+    assert isinstance(bad, AttributeError)
+    assert batches[0] == 2  # Both were batched together before being retried alone
+    stats = batcher.stats()
+    assert stats['split'] == 1
+    assert stats['failed'] == 1
+
+
+def test_single_item_failure_is_raised():
+    batcher = MicroBatcher(upper_batch, window_ms=1, timeout=5)
+    with pytest.raises(AttributeError):
+        batcher.submit(None)
+    assert batcher.submit('ok') == 'OK'
@@ -0,0 +1,36 @@
+import numpy as np
+import pytest
+
+from embedding_store import SpeakerEmbeddingStore
+
+
+def reference_file(tmp_path):
+    path = tmp_path / 'reference.wav'
+    path.write_bytes(b'RIFF reference audio')
+    return str(path)
+
+
+def test_extraction_runs_once_per_content(tmp_path):
+    store = SpeakerEmbeddingStore(str(tmp_path / 'cache'), persist=False)
+    calls = []
+
+    def get_se(audio_path, converter, target_dir, vad):
+        calls.append(audio_path)
+        return np.ones(4, dtype=np.float32), None
+
+    path = reference_file(tmp_path)
+    first = store.get(path, None, get_se)
+    assert store.get(path, None, get_se) is first
+    assert len(calls) == 1
+    assert store._extract_locks == {}
+
+
+def test_failed_extraction_releases_its_lock(tmp_path):
+    store = SpeakerEmbeddingStore(str(tmp_path / 'cache'), persist=False)
+
+    def get_se(audio_path, converter, target_dir, vad):
+        raise RuntimeError('no speech found')
+
+    with pytest.raises(RuntimeError):
+        store.get(reference_file(tmp_path), None, get_se)
+    assert store._extract_locks == {}
@@ -0,0 +1,45 @@
+import os
+import tempfile
+
+import numpy as np
+
+import openvoice_backend
+from openvoice_backend import TempFileOpenVoiceBackend
+
+
+class PathOnlyConverter:
+    """ToneColorConverter stand-in: convert() watermarks whenever it has a watermark model"""
+
+    def __init__(self):
+        self.watermark_model = object()
+        self.watermarked = 0
+
+    def add_watermark(self, audio, message):
+        if self.watermark_model is None:
+            return audio
+        self.watermarked += 1
+        return audio
+
+    def convert(self, audio_src_path, src_se, tgt_se, output_path=None, tau=0.3, message='default'):
+        return self.add_watermark(np.zeros(160, dtype=np.float32), message)
+
+
+def temp_file(audio, sample_rate):
+    fd, path = tempfile.mkstemp(prefix='sprout_test_', suffix='.wav')
+    os.close(fd)
+    return path
+
+
+def test_tempfile_conversion_leaves_watermarking_to_its_own_stage(monkeypatch):
+    monkeypatch.setattr(openvoice_backend, 'write_temp_wav', temp_file)
+    converter = PathOnlyConverter()
+    backend = TempFileOpenVoiceBackend(None, converter, 'cpu')
+    monkeypatch.setattr(TempFileOpenVoiceBackend, 'sampling_rate', 16000)
+    audio = np.zeros(160, dtype=np.float32)
+
+    backend.convert_batch([audio, audio], [None, None], [None, None])
+    assert converter.watermarked == 0
+    assert converter.watermark_model is not None
+
+    backend.convert(audio, None, None, message='@MyShell')
+    assert converter.watermarked == 1
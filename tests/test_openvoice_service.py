@@ -0,0 +1,163 @@
+import io
+import json
+import tempfile
+import zipfile
+
+import pytest
+
+import openvoice_service as service
+import text_frontend
+from test_batching import run_in_threads
+
+
+@pytest.fixture(scope='module')
+def client():
+    service.load_openvoice(warm=True)
+    assert service.batcher is not None
+    return service.app.test_client()
+
+
+def post(client, body=None, data=None, path='/synthesize'):
+    response = client.post(path, json=body, data=data, content_type='application/json' if data else None)
+    response.close()
+    return response
+
+
+@pytest.mark.parametrize('path', ['/synthesize', '/synthesize/stream'])
+@pytest.mark.parametrize('body, data', [
+    ({'text': 5}, None),
+    ({'text': ['a', 'b']}, None),
+    ({'text': '   '}, None),
+    ({'text': 'hi', 'style': ['sad']}, None),
+    ({'text': 'hi', 'timeout': -1}, None),
+    ({'text': 'hi', 'timeout': 0}, None),
+    ({'text': 'hi', 'timeout': 'soon'}, None),
+    ({'text': 'hi', 'cache': 'no'}, None),
+    (['hello'], None),
+    (None, 'not json'),
+])
+def test_malformed_request_is_rejected(client, path, body, data):
+    assert post(client, body, data, path).status_code == 400
+
+
+def test_malformed_request_does_not_fail_its_batch(client):
+    valid, malformed, not_json = run_in_threads(
+        lambda: post(client, {'text': 'Batched with a broken request.', 'cache': False}),
+        lambda: post(client, {'text': {'nested': True}}),
+        lambda: post(client, data='{"text": '),
+    )
+    assert valid.status_code == 200
+    assert valid.content_type.startswith('audio/wav')
+    assert malformed.status_code == 400
+    assert not_json.status_code == 400
+
+
+def test_stub_voices_stay_out_of_the_voices_dir(client):
+    assert service.voice_registry.voices_dir != service.VOICES_DIR
+    assert service.voice_registry.voices_dir.startswith(tempfile.gettempdir())
+
+
+def test_watermark_modes_do_not_share_cache_entries(client):
+    keys = {mode: service.cache_key('Cache me.', 'default', mode) for mode in service.WATERMARK_MODES}
+    assert len(set(keys.values())) == len(keys)
+
+    text = 'Rendered with the watermark in the background.'
+    assert post(client, {'text': text, 'watermark': 'async'}).status_code == 200
+    repeat = post(client, {'text': text, 'watermark': 'async'})
+    unwatermarked = post(client, {'text': text, 'watermark': 'off'})
+    assert repeat.headers['X-Sprout-Path'] == 'cache'
+    assert unwatermarked.headers['X-Sprout-Path'] != 'cache'
+
+
+def test_batch_file_names_depend_on_the_id_alone():
+    names = {item_id: service.batch_filename(item_id, '.wav') for item_id in ('a/b', 'a_b', 'a b', 'breath-1')}
+    assert len(set(names.values())) == len(names)
+    assert names['breath-1'] == 'breath-1.wav'
+    assert names['a/b'] == service.batch_filename('a/b', '.wav')
+
+
+def test_batch_rejects_file_name_collisions(client):
+    items = [{'id': 'a/b', 'text': 'One.'}, {'id': 'a_b', 'text': 'Two.'}, {'id': 'A_B', 'text': 'Three.'}]
+    response = client.post('/synthesize/batch', json={'items': items})
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        index = json.loads(archive.read('index.json'))
+        names = [name for name in archive.namelist() if name != 'index.json']
+    statuses = {entry['id']: entry['status'] for entry in index['items']}
+    assert statuses == {'a/b': 'rendered', 'a_b': 'rendered', 'A_B': 'failed'}
+    assert len(names) == 2
+
+
+def test_stream_normalizes_each_chunk_once(client, monkeypatch):
+    normalized = []
+    normalize_text = text_frontend.normalize_text
+    monkeypatch.setattr(text_frontend, 'normalize_text', lambda text: normalized.append(text) or normalize_text(text))
+    text = 'First sentence of the stream. Second one, in 1999. And a third at www.example.com.'
+    response = client.post('/synthesize/stream', json={'text': text, 'cache': False})
+    assert response.status_code == 200
+    assert int(response.headers['X-Sprout-Chunks']) == 3
+    response.get_data()
+    response.close()
+    assert normalized == [text]
+
+
+def test_unspeakable_text_is_rejected(client):
+    assert post(client, {'text': '🌱🌱'}).status_code == 400
+
+
+@pytest.mark.parametrize('body, data', [
+    (None, 'not json'),
+    ([{'id': 'a', 'text': 'One.'}], None),
+    ({'items': [{'id': 'a', 'text': 'One.', 'voice': ['x']}]}, None),
+    ({'items': [{'id': 'a', 'text': 'One.'}], 'voice': {'id': 'x'}}, None),
+    ({'items': [{'id': 'a', 'text': 'One.'}], 'known': ['a']}, None),
+])
+def test_malformed_batch_is_rejected(client, body, data):
+    assert post(client, body, data, '/synthesize/batch').status_code == 400
+
+
+def test_malformed_jsonl_batch_is_rejected(client):
+    response = client.post('/synthesize/batch', data='{"id": "a", "text": "One."}\n{oops', content_type='application/jsonl')
+    assert response.status_code == 400
+
+
+@pytest.mark.parametrize('body, data', [(None, 'not json'), (['Hello Seedling!'], None), ({'phrases': 'Hi'}, None)])
+def test_malformed_prewarm_is_rejected(client, body, data):
+    assert post(client, body, data, '/cache/prewarm').status_code == 400
+
+
+def test_batched_requests_report_their_own_path_and_plan(client, monkeypatch):
+    from test_voice_registry import reference_wav
+
+    sample_rate = service.openvoice_model['backend'].sampling_rate  # No resampling (librosa) needed
+    response = client.post('/clone', data=reference_wav(sample_rate=sample_rate), content_type='audio/wav')
+    voice = response.get_json()['voice']
+    service.voice_registry._jobs.submit(lambda: None).result(timeout=10)
+    assert service.voice_registry.state(voice) == 'ready'
+
+    # Without a default reference voice the two requests take different paths
+    monkeypatch.setitem(service.openvoice_model, 'reference_se', None)
+    base, cloned = run_in_threads(
+        lambda: post(client, {'text': 'Base speaker please.', 'cache': False, 'watermark': 'off'}),
+        lambda: post(client, {'text': 'Cloned voice please.', 'cache': False, 'voice': voice}),
+    )
+    assert (base.headers['X-Sprout-Path'], base.headers['X-Sprout-Plan']) == ('base', 'tts')
+    assert (cloned.headers['X-Sprout-Path'], cloned.headers['X-Sprout-Plan']) == ('reference', 'tts+convert+watermark')
+
+
+def test_plan_skips_conversion_to_the_styles_own_speaker(client):
+    source = service.openvoice_model['source_embeddings']['sad']
+    assert 'convert' not in service.plan_synthesis('sad', source.copy(), False, False).stages
+    assert 'convert' in service.plan_synthesis('sad', source + 1, False, False).stages
+    assert 'convert' in service.plan_synthesis('sad', '0123456789abcdef', False, False).stages
+
+
+def test_reference_voice_follows_the_voice_open_py_built(tmp_path, monkeypatch):
+    monkeypatch.setattr(service, 'AUDIO_DIR', str(tmp_path))
+    assert service.find_reference_audio() is None
+    (tmp_path / 'jon_reference.wav').write_bytes(b'')
+    assert service.find_reference_audio() == str(tmp_path / 'jon_reference.wav')
+
+    (tmp_path / 'ada_reference.wav').write_bytes(b'')
+    (tmp_path / 'voice_manifest.json').write_text(json.dumps({'voice': {'name': 'ada', 'reference': 'ada_reference.wav'}}))
+    assert service.find_reference_audio() == str(tmp_path / 'ada_reference.wav')
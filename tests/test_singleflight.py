@@ -0,0 +1,96 @@
+import threading
+
+import pytest
+
+from inference_pool import PoolBusyError
+from singleflight import SingleFlight
+
+
+def test_followers_share_the_leaders_result():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    results = []
+
+    def leader():
+        started.set()
+        release.wait(5)
+        return 'wav'
+
+    thread = threading.Thread(target=lambda: results.append(flight.run('key', leader, timeout=5)))
+    thread.start()
+    started.wait(5)
+    follower = threading.Thread(target=lambda: results.append(flight.run('key', lambda: 'other', timeout=5)))
+    follower.start()
+    while flight.stats()['coalesced'] == 0:
+        pass
+    release.set()
+    thread.join()
+    follower.join()
+
+    assert sorted(results) == [('wav', False), ('wav', True)]
+
+
+def test_follower_retries_when_the_leader_is_turned_away():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+    errors = []
+
+    def busy():
+        started.set()
+        release.wait(5)
+        raise PoolBusyError('Inference queue is full')
+
+    def lead():
+        try:
+            flight.run('key', busy, timeout=5)
+        except PoolBusyError as e:
+            errors.append(e)
+
+    thread = threading.Thread(target=lead)
+    thread.start()
+    started.wait(5)
+    results = []
+    follower = threading.Thread(target=lambda: results.append(flight.run('key', lambda: 'wav', timeout=5)))
+    follower.start()
+    while flight.stats()['coalesced'] == 0:
+        pass
+    release.set()
+    thread.join()
+    follower.join()
+
+    assert len(errors) == 1
+    assert results == [('wav', True)]
+    assert flight.stats()['busy_retries'] == 1
+    assert flight.stats()['in_flight'] == 0
+
+
+def test_follower_shares_other_failures():
+    flight = SingleFlight()
+    started, release = threading.Event(), threading.Event()
+
+    def broken():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('model failed')
+
+    thread = threading.Thread(target=lambda: pytest.raises(RuntimeError, flight.run, 'key', broken, 5))
+    thread.start()
+    started.wait(5)
+    errors = []
+
+    def follow():
+        try:
+            flight.run('key', lambda: 'wav', timeout=5)
+        except RuntimeError as e:
+            errors.append(e)
+
+    follower = threading.Thread(target=follow)
+    follower.start()
+    while flight.stats()['coalesced'] == 0:
+        pass
+    release.set()
+    thread.join()
+    follower.join()
+
+    assert [str(e) for e in errors] == ['model failed']
+    assert flight.stats()['shared_failures'] == 1
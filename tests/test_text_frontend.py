@@ -0,0 +1,48 @@
+import pytest
+
+import text_frontend
+from text_frontend import NormalizedText, TextFrontend, normalize_text, split_sentences
+
+
+@pytest.mark.parametrize('text, spoken', [
+    # A four-digit number is only a year where the words around it say so
+    ('Room 1234', 'Room one thousand two hundred thirty-four'),
+    ('I have 1500 apples.', 'I have one thousand five hundred apples.'),
+    ('In 1999 we met.', 'In nineteen ninety-nine we met.'),
+    ('Back in 2010 it cost $5.', 'Back in twenty ten it cost five dollars.'),
+    ('On May 4th, 2021.', 'On May fourth, twenty twenty-one.'),
+    ('From 1990 to 1995.', 'From nineteen ninety to nineteen ninety-five.'),
+    ('The 1990s were fun.', 'The nineteen nineties were fun.'),
+    # Phone numbers are read digit by digit
+    ('Call 555-1234 now.', 'Call five five five, one two three four now.'),
+    ('Call +1 415-555-1234.', 'Call plus one, four one five, five five five, one two three four.'),
+    ('Call (415) 555-1234.', 'Call four one five, five five five, one two three four.'),
+    # Versions and addresses, next to plain decimals
+    ('Version 3.2.1 is out.', 'Version three point two point one is out.'),
+    ('pi is 3.14', 'pi is three point one four'),
+    # Links are read as their host
+    ('See https://example.com/a/b for more.', 'See example dot com for more.'),
+    ('Visit www.example.org today.', 'Visit example dot org today.'),
+    ('Read https://docs.python.org/3/library/re.html.', 'Read docs dot python dot org.'),
+    ('Score was 10-5.', 'Score was ten-five.'),
+])
+def test_normalize_text(text, spoken):
+    assert normalize_text(text) == spoken
+
+
+def test_overlong_words_are_hard_split():
+    chunks = split_sentences('x' * 250, max_chars=100)
+    assert [len(chunk) for chunk in chunks] == [100, 100, 50]
+    assert all(len(chunk) <= 20 for chunk in split_sentences(f"see {'y' * 30} ok", max_chars=20))
+
+
+def test_segments_are_not_normalized_twice(monkeypatch):
+    frontend = TextFrontend(max_chars=40)
+    chunks = frontend.segments('It costs $5. Call 555-1234 in 1999, or write to us at www.example.com today.')
+    assert all(isinstance(chunk, NormalizedText) for chunk in chunks)
+
+    def fail(text):
+        raise AssertionError(f'normalized again: {text!r}')
+
+    monkeypatch.setattr(text_frontend, 'normalize_text', fail)
+    assert [frontend.segments(chunk) for chunk in chunks] == [[chunk] for chunk in chunks]
@@ -0,0 +1,115 @@
+import os
+import threading
+import time
+
+import numpy as np
+import pytest
+
+from audio_encoding import encode_wav
+from voice_registry import VoiceNotFoundError, VoiceNotReadyError, VoiceRegistry
+
+SAMPLE_RATE = 16000
+
+
+def reference_wav(seconds=2.0, pitch=220, sample_rate=SAMPLE_RATE):
+    t = np.arange(int(seconds * sample_rate), dtype=np.float32) / sample_rate
+    return encode_wav((0.5 * np.sin(2 * np.pi * pitch * t)).astype(np.float32), sample_rate)
+
+
+def extract(audio):
+    return np.array([len(audio)], dtype=np.float32)
+
+
+def wait_until_prepared(registry, voice_id):
+    registry._jobs.submit(lambda: None).result(timeout=10)
+    return registry.state(voice_id)
+
+
+def test_voice_is_ready_once_prepared(tmp_path):
+    registry = VoiceRegistry(str(tmp_path), persist=False)
+    voice_id = registry.add(reference_wav(), SAMPLE_RATE, extract)
+    assert wait_until_prepared(registry, voice_id) == 'ready'
+    assert os.path.exists(tmp_path / f'{voice_id}.ready')
+    assert registry.get(voice_id, extract)[0] > 0
+
+
+def test_interrupted_preparation_is_pending_until_resumed(tmp_path):
+    registry = VoiceRegistry(str(tmp_path), persist=False)
+    voice_id = registry.add(reference_wav(), SAMPLE_RATE, extract)
+    wait_until_prepared(registry, voice_id)
+    # As if the process died after writing the audio but before the embedding was done
+    os.remove(tmp_path / f'{voice_id}.ready')
+
+    restarted = VoiceRegistry(str(tmp_path), persist=False)
+    assert restarted.state(voice_id) == 'pending'
+    with pytest.raises(VoiceNotReadyError):
+        restarted.check(voice_id)
+
+    assert restarted.resume(extract) == [voice_id]
+    assert wait_until_prepared(restarted, voice_id) == 'ready'
+
+
+def test_interrupted_preparation_is_redone_on_upload(tmp_path):
+    data = reference_wav()
+    registry = VoiceRegistry(str(tmp_path), persist=False)
+    voice_id = registry.add(data, SAMPLE_RATE, extract)
+    wait_until_prepared(registry, voice_id)
+    os.remove(tmp_path / f'{voice_id}.ready')
+
+    restarted = VoiceRegistry(str(tmp_path), persist=False)
+    assert restarted.add(data, SAMPLE_RATE, extract) == voice_id
+    assert wait_until_prepared(restarted, voice_id) == 'ready'
+    assert restarted.stats()['extractions'] == 1
+
+
+def test_failed_load_releases_its_lock(tmp_path):
+    registry = VoiceRegistry(str(tmp_path), persist=False)
+    with pytest.raises(VoiceNotFoundError):
+        registry.get('0123456789abcdef', extract)
+    assert registry._load_locks == {}
+
+
+def test_waiting_load_keeps_its_lock_until_every_caller_is_done(tmp_path):
+    registry = VoiceRegistry(str(tmp_path), persist=False)
+    voice_id = registry.add(reference_wav(), SAMPLE_RATE, extract)
+    wait_until_prepared(registry, voice_id)
+
+    # Not in memory after a restart, so get() re-extracts from the stored audio
+    restarted = VoiceRegistry(str(tmp_path), persist=False)
+    calls, entered, release = [], threading.Semaphore(0), threading.Semaphore(0)
+
+    def slow_extract(audio):
+        calls.append(len(audio))
+        entered.release()
+        release.acquire()
+        if len(calls) == 1:
+            raise RuntimeError('extraction failed')
+        return extract(audio)
+
+    def get():
+        try:
+            return restarted.get(voice_id, slow_extract)
+        except RuntimeError as e:
+            return e
+
+    first = threading.Thread(target=get)
+    first.start()
+    entered.acquire()
+    waiter = threading.Thread(target=get)
+    waiter.start()
+    while restarted._load_locks[voice_id][1] < 2:
+        time.sleep(0.01)
+
+    # The first load fails; the waiter takes over the same lock, and a newcomer queues behind it
+    release.release()
+    entered.acquire()
+    newcomer = threading.Thread(target=get)
+    newcomer.start()
+    time.sleep(0.1)
+    assert len(calls) == 2
+
+    release.release()
+    for thread in (first, waiter, newcomer):
+        thread.join(5)
+    assert len(calls) == 2
+    assert restarted._load_locks == {}